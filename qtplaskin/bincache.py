@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Binary sidecar cache for directories of qt_*.txt files.
+
+Parsing the text output of a large run takes a long time, so after the
+first load the parsed arrays are written next to the data in a hidden
+directory, one .npy file per array, plus a manifest that records the
+size and modification time of every source file:
+
+    <run>/.qtplaskin_cache/manifest.json
+    <run>/.qtplaskin_cache/qt_densities_t.npy
+    <run>/.qtplaskin_cache/qt_densities_values.npy
+    ...
+
+The next time the directory is opened the .npy files are memory-mapped,
+which takes milliseconds.  If any of the source files has changed the
+cache is ignored and rebuilt from the text files.
+"""
+
+import json
+import os
+from warnings import warn
+
+import numpy as np
+
+CACHE_DIRNAME = '.qtplaskin_cache'
+MANIFEST = 'manifest.json'
+
+# Increase this whenever the layout of the cached arrays changes
+CACHE_VERSION = 3
+
+
+def cache_dir(dirname):
+    return os.path.join(dirname, CACHE_DIRNAME)
+
+
+def source_signature(dirname, fnames):
+    """ Returns a dictionary with the size and mtime of each file. """
+    sig = {}
+    for fname in fnames:
+        st = os.stat(os.path.join(dirname, fname))
+        sig[fname] = [st.st_size, st.st_mtime_ns]
+    return sig
+
+
+def load(dirname, fnames, **params):
+    """ Loads the cache of dirname if it is still valid.
+
+    fnames are the source files that the cache depends on and params any
+    other options that must match those used to write it.  Returns the
+    manifest and a dictionary of memory-mapped arrays, or (None, None).
+    """
+    path = cache_dir(dirname)
+    try:
+        with open(os.path.join(path, MANIFEST)) as fp:
+            manifest = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None, None
+
+    try:
+        sig = source_signature(dirname, fnames)
+    except OSError:
+        return None, None
+
+    if (manifest.get('version') != CACHE_VERSION
+            or manifest.get('sources') != sig
+            or manifest.get('params') != params):
+        return None, None
+
+    try:
+        arrays = dict((k, np.load(os.path.join(path, f), mmap_mode='r'))
+                      for k, f in manifest['arrays'].items())
+    except (IOError, OSError, ValueError):
+        return None, None
+
+    return manifest, arrays
+
+
+def _save_array(fname, a):
+    """ Like np.save, but keeps the columns of a (possibly non-contiguous)
+    column-major array contiguous, without a temporary copy. """
+    if a.ndim != 2 or a.strides[0] != a.itemsize or a.flags.c_contiguous:
+        np.save(fname, a)
+        return
+
+    out = np.lib.format.open_memmap(fname, mode='w+', dtype=a.dtype,
+                                    shape=a.shape, fortran_order=True)
+    out[...] = a
+    out.flush()
+    del out
+
+
+def save(dirname, sources, arrays, info=None, **params):
+    """ Writes arrays (a dictionary name -> array) to the cache of dirname.
+
+    sources is the signature of the source files, as returned by
+    `source_signature`, taken *before* they were parsed.  The manifest is
+    written last, so an interrupted write leaves an invalid cache rather
+    than an inconsistent one.  Failures (e.g. a read-only directory) only
+    produce a warning.  Column-major arrays stay column-major.
+    """
+    path = cache_dir(dirname)
+    try:
+        if not os.path.isdir(path):
+            os.mkdir(path)
+
+        mpath = os.path.join(path, MANIFEST)
+        if os.path.exists(mpath):
+            os.remove(mpath)
+
+        files = {}
+        for k, a in arrays.items():
+            files[k] = k + '.npy'
+            _save_array(os.path.join(path, files[k]), np.asarray(a))
+
+        manifest = dict(version=CACHE_VERSION, sources=sources, params=params,
+                        arrays=files, info=info or {})
+        with open(mpath + '.tmp', 'w') as fp:
+            json.dump(manifest, fp, indent=1)
+        os.replace(mpath + '.tmp', mpath)
+
+    except (IOError, OSError) as e:
+        warn("Could not write cache in %s: %s" % (path, e))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Binary output format of ZdPlaskin runs.
+
+Formatting and parsing numbers as text is the slowest part of writing and
+reading long runs.  Instead of qt_densities.txt, qt_rates.txt and
+qt_conditions.txt a run may write all its data to a single binary file,
+qt_data.bin, next to the usual list files (qt_species_list.txt,
+qt_reactions_list.txt, qt_conditions_list.txt) and qt_matrix.txt.
+
+Layout (all numbers little-endian):
+
+    offset  type         content
+    0       char[8]      magic, b'QTPLBIN1'
+    8       uint32       version (1)
+    12      uint32       header size in bytes (H, a multiple of 8; 64)
+    16      uint32       number of species (ns)
+    20      uint32       number of reactions (nr)
+    24      uint32       number of conditions (nc)
+    28      -            zeros up to H
+
+followed by one record per time step, each of them
+
+    float64[1 + ns + nr + nc]    t, densities, rates, conditions
+
+so that the file size is H + 8 * (1 + ns + nr + nc) * (number of rows).
+Records are only appended, so the file can be read while the run is still
+writing it: a record that is not complete yet is ignored.
+
+From Fortran the file can be written with an unformatted stream, e.g.
+
+    open(unit, file='qt_data.bin', access='stream', form='unformatted')
+    write(unit) 'QTPLBIN1', 1_int32, 64_int32, ns, nr, nc, (0_int32, i=1,9)
+    ...
+    write(unit) time, density(:), rrt(:), conditions(:)
+"""
+
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'QTPLBIN1'
+VERSION = 1
+HEADER_BYTES = 64
+
+# magic, version, header size, ns, nr, nc
+_HEADER = struct.Struct('<8s5I')
+
+DTYPE = np.dtype('<f8')
+
+
+def pack_header(n_species, n_reactions, n_conditions):
+    """ The header of a file with the given numbers of columns. """
+    header = _HEADER.pack(MAGIC, VERSION, HEADER_BYTES, n_species,
+                          n_reactions, n_conditions)
+    return header + b'\0' * (HEADER_BYTES - len(header))
+
+
+def read_header(path):
+    """ Returns (header size, ns, nr, nc) of a binary data file.  Raises
+    ValueError if it is not one. """
+    with open(path, 'rb') as fp:
+        data = fp.read(_HEADER.size)
+    if len(data) < _HEADER.size:
+        raise ValueError("%s: incomplete header" % path)
+
+    magic, version, header_bytes, ns, nr, nc = _HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("%s is not a QtPlaskin binary data file" % path)
+    if version != VERSION:
+        raise ValueError("%s: unsupported version %d" % (path, version))
+    if header_bytes % 8 or header_bytes < _HEADER.size:
+        raise ValueError("%s: invalid header size %d" % (path, header_bytes))
+    return header_bytes, ns, nr, nc
+
+
+class BinaryWriter(object):
+    """ Writes a binary data file, one row at a time. """
+
+    def __init__(self, path, n_species, n_reactions, n_conditions):
+        self.ncols = 1 + n_species + n_reactions + n_conditions
+        self.fp = open(path, 'wb')
+        self.fp.write(pack_header(n_species, n_reactions, n_conditions))
+
+    def append(self, t, density, rates, conditions):
+        """ Appends one row, or several if t is an array. """
+        t = np.atleast_1d(t)
+        rows = np.column_stack([t, np.reshape(density, (len(t), -1)),
+                                np.reshape(rates, (len(t), -1)),
+                                np.reshape(conditions, (len(t), -1))])
+        if rows.shape[1] != self.ncols:
+            raise ValueError("Expected %d values per row, got %d"
+                             % (self.ncols, rows.shape[1]))
+        self.fp.write(np.ascontiguousarray(rows, dtype=DTYPE).tobytes())
+
+    def flush(self):
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def map_rows(path, header_bytes, ncols):
+    """ Memory-maps the complete records of path.  Returns an array of shape
+    (rows, ncols), with no rows if there is none. """
+    nrows = (os.path.getsize(path) - header_bytes) // (ncols * DTYPE.itemsize)
+    if nrows <= 0:
+        return np.empty((0, ncols), dtype=DTYPE)
+    return np.memmap(path, dtype=DTYPE, mode='r', offset=header_bytes,
+                     shape=(nrows, ncols))
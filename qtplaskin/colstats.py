@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Summary statistics of the columns of densities, rates and conditions.
+
+For each column:
+
+    min        smallest finite value
+    max        largest finite value
+    t_max      time of the largest finite value
+    integral   time integral (trapezoidal; non-finite values count as 0)
+    final      last value
+    nonfinite  number of NaN or infinite values
+
+They are updated as rows are appended, so a growing run only goes through
+its new rows, and can be stored (see ModelData.save and the binary cache
+of DirectoryData).  `select` filters and sorts columns by them, with
+conditions such as 'max > 1e10'.
+"""
+
+import operator
+import re
+
+import numpy as np
+
+STATS = ('min', 'max', 't_max', 'integral', 'final', 'nonfinite')
+
+# Rows processed at once, to bound the temporary arrays
+BLOCK_ROWS = 65536
+
+_OPERATORS = {'<': operator.lt, '<=': operator.le,
+              '>': operator.gt, '>=': operator.ge,
+              '==': operator.eq, '=': operator.eq, '!=': operator.ne}
+
+# e.g. 'max > 1e10', 'max density >= 1e10', 'nonfinite != 0'
+_CONDITION = re.compile(r'^\s*([a-z_]+)(?:\s+[a-z]+)?\s*(<=|>=|==|!=|<|>|=)'
+                        r'\s*([-+0-9.eEinfa]+)\s*$', re.IGNORECASE)
+
+
+class ColumnStats(object):
+    """ Statistics of ncols columns, as arrays named after STATS. """
+
+    def __init__(self, ncols):
+        self.nrows = 0
+        self.t_last = np.nan
+        self.min = np.full(ncols, np.inf)
+        self.max = np.full(ncols, -np.inf)
+        self.t_max = np.full(ncols, np.nan)
+        self.integral = np.zeros(ncols)
+        self.final = np.full(ncols, np.nan)
+        self.nonfinite = np.zeros(ncols, dtype=np.int64)
+
+    def copy(self):
+        new = ColumnStats(0)
+        new.__dict__.update((k, v.copy() if isinstance(v, np.ndarray) else v)
+                            for k, v in self.__dict__.items())
+        return new
+
+    def update(self, t, values):
+        """ Adds rows with times t and values, a (len(t), ncols) array.
+        Returns self. """
+        for i in range(0, len(t), BLOCK_ROWS):
+            self._update(np.asarray(t[i:i + BLOCK_ROWS], dtype='d'),
+                         np.asarray(values[i:i + BLOCK_ROWS], dtype='d'))
+        return self
+
+    def _update(self, t, v):
+        finite = np.isfinite(v)
+        self.nonfinite += (~finite).sum(axis=0)
+        self.min = np.minimum(self.min, np.min(v, axis=0, where=finite,
+                                               initial=np.inf))
+
+        masked = np.where(finite, v, -np.inf)
+        imax = np.argmax(masked, axis=0)
+        vmax = masked[imax, np.arange(v.shape[1])]
+        better = vmax > self.max
+        self.t_max = np.where(better, t[imax], self.t_max)
+        self.max = np.where(better, vmax, self.max)
+
+        # Trapezoids, starting from the last row of the previous update
+        z = np.where(finite, v, 0)
+        if self.nrows:
+            last = np.where(np.isfinite(self.final), self.final, 0)
+            t = np.r_[self.t_last, t]
+            z = np.vstack((last, z))
+        if len(t) > 1:
+            self.integral += (0.5 * (z[1:] + z[:-1])
+                              * np.diff(t)[:, None]).sum(axis=0)
+
+        self.final = v[-1].copy()
+        self.t_last = float(t[-1])
+        self.nrows += v.shape[0]
+
+    def to_array(self):
+        """ A (len(STATS), ncols) array with the statistics. """
+        return np.array([getattr(self, k) for k in STATS], dtype='d')
+
+    @classmethod
+    def from_array(cls, a, nrows, t_last):
+        """ The inverse of `to_array`; nrows and t_last are those of the
+        rows the statistics come from, needed to update them. """
+        new = cls(a.shape[1])
+        for k, row in zip(STATS, np.asarray(a, dtype='d')):
+            setattr(new, k, row.copy())
+        new.nonfinite = new.nonfinite.astype(np.int64)
+        new.nrows, new.t_last = int(nrows), float(t_last)
+        return new
+
+
+def parse_condition(text):
+    """ Returns (stat, operator, value) from a condition such as
+    'max > 1e10' or 'max density > 1e10'.  Raises ValueError if it is not
+    one. """
+    m = _CONDITION.match(text)
+    if m is None:
+        raise ValueError("Invalid condition %r; use e.g. 'max > 1e10'"
+                         % text)
+    stat, op, value = m.groups()
+    stat = stat.lower()
+    if stat not in STATS:
+        raise ValueError("Unknown statistic %r (one of %s)"
+                         % (stat, ', '.join(STATS)))
+    return stat, _OPERATORS[op], float(value)
+
+
+def select(stats, conditions='', sort=None, descending=True):
+    """ The indices of the columns of stats that meet all the conditions
+    (separated by ';' or 'and'), sorted by the statistic sort if given. """
+    keep = np.ones(len(stats.min), dtype=bool)
+    for text in re.split(r';|\band\b', conditions or ''):
+        if text.strip():
+            stat, op, value = parse_condition(text)
+            with np.errstate(invalid='ignore'):
+                keep &= op(getattr(stats, stat), value)
+
+    indices = np.flatnonzero(keep)
+    if sort is not None:
+        if sort not in STATS:
+            raise ValueError("Unknown statistic %r (one of %s)"
+                             % (sort, ', '.join(STATS)))
+        key = getattr(stats, sort)[indices].astype('d')
+        if descending:
+            key = -key
+        # Stable, and NaN last
+        indices = indices[np.argsort(key, kind='stable')]
+    return indices
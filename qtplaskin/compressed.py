@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Transparent reading of compressed output files.
+
+Finished runs are often archived with their files compressed, e.g.
+qt_rates.txt.gz.  `find_file` locates the compressed variant of a file
+when the plain one does not exist and `iter_chunks` decompresses it in a
+separate thread, so that decompression overlaps with parsing and nothing
+is written to disk.
+
+gzip (.gz) and xz (.xz) are supported by the standard library; zstandard
+(.zst) needs the zstandard package.
+"""
+
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+
+def _open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise IOError("Reading %s needs the zstandard package" % path)
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                       closefd=True)
+
+
+OPENERS = {'.gz': gzip.open,
+           '.xz': lzma.open,
+           '.zst': _open_zstd}
+
+# Decompressed chunks that may wait in the queue for the parser
+QUEUE_CHUNKS = 4
+
+
+def find_file(dirname, fname):
+    """ Returns the path of fname in dirname or, if it does not exist, of
+    its compressed variant.  If there is neither, returns the plain path. """
+    path = os.path.join(dirname, fname)
+    if os.path.exists(path):
+        return path
+    for suffix in OPENERS:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+
+def is_compressed(path):
+    return os.path.splitext(path)[1] in OPENERS
+
+
+def open_file(path):
+    """ Opens path for reading in binary mode, decompressing it if needed. """
+    ext = os.path.splitext(path)[1]
+    if ext in OPENERS:
+        return OPENERS[ext](path)
+    return open(path, 'rb')
+
+
+def open_text(path):
+    return io.TextIOWrapper(open_file(path), encoding='ascii',
+                            errors='replace')
+
+
+def iter_chunks(path, chunk_bytes):
+    """ Yields the decompressed contents of path in chunks of about
+    chunk_bytes, decompressed ahead by a background thread. """
+    q = queue.Queue(maxsize=QUEUE_CHUNKS)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            with open_file(path) as fp:
+                while not stop.is_set():
+                    chunk = fp.read(chunk_bytes)
+                    if not chunk:
+                        break
+                    q.put(chunk)
+            q.put(None)
+        except Exception as e:
+            q.put(e)
+
+    thread = threading.Thread(target=produce, name='decompress %s' % path)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            chunk = q.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        # Let the thread finish if the consumer gave up early
+        stop.set()
+        while thread.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                thread.join(0.01)
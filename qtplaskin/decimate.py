@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Decimation of the rows of the data files while they are parsed.
+
+A decimator receives the parsed rows (time in the first column) in blocks,
+as they come out of the parser, and returns the rows to keep, so that the
+full arrays never exist.  The choice only depends on the row number and the
+time, so the densities, rates and conditions of a run, decimated
+separately, keep the same rows.
+
+    'stride'  keeps one row out of n.
+    'log'     keeps the first row in each of n equal intervals per decade of
+              time (and the first row, e.g. t = 0).
+    'peak'    reduces each bucket of n rows to two rows with the minimum and
+              the maximum of each column, in the order in which they
+              happened, at the times of the first and last rows of the
+              bucket.  Short peaks, e.g. of the rates, are not lost.
+"""
+
+import numpy as np
+
+MODES = ('stride', 'log', 'peak')
+
+
+def make_decimator(mode, n):
+    """ Returns a new decimator of the given mode, or None if mode is None. """
+    if mode is None:
+        return None
+    if mode not in DECIMATORS:
+        raise ValueError("decimate must be one of %s (got %r)"
+                         % (', '.join(map(repr, MODES)), mode))
+    if int(n) < 1:
+        raise ValueError("The decimation factor must be positive (got %r)"
+                         % n)
+    return DECIMATORS[mode](int(n))
+
+
+class Decimator(object):
+    """ Base class of the decimators.
+
+    feed(rows) consumes rows for good and returns those to keep.
+    peek(rows) returns the rows that would be kept if the data ended now,
+    including rows still held by the decimator and, if given, rows that
+    may change (e.g. a line that is still being written); it does not
+    consume them.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        # Number of rows consumed so far
+        self.seen = 0
+
+    def feed(self, rows):
+        raise NotImplementedError
+
+    def peek(self, rows=None):
+        if rows is None:
+            return None
+        state = self.__dict__.copy()
+        try:
+            return self.feed(rows)
+        finally:
+            self.__dict__.update(state)
+
+
+class StrideDecimator(Decimator):
+    def feed(self, rows):
+        first = (-self.seen) % self.n
+        self.seen += rows.shape[0]
+        return rows[first::self.n]
+
+
+class LogDecimator(Decimator):
+    def reset(self):
+        super(LogDecimator, self).reset()
+        self.last_bin = None
+
+    def feed(self, rows):
+        self.seen += rows.shape[0]
+        if rows.shape[0] == 0:
+            return rows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bins = np.floor(np.log10(rows[:, 0]) * self.n)
+        # t <= 0 (and NaN) all fall in the lowest bin
+        bins[~(rows[:, 0] > 0)] = -np.inf
+
+        prev = np.r_[np.nan if self.last_bin is None else self.last_bin,
+                     bins[:-1]]
+        keep = bins != prev
+        self.last_bin = bins[-1]
+        return rows[keep]
+
+
+class PeakDecimator(Decimator):
+    def reset(self):
+        super(PeakDecimator, self).reset()
+        self.held = None
+
+    def feed(self, rows):
+        self.seen += rows.shape[0]
+        if self.held is not None and self.held.shape[0]:
+            rows = np.concatenate((self.held, rows))
+        nfull = (rows.shape[0] // self.n) * self.n
+        self.held = rows[nfull:].copy()
+        return self._reduce(rows[:nfull])
+
+    def peek(self, rows=None):
+        held = self.held if self.held is not None else None
+        if rows is not None:
+            held = rows if held is None else np.concatenate((held, rows))
+        if held is None or held.shape[0] == 0:
+            return None
+        return self._reduce(held, nbucket=held.shape[0])
+
+    def _reduce(self, rows, nbucket=None):
+        """ Two rows per bucket of nbucket (default n) rows. """
+        nbucket = nbucket or self.n
+        if rows.shape[0] == 0:
+            return rows
+        if nbucket == 1:
+            return rows
+        b = rows.reshape(-1, nbucket, rows.shape[1])
+        imin = np.argmin(b[:, :, 1:], axis=1)
+        imax = np.argmax(b[:, :, 1:], axis=1)
+        vmin = np.take_along_axis(b[:, :, 1:], imin[:, None, :], axis=1)[:, 0]
+        vmax = np.take_along_axis(b[:, :, 1:], imax[:, None, :], axis=1)[:, 0]
+        min_first = imin <= imax
+
+        out = np.empty((b.shape[0], 2, rows.shape[1]), dtype=rows.dtype)
+        out[:, 0, 0] = b[:, 0, 0]
+        out[:, 1, 0] = b[:, -1, 0]
+        out[:, 0, 1:] = np.where(min_first, vmin, vmax)
+        out[:, 1, 1:] = np.where(min_first, vmax, vmin)
+        return out.reshape(-1, rows.shape[1])
+
+
+DECIMATORS = {'stride': StrideDecimator,
+              'log': LogDecimator,
+              'peak': PeakDecimator}
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Compression of the HDF5 files written by `ModelData.save`.
+
+    'gzip'   deflate, levels 0-9 (default 4).  Readable everywhere.
+    'lzf'    much faster than gzip, with a lower ratio; no levels.
+    'blosc'  blosc with its zstd compressor, levels 0-9 (default 5).
+    'zstd'   zstandard, levels 1-22 (default 3).
+    'none'   no compression.
+
+blosc and zstd need the hdf5plugin package, which is imported here so that
+HDF5Data can also read files written with them.
+
+The shuffle filter groups the bytes of the numbers by significance, which
+compresses much better for a small cost; blosc shuffles by itself.
+
+chunks is the shape of the chunks of the 2D datasets of layout 2,
+(rows, columns); the datasets of layout 1 only use the rows.  By default
+`chunk_shape` chooses a few columns and CHUNK_BYTES worth of rows.
+
+The benchmark command
+
+    qtplaskin-codecs RUN [-c CODEC[:LEVEL]]... [-o DIR]
+
+(also python -m qtplaskin.h5codecs) saves the run RUN, a directory or a
+HDF5 file, with each codec and compares the write time, the time needed to
+read all columns back and the compression ratio.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import contextlib
+import io
+import zlib
+
+import numpy as np
+
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+CODECS = ('gzip', 'lzf', 'blosc', 'zstd', 'none')
+
+# Codecs that need hdf5plugin
+PLUGIN_CODECS = ('blosc', 'zstd')
+
+# Valid and default levels
+LEVELS = {'gzip': (0, 9, 4),
+          'blosc': (0, 9, 5),
+          'zstd': (1, 22, 3)}
+
+# Bytes per chunk of the 2D datasets, and most columns per chunk
+CHUNK_BYTES = 256 * 1024
+CHUNK_COLUMNS = 8
+
+
+def available_codecs():
+    """ The codecs that can be used here. """
+    return [c for c in CODECS
+            if c not in PLUGIN_CODECS or hdf5plugin is not None]
+
+
+def chunk_shape(shape, itemsize):
+    """ Chunks of a (rows, columns) dataset of layout 2: a few columns and
+    as many rows as fit in CHUNK_BYTES, so that reading one column over
+    the whole run decompresses little more than that column. """
+    nrows, ncols = shape
+    cols = max(1, min(ncols, CHUNK_COLUMNS))
+    rows = max(1, min(nrows, CHUNK_BYTES // (cols * itemsize)))
+    return rows, cols
+
+
+class Compression(object):
+    """ Compression settings of the datasets of a HDF5 file. """
+
+    def __init__(self, codec='gzip', level=None, shuffle=True, chunks=None):
+        if codec not in CODECS:
+            raise ValueError("codec must be one of %s (got %r)"
+                             % (', '.join(map(repr, CODECS)), codec))
+        if codec in PLUGIN_CODECS and hdf5plugin is None:
+            raise ValueError("The %s codec needs the hdf5plugin package"
+                             % codec)
+        if level is not None:
+            if codec not in LEVELS:
+                raise ValueError("The %s codec has no levels" % codec)
+            lo, hi, default = LEVELS[codec]
+            if not lo <= int(level) <= hi:
+                raise ValueError("The level of %s must be between %d and %d "
+                                 "(got %r)" % (codec, lo, hi, level))
+            level = int(level)
+        if chunks is not None:
+            chunks = tuple(int(c) for c in chunks)
+            if len(chunks) != 2 or min(chunks) < 1:
+                raise ValueError("chunks must be two positive numbers "
+                                 "(got %r)" % (chunks, ))
+
+        self.codec = codec
+        self.level = level
+        self.shuffle = bool(shuffle)
+        self.chunks = chunks
+
+    @classmethod
+    def parse(cls, spec, **kwargs):
+        """ Compression from a string CODEC or CODEC:LEVEL. """
+        codec, _, level = spec.partition(':')
+        return cls(codec, level or None, **kwargs)
+
+    def __str__(self):
+        if self.level is None:
+            return self.codec
+        return '%s:%d' % (self.codec, self.level)
+
+    def _filters(self):
+        if self.codec == 'none':
+            return {}
+        if self.codec == 'gzip':
+            opts = dict(compression='gzip',
+                        compression_opts=LEVELS['gzip'][2]
+                        if self.level is None else self.level)
+        elif self.codec == 'lzf':
+            opts = dict(compression='lzf')
+        elif self.codec == 'blosc':
+            opts = dict(hdf5plugin.Blosc(
+                cname='zstd',
+                clevel=LEVELS['blosc'][2] if self.level is None
+                else self.level,
+                shuffle=hdf5plugin.Blosc.SHUFFLE if self.shuffle
+                else hdf5plugin.Blosc.NOSHUFFLE))
+            return opts
+        else:
+            opts = dict(hdf5plugin.Zstd(
+                clevel=LEVELS['zstd'][2] if self.level is None
+                else self.level))
+        opts['shuffle'] = self.shuffle
+        return opts
+
+    def options(self, shape, itemsize=8):
+        """ Keyword arguments of h5py's create_dataset for a dataset of the
+        given shape (1D or 2D). """
+        if 0 in shape:
+            # HDF5 has no chunks of empty datasets
+            return {}
+
+        if len(shape) == 2:
+            chunks = self.chunks or chunk_shape(shape, itemsize)
+        elif self.chunks is not None:
+            chunks = self.chunks[:1]
+        else:
+            chunks = None
+        if chunks is not None:
+            chunks = tuple(max(1, min(c, n)) for c, n in zip(chunks, shape))
+        elif self.codec == 'none':
+            return {}
+
+        opts = self._filters()
+        if chunks is not None:
+            opts['chunks'] = chunks
+        return opts
+
+
+def can_precompress(compression):
+    """ Whether `compress_chunk` can compress for compression. """
+    return compression.codec == 'gzip'
+
+
+def compress_chunk(chunk, compression):
+    """ The bytes HDF5 stores for a complete chunk with gzip: the bytes of
+    chunk, shuffled if the shuffle filter is on, deflated.  zlib releases
+    the GIL, so several chunks can be compressed by a pool of threads. """
+    data = np.ascontiguousarray(chunk)
+    if compression.shuffle and data.dtype.itemsize > 1:
+        data = np.ascontiguousarray(
+            data.view(np.uint8).reshape(-1, data.dtype.itemsize).T)
+    level = LEVELS['gzip'][2] if compression.level is None \
+        else compression.level
+    return zlib.compress(data.tobytes(), level)
+
+
+def write_chunks(ds, block, col, compression, pool):
+    """ Writes block, some columns of the 2D dataset ds starting at col (the
+    first column of a chunk), compressing its chunks in pool and writing
+    them directly to the file. """
+    rows, cols = ds.chunks
+    nrows = -(-block.shape[0] // rows) * rows
+    # Chunks are always stored complete
+    padded = np.zeros((nrows, cols), dtype=ds.dtype)
+    padded[:block.shape[0], :block.shape[1]] = block
+
+    starts = range(0, block.shape[0], rows)
+    compressed = pool.map(
+        lambda r: compress_chunk(padded[r:r + rows], compression), starts)
+    for r, data in zip(starts, compressed):
+        ds.id.write_direct_chunk((r, col), data)
+
+
+def benchmark(data, compressions, dirname):
+    """ Saves data with each of compressions in dirname.  Returns a list
+    of (compression, write seconds, read seconds, bytes, ratio), where ratio
+    is the size of the uncompressed data over the size of the file. """
+    from qtplaskin.modeldata import HDF5Data
+
+    raw = 8 * len(data.t) * (1 + len(data.species) + len(data.reactions)
+                             + len(data.conditions))
+    results = []
+    for c in compressions:
+        fname = os.path.join(dirname, 'bench-%s.h5' % str(c).replace(':', '-'))
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            data.save(fname, compression=c)
+        t1 = time.perf_counter()
+
+        h5 = HDF5Data(fname, cache_bytes=0)
+        for names, column in ((h5.species, h5.density),
+                              (h5.reactions, h5.rate),
+                              (h5.conditions, h5.condition)):
+            for i in range(len(names)):
+                column(i + 1)
+        h5.close()
+        t2 = time.perf_counter()
+
+        size = os.path.getsize(fname)
+        os.remove(fname)
+        results.append((c, t1 - t0, t2 - t1, size, raw / float(size)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='qtplaskin-codecs',
+        description="Compare the HDF5 compression codecs on a run.")
+    parser.add_argument('run', help="Directory or HDF5 file of the run")
+    parser.add_argument('-c', '--codec', action='append', dest='codecs',
+                        metavar='CODEC[:LEVEL]',
+                        help="Codec to try (default: all available ones)")
+    parser.add_argument('--no-shuffle', action='store_false', dest='shuffle',
+                        help="Disable the shuffle filter")
+    parser.add_argument('--chunks', type=int, nargs=2,
+                        metavar=('ROWS', 'COLUMNS'),
+                        help="Shape of the chunks")
+    parser.add_argument('-o', '--output-dir',
+                        help="Where to write the files (default: a "
+                             "temporary directory)")
+    opts = parser.parse_args(argv)
+
+    from qtplaskin.modeldata import FastDirData, HDF5Data
+    if os.path.isdir(opts.run):
+        data = FastDirData(opts.run)
+    else:
+        data = HDF5Data(opts.run)
+
+    compressions = [Compression.parse(c, shuffle=opts.shuffle,
+                                      chunks=opts.chunks)
+                    for c in opts.codecs or available_codecs()]
+
+    print("%-10s %10s %10s %10s %8s" % ('codec', 'write [s]', 'read [s]',
+                                        'size [MB]', 'ratio'))
+    with tempfile.TemporaryDirectory(dir=opts.output_dir) as dirname:
+        for c, write, read, size, ratio in benchmark(data, compressions,
+                                                     dirname):
+            print("%-10s %10.3f %10.3f %10.2f %8.2f"
+                  % (c, write, read, size / 1e6, ratio))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming HDF5 writer for runs in progress.
+
+`HDF5Writer` writes a file of layout 2 (see `qtplaskin.modeldata.HDF5Data`)
+while the run goes on, instead of all at once at the end with
+`ModelData.save`.  main/t, main/density, main/rate and main/condition are
+chunked datasets with an unlimited number of rows; each `append` extends
+them with a batch of rows and flushes them, so a crash only loses the rows
+that were not appended yet.
+
+The file is written in SWMR (single writer, multiple readers) mode, so that
+HDF5Data can read it at the same time and pick up the new rows on
+`update`.  SWMR does not allow new groups, datasets or attributes, so all
+of them, with the name tables and the source matrix, are written when the
+file is created.  The quantities are extended and flushed before t, so the
+rows of t are always complete in the rest of the datasets.
+
+Every flush compresses the chunks with new rows again, complete or not, so
+the chunks are short (CHUNK_ROWS rows) and appends of a multiple of their
+rows are best: then each chunk is compressed once.  Appending 100 rows at
+a time to chunks of 4096 rows was 25 times slower than writing the whole
+run at once; appending whole chunks of 256 rows takes as long as that.
+"""
+
+import sys
+import time
+
+import numpy as np
+import h5py
+
+from qtplaskin.modeldata import HDF5_VERSION, HDF5_QUANTITIES
+from qtplaskin.h5codecs import Compression
+
+# Default rows of the chunks
+CHUNK_ROWS = 256
+
+
+class HDF5Writer(object):
+    """ Writes the rows of a run to the HDF5 file fname as they come.
+
+    species, reactions and conditions are the names of the columns and
+    compression a `qtplaskin.h5codecs.Compression` or a string such as
+    'gzip:9', like in `ModelData.save`.  The chunks have chunk_rows rows
+    (default: those of compression, or CHUNK_ROWS). """
+
+    def __init__(self, fname, species, reactions, conditions, source_matrix,
+                 metadata={}, compression=None, chunk_rows=None):
+        if compression is None:
+            compression = Compression()
+        elif isinstance(compression, str):
+            compression = Compression.parse(compression)
+        if chunk_rows is None:
+            chunk_rows = (compression.chunks[0] if compression.chunks
+                          else CHUNK_ROWS)
+        self.fname = fname
+        self.compression = compression
+        self.chunk_rows = int(chunk_rows)
+        self.nrows = 0
+
+        names = dict(species=species, reactions=reactions,
+                     conditions=conditions)
+
+        self.f = h5py.File(fname, 'w', libver='latest')
+        g = self.main = self.f.create_group('main')
+
+        for k, val in metadata.items():
+            g.attrs[k] = val
+
+        g.attrs['command'] = ' '.join(sys.argv)
+        g.attrs['timestamp'] = time.ctime()
+        g.attrs['format_version'] = HDF5_VERSION
+        g.attrs['compression'] = str(compression)
+
+        for quantity, table in HDF5_QUANTITIES:
+            g.create_dataset(table, data=list(names[table]),
+                             dtype=h5py.string_dtype())
+            g.create_dataset(quantity, dtype='d',
+                             **self._options(len(names[table])))
+        g.create_dataset('t', dtype='d', **self._options())
+        g.create_dataset('source_matrix', data=source_matrix,
+                         **compression.options(np.shape(source_matrix)))
+
+        self.f.swmr_mode = True
+
+    def _options(self, ncols=None):
+        """ Keyword arguments of create_dataset for an empty dataset with
+        unlimited rows and ncols columns (1D if ncols is None). """
+        rows = self.chunk_rows
+        if ncols is None:
+            opts = self.compression.options((rows, ))
+            opts.update(shape=(0, ), maxshape=(None, ), chunks=(rows, ))
+        else:
+            # HDF5 wants chunks no larger than the fixed dimensions
+            opts = self.compression.options((rows, max(ncols, 1)))
+            opts.update(shape=(0, ncols), maxshape=(None, ncols or None))
+        return opts
+
+    def append(self, t, density, rates, conditions):
+        """ Appends rows with times t and (len(t), columns) arrays of
+        densities, rates and conditions, and flushes them to the file. """
+        t = np.atleast_1d(np.asarray(t, dtype='d'))
+        n0, n1 = self.nrows, self.nrows + len(t)
+        blocks = dict(density=density, rate=rates, condition=conditions)
+        for quantity, table in HDF5_QUANTITIES:
+            shape = (len(t), self.main[quantity].shape[1])
+            blocks[quantity] = np.asarray(blocks[quantity], dtype='d')
+            if blocks[quantity].shape != shape:
+                raise ValueError("%s must have shape %r (got %r)"
+                                 % (quantity, shape, blocks[quantity].shape))
+
+        for quantity, block in blocks.items():
+            ds = self.main[quantity]
+            ds.resize(n1, axis=0)
+            ds[n0:n1] = block
+            ds.flush()
+
+        # Last, so that readers only see complete rows
+        ds = self.main['t']
+        ds.resize(n1, axis=0)
+        ds[n0:n1] = t
+        ds.flush()
+        self.nrows = n1
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
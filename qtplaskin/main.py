@@ -20,6 +20,7 @@ from builtins import range
 
 import sys
 import os
+import time
 from itertools import cycle
 import traceback
 
@@ -36,17 +37,21 @@ from PyQt5 import QtCore
 from PyQt5.QtCore import Qt
 
 from numpy import (array, zeros, nanmax, nanmin, where, isfinite,
-                   argsort, r_, isreal, logical_and)
+                   argsort, r_, isreal, logical_and, searchsorted)
 
 # import the MainWindow widget from the converted .ui files
 try:
     from .mainwindow import Ui_MainWindow
-    from .modeldata import HDF5Data, RealtimeData, DirectoryData, FastDirData, OldDirectoryData
+    from .modeldata import HDF5Data, RealtimeData, DirectoryData, FastDirData, OldDirectoryData, BinaryDirData, probe_directory, probe_options, SaveCancelled
     from .timeformatter import TimeFormatter
+    from .h5codecs import Compression, available_codecs, LEVELS
+    from .colstats import STATS, select
 except:
     from qtplaskin.mainwindow import Ui_MainWindow
-    from qtplaskin.modeldata import HDF5Data, RealtimeData, DirectoryData, FastDirData, OldDirectoryData
+    from qtplaskin.modeldata import HDF5Data, RealtimeData, DirectoryData, FastDirData, OldDirectoryData, BinaryDirData, probe_directory, probe_options, SaveCancelled
     from qtplaskin.timeformatter import TimeFormatter
+    from qtplaskin.h5codecs import Compression, available_codecs, LEVELS
+    from qtplaskin.colstats import STATS, select
 
 #import publib
 
@@ -66,6 +71,20 @@ LINE_WIDTH = 1.7
 DENS_THRESHOLD = 1e-10
 RATE_THRESHOLD = 1e-20
 
+
+# The points of each kind of line that are plotted
+def _finite(y):
+    return logical_and(isreal(y), isfinite(y))
+
+
+def _above_dens_threshold(y):
+    return y > DENS_THRESHOLD
+
+
+def _above_rate_threshold(y):
+    return y > RATE_THRESHOLD
+
+
 CONDITIONS_PRETTY_NAMES = {
     'gas_temperature': "Gas temperature [K]",
     'Tgas_K': "Gas temperature [K]",
@@ -82,6 +101,116 @@ CONDITIONS_PRETTY_NAMES = {
     'elec_power_inelastic_n': "Electron reduced inelastic power [eV cm$^\mathdefault{3}$s$^\mathdefault{-1}$]"}
 
 
+class SaveOptionsDialog(QtWidgets.QDialog):
+    """ Dialog with the compression settings of a HDF5 file. """
+
+    def __init__(self, parent=None):
+        super(SaveOptionsDialog, self).__init__(parent)
+        self.setWindowTitle("HDF5 compression")
+
+        self.codec = QtWidgets.QComboBox()
+        self.codec.addItems(available_codecs())
+        self.level = QtWidgets.QSpinBox()
+        self.default_level = QtWidgets.QCheckBox("Default")
+        self.default_level.setChecked(True)
+        self.shuffle = QtWidgets.QCheckBox("Shuffle")
+        self.shuffle.setChecked(True)
+        self.auto_chunks = QtWidgets.QCheckBox("Automatic")
+        self.auto_chunks.setChecked(True)
+        self.chunk_rows = QtWidgets.QSpinBox()
+        self.chunk_rows.setRange(1, 10 ** 8)
+        self.chunk_rows.setValue(4096)
+        self.chunk_cols = QtWidgets.QSpinBox()
+        self.chunk_cols.setRange(1, 10 ** 6)
+        self.chunk_cols.setValue(8)
+
+        level = QtWidgets.QHBoxLayout()
+        level.addWidget(self.level)
+        level.addWidget(self.default_level)
+        chunks = QtWidgets.QHBoxLayout()
+        chunks.addWidget(self.chunk_rows)
+        chunks.addWidget(QtWidgets.QLabel("rows x"))
+        chunks.addWidget(self.chunk_cols)
+        chunks.addWidget(QtWidgets.QLabel("columns"))
+        chunks.addWidget(self.auto_chunks)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        form = QtWidgets.QFormLayout(self)
+        form.addRow("Codec", self.codec)
+        form.addRow("Level", level)
+        form.addRow("", self.shuffle)
+        form.addRow("Chunks", chunks)
+        form.addRow(buttons)
+
+        self.codec.currentTextChanged.connect(self._update_widgets)
+        self.default_level.toggled.connect(self._update_widgets)
+        self.auto_chunks.toggled.connect(self._update_widgets)
+        self._update_widgets()
+
+    def _update_widgets(self, *args):
+        codec = self.codec.currentText()
+        has_levels = codec in LEVELS
+        self.default_level.setEnabled(has_levels)
+        self.level.setEnabled(has_levels
+                              and not self.default_level.isChecked())
+        if has_levels:
+            lo, hi, default = LEVELS[codec]
+            self.level.setRange(lo, hi)
+            if self.default_level.isChecked():
+                self.level.setValue(default)
+        self.shuffle.setEnabled(codec != 'none')
+        for w in (self.chunk_rows, self.chunk_cols):
+            w.setEnabled(not self.auto_chunks.isChecked())
+
+    def compression(self):
+        """ The selected `Compression`. """
+        codec = self.codec.currentText()
+        level = None
+        if codec in LEVELS and not self.default_level.isChecked():
+            level = self.level.value()
+        chunks = None
+        if not self.auto_chunks.isChecked():
+            chunks = (self.chunk_rows.value(), self.chunk_cols.value())
+        return Compression(codec, level, self.shuffle.isChecked(), chunks)
+
+
+class SaveThread(QtCore.QThread):
+    """ Saves the data to a HDF5 file in the background.  progress is
+    emitted with the number of columns written and the total. """
+
+    progress = QtCore.pyqtSignal(int, int)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, data, fname, compression, parent=None):
+        super(SaveThread, self).__init__(parent)
+        self.data = data
+        self.fname = fname
+        self.compression = compression
+        self.cancelled = False
+        self.error = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self.cancelled
+
+    def run(self):
+        try:
+            self.data.save(self.fname, compression=self.compression,
+                           progress=self._progress)
+        except SaveCancelled:
+            pass
+        except Exception as e:
+            self.error = str(e)
+            self.failed.emit(self.error)
+
+
 class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     """Customization for Qt Designer created window"""
 
@@ -104,6 +233,14 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                   self.condList]:
             w.horizontalHeader().setVisible(True)
 
+        # Filter and sort the lists by the statistics of their columns
+        self.list_filters = {}
+        for quantity, table, layout in [
+                ('density', self.speciesList, self.verticalLayout_3),
+                ('rate', self.reactList, self.verticalLayout_4),
+                ('condition', self.condList, self.verticalLayout_6)]:
+            self._add_list_filter(quantity, table, layout)
+
         self.plot_widgets = [self.condWidget,
                              self.densWidget,
                              self.reactWidget,
@@ -111,6 +248,7 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.cursors = []
 
         self.update_timer = QtCore.QTimer()
+        self.save_thread = None
         self.latest_dir = "."
 
         # connect the signals with the slots
@@ -127,6 +265,79 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.actionSave.triggered.connect(self.save_to_file)
         self.actionQuit.triggered.connect(QtWidgets.qApp.quit)
 
+    def _add_list_filter(self, quantity, table, layout):
+        """ Adds a filter, e.g. 'max > 1e10', and a sort order above
+        table. """
+        edit = QtWidgets.QLineEdit(self)
+        edit.setPlaceholderText("Filter, e.g. max > 1e10")
+        edit.setToolTip("Conditions on the statistics of each column (%s) "
+                        "separated by ';'" % ', '.join(STATS))
+        edit.setClearButtonEnabled(True)
+        combo = QtWidgets.QComboBox(self)
+        combo.addItem("Index", None)
+        for stat in STATS:
+            combo.addItem("%s \u2193" % stat, stat)
+        combo.setToolTip("Sort by")
+
+        row = QtWidgets.QHBoxLayout()
+        row.addWidget(edit)
+        row.addWidget(combo)
+        layout.insertLayout(layout.indexOf(table), row)
+
+        edit.editingFinished.connect(lambda: self.filter_list(quantity))
+        combo.currentIndexChanged.connect(lambda i: self.filter_list(quantity))
+        self.list_filters[quantity] = (table, edit, combo)
+
+    def _envelope(self, widget, quantity, key, tmin=None, tmax=None):
+        """ (t, values) of column key of quantity reduced to about as many
+        points as widget can show (see `ModelData.envelope`). """
+        return self.data.envelope(quantity, key, tmin, tmax,
+                                  max_points=widget.max_points())
+
+    def _plot_envelope(self, widget, ax, quantity, key, keep, **kwargs):
+        """ Plots the envelope of column key of quantity on ax, without the
+        points where keep(values) is false, and registers the line so that
+        it is refined when the axes are zoomed (see `_follow_zoom`). """
+        t, values = self._envelope(widget, quantity, key)
+        flt = keep(values)
+        line, = ax.plot(t[flt], values[flt], **kwargs)
+        widget.envelopes.append((line, quantity, key, keep, t, values))
+        return line
+
+    def _follow_zoom(self, widget):
+        """ Computes the envelopes of widget again for the visible times
+        whenever its x axis changes, e.g. with a zoom of the toolbar. """
+        for ax in widget.axes:
+            ax.callbacks.connect('xlim_changed',
+                                 lambda ax: self._zoom_envelopes(widget, ax))
+
+    def _zoom_envelopes(self, widget, ax):
+        """ Replaces the visible part of the envelopes on ax with one that
+        has about as many points as widget can show, or with the rows
+        themselves if there are fewer.  The rest keeps the envelope of the
+        whole run, which the home button goes back to. """
+        tmin, tmax = ax.get_xlim()
+        # Include the rows just outside, so that the lines reach the edges
+        t = self.data.t
+        i0 = max(0, searchsorted(t, tmin) - 1)
+        i1 = min(len(t) - 1, searchsorted(t, tmax))
+        if i1 < i0:
+            return
+        t0, t1 = t[i0], t[i1]
+        for line, quantity, key, keep, t_all, values_all in widget.envelopes:
+            if line.axes is not ax:
+                continue
+            t, values = self._envelope(widget, quantity, key, t0, t1)
+            if len(t):
+                before, after = t_all < t[0], t_all > t[-1]
+                t = r_[t_all[before], t, t_all[after]]
+                values = r_[values_all[before], values, values_all[after]]
+            else:
+                t, values = t_all, values_all
+            flt = keep(values)
+            line.set_data(t[flt], values[flt])
+        widget.canvas.draw_idle()
+
     def print_status(self, string):
         ''' Print to status bar
         Useful for debugging'''
@@ -207,6 +418,8 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         if os.path.exists(path):
             if os.path.isdir(path):
                 self._import_from_directory(path)
+            elif os.path.basename(path) == BinaryDirData.F_DATA:
+                self._import_from_directory(os.path.dirname(path))
             else:
                 # Let us allow the user to import files with any extension:
                 # if they are not in hdf5 format and exception will be raised
@@ -262,13 +475,14 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             name = item[1]
             y = array(self.data.condition(item[0]))
             condition_name = self.data.conditions[item[0] - 1]
-            
-            flt = logical_and(isreal(y), isfinite(y))
             label = CONDITIONS_PRETTY_NAMES.get(condition_name, condition_name)
-            lines.append(self.condWidget.axes[0].plot(self.data.t[flt], y[flt], lw=LINE_WIDTH,
-                                                      label=name, #scalex=False,
-                                                      zorder=10,
-                                                      c=next(citer))[0])
+            lines.append(self._plot_envelope(self.condWidget,
+                                             self.condWidget.axes[0],
+                                             'condition', item[0], _finite,
+                                             lw=LINE_WIDTH,
+                                             label=name, #scalex=False,
+                                             zorder=10,
+                                             c=next(citer)))
 
         self.condWidget.condAx.cursorlines = lines
         self.datacursor(self.condWidget)
@@ -276,6 +490,7 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.condWidget.set_scales(yscale='linear', xscale=self.xscale)
         self.condWidget.axes[0].set_xlabel("t [s]")
         self.condWidget.axes[0].set_ylabel(label)
+        self._follow_zoom(self.condWidget)
         
         # Reset former xrange
         if former_xrange is not None:
@@ -323,13 +538,15 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         # Loop over all selected species
         for item in iter_2_selected(self.speciesList):
             name = item[1]
-            dens = self.data.density(item[0])
-            flt = dens > DENS_THRESHOLD
-            lines.append(self.densWidget.axes[0].plot(self.data.t[flt], dens[flt],
-                                                      lw=LINE_WIDTH, scalex=False, 
-                                                      c=next(citer), label=name,
-                                                      zorder=10)[0])
-            self.densWidget.add_data(self.data.t, dens, name)
+            lines.append(self._plot_envelope(self.densWidget,
+                                             self.densWidget.axes[0],
+                                             'density', item[0],
+                                             _above_dens_threshold,
+                                             lw=LINE_WIDTH, scalex=False,
+                                             c=next(citer), label=name,
+                                             zorder=10))
+            self.densWidget.add_data(self.data.t, self.data.density(item[0]),
+                                     name)
 
         self.densWidget.densAx.cursorlines = lines
         self.datacursor(self.densWidget, unit='cm-3', labname='Spec.')
@@ -338,6 +555,7 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.densWidget.axes[0].set_xlabel("t [s]")
         self.densWidget.axes[0].set_ylabel("Density [cm$^\mathdefault{-3}$]")
         self.densWidget.axes[0].legend(loc=(1.05, 0.0), prop=dict(size=11))
+        self._follow_zoom(self.densWidget)
                 
         # Reset former xrange
         if former_xrange is not None:
@@ -395,16 +613,16 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         for i in icreation:
             name = self.data.reactions[i-1]
             rate = array(self.data.rate(i))
-            flt = rate > RATE_THRESHOLD
             label = "[%d] %s" % (i, name)
 
-            lines.append(self.sourceWidget.creationAx.plot(self.data.t[flt],
-                                                           rate[flt],
-                                                           c=next(citer),
-                                                           lw=LINE_WIDTH,
-                                                           label=label,
-                                                           scalex=False, 
-                                                           zorder=10)[0])
+            lines.append(self._plot_envelope(self.sourceWidget,
+                                             self.sourceWidget.creationAx,
+                                             'rate', i, _above_rate_threshold,
+                                             c=next(citer),
+                                             lw=LINE_WIDTH,
+                                             label=label,
+                                             scalex=False,
+                                             zorder=10))
 
             self.sourceWidget.add_data(self.data.t, rate, label)
         self.sourceWidget.creationAx.cursorlines = lines
@@ -414,16 +632,16 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         for i in idestruct:
             name = self.data.reactions[i-1]
             rate = array(self.data.rate(i))
-            flt = rate > RATE_THRESHOLD
             label = "[%d] %s" % (i, name)
 
-            lines.append(self.sourceWidget.removalAx.plot(self.data.t[flt],
-                                                          rate[flt],
-                                                          c=next(citer),
-                                                          lw=LINE_WIDTH,
-                                                          label=label,
-                                                          scalex=False, 
-                                                          zorder=10)[0])
+            lines.append(self._plot_envelope(self.sourceWidget,
+                                             self.sourceWidget.removalAx,
+                                             'rate', i, _above_rate_threshold,
+                                             c=next(citer),
+                                             lw=LINE_WIDTH,
+                                             label=label,
+                                             scalex=False,
+                                             zorder=10))
 
             self.sourceWidget.add_data(self.data.t, rate, "- " + label)
         self.sourceWidget.removalAx.cursorlines = lines
@@ -443,6 +661,7 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                                            prop=dict(size=9))
 
         self.sourceWidget.set_scales(yscale='log', xscale=self.xscale)
+        self._follow_zoom(self.sourceWidget)
 
         # Reset former xrange
         if former_xrange is not None:
@@ -489,15 +708,16 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         for item in iter_2_selected(self.reactList):
             name = item[1]
             rate = array(self.data.rate(item[0]))
-
-            flt = rate > RATE_THRESHOLD
             label = "[%d] %s" % (item[0], name)
 
-            lines.append(self.reactWidget.axes[0].plot(self.data.t[flt], rate[flt],
-                                                       c=next(citer),
-                                                       lw=LINE_WIDTH,
-                                                       label=label,
-                                                       zorder=10)[0])
+            lines.append(self._plot_envelope(self.reactWidget,
+                                             self.reactWidget.axes[0],
+                                             'rate', item[0],
+                                             _above_rate_threshold,
+                                             c=next(citer),
+                                             lw=LINE_WIDTH,
+                                             label=label,
+                                             zorder=10))
             self.reactWidget.add_data(self.data.t, rate, label)
 
         self.reactWidget.rateAx.cursorlines = lines
@@ -510,6 +730,7 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             "Rate [cm$^\mathdefault{-3}$s$^\mathdefault{-1}$]")
         self.reactWidget.axes[0].legend(loc=(1.025, 0.0),
                                         prop=dict(size=8))
+        self._follow_zoom(self.reactWidget)
 
         # Reset former xrange
         if former_xrange is not None:
@@ -556,54 +777,58 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self._import_from_directory(fname)
         self.latest_dir = fname
 
+    @property
+    def parallel(self):
+        if self.actionParallel_loading.isChecked():
+            return 'thread'
+        else:
+            return None
+
     def _import_from_directory(self, fname):
         try:
-            try:
-                self.data = FastDirData(fname)
-            except (MemoryError, ValueError, TypeError) as e:
-                em = QtWidgets.QErrorMessage(self)
-                em.setModal(True)
-                em.setWindowTitle("QtPlaskin: Error")
-                em.showMessage('''
-                    Failed to open directory. <br>
-                    {}: {}. <br>
-                    Now trying the old (slower) way.
-                    '''.format( type(e).__name__, str(e)))
-                em.exec_()
+            # Look at the files first, so that they are parsed only once
+            probe = probe_directory(fname, classes=(FastDirData,
+                                                    OldDirectoryData))
+            if probe['class'] is BinaryDirData:
+                self.data = BinaryDirData(fname)
+            else:
                 try:
-                    self.data = DirectoryData(fname)
-                except IOError as e:
+                    self.data = probe['class'](fname, parallel=self.parallel,
+                                               **probe_options(probe))
+                except (MemoryError, ValueError, TypeError) as e:
                     em = QtWidgets.QErrorMessage(self)
                     em.setModal(True)
+                    em.setWindowTitle("QtPlaskin: Error")
                     em.showMessage(
-                        ("Failed to open directory (%s).\n" % str(e))
-                        + "I will try now to import files in deprecated format.")
-                    # If we do not call exec_ here, two dialogs may appear at
-                    # the same time, confusing the user.
+                        "Failed to open directory.<br>{}: {}.<br>"
+                        "Now trying the old (slower) way.".format(
+                            type(e).__name__, str(e)))
                     em.exec_()
-                    self.data = OldDirectoryData(fname)
-            except IOError as e:
-                em = QtWidgets.QErrorMessage(self)
-                em.setModal(True)
-                em.showMessage(
-                    ("Failed to open directory (%s).\n" % str(e))
-                    + "I will try now to import files in deprecated format.")
-                # If we do not call exec_ here, two dialogs may appear at
-                # the same time, confusing the user.
-                em.exec_()
-                self.data = OldDirectoryData(fname)
+                    # The plain parser, without cache or probed layout
+                    plain = (OldDirectoryData
+                             if probe['class'] is OldDirectoryData
+                             else DirectoryData)
+                    self.data = plain(fname)
 
             self.set_location(fname)
             self.update_lists()
             self.clear()
-        except IOError as e:
+            self.print_status("Data files read with the %s engine"
+                              % self.data.engine)
+        except (IOError, MemoryError, ValueError, TypeError) as e:
             em = QtWidgets.QErrorMessage(self)
             em.setModal(True)
-            em.exec_()
+            em.setWindowTitle("QtPlaskin: Error")
             em.showMessage(
-                "Failed to open directory (%s).\n" % str(e))
+                "Failed to open directory.<br>{}: {}".format(
+                    type(e).__name__, str(e)))
+            em.exec_()
 
     def data_update(self):
+        if self.save_thread is not None:
+            # The data must not change while it is being saved
+            self.print_status("The data cannot be updated while it is saved")
+            return
         try:
             self.data.update()
         except AttributeError:
@@ -620,6 +845,11 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.update_source_graph()
         if self.reactWidget.axes:
             self.update_react_graph()
+
+        # The statistics may have changed, and with them filters and orders
+        for quantity, (table, edit, combo) in self.list_filters.items():
+            if edit.text().strip() or combo.currentData():
+                self.filter_list(quantity)
         
     def save_to_file(self):
         """opens a file select dialog"""
@@ -631,7 +861,61 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
         # if a file is selected
         if fname:
-            self.data.save(fname)
+            dialog = SaveOptionsDialog(self)
+            if dialog.exec_() != QtWidgets.QDialog.Accepted:
+                return
+            self.start_save(fname, dialog.compression())
+
+    def start_save(self, fname, compression):
+        """ Saves the data in a SaveThread, showing its progress and the
+        throughput (of uncompressed data) in a dialog that can cancel it. """
+        thread = SaveThread(self.data, fname, compression, self)
+        dialog = QtWidgets.QProgressDialog("Saving %s" % fname, "Cancel",
+                                           0, 0, self)
+        dialog.setWindowTitle("Saving")
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(thread.cancel)
+
+        start = time.time()
+        column_bytes = 8 * len(self.data.t)
+
+        def on_progress(done, total):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+            elapsed = time.time() - start
+            if elapsed > 0:
+                dialog.setLabelText("Saving %s\n%.1f MB/s" % (
+                    fname, done * column_bytes / elapsed / 1e6))
+
+        def on_failed(msg):
+            em = QtWidgets.QErrorMessage(self)
+            em.setModal(True)
+            em.showMessage("Could not save %s: %s" % (fname, msg))
+
+        def on_finished():
+            # Closing the dialog emits canceled
+            dialog.canceled.disconnect(thread.cancel)
+            dialog.close()
+            self.actionSave.setEnabled(True)
+            self.actionUpdate.setEnabled(True)
+            if thread.cancelled:
+                self.print_status("Saving %s was cancelled" % fname)
+            elif thread.error is None:
+                self.print_status("Saved %s in %.1f s"
+                                  % (fname, time.time() - start))
+            self.save_thread = None
+
+        thread.progress.connect(on_progress)
+        thread.failed.connect(on_failed)
+        thread.finished.connect(on_finished)
+
+        # The data must not change while it is being saved
+        self.actionSave.setEnabled(False)
+        self.actionUpdate.setEnabled(False)
+        self.save_thread = thread
+        thread.start()
 
     def export_data(self):
         """opens a file select dialog"""
@@ -676,29 +960,42 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         #self.reactions = sorted(self.data.reactions)
         #self.conditions = sorted(self.data.conditions)
 
-        def _populate(qtable, list, pretty_names={}):
-            for i in range(qtable.rowCount()):
-                qtable.removeRow(0)
-
-            for n, item in enumerate(list):
-                row = qtable.rowCount()
-                qtable.insertRow(row)
-                # The + 1 is to move to the FORTRAN/ZdPlaskin convention
-                nitem = QtWidgets.QTableWidgetItem(u'%4d' % (n + 1))
-                nitem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                nitem.setForeground(QtGui.QColor(160, 160, 160))
-                qtable.setItem(row, 0, nitem)
-
-                showed_item = pretty_names.get(item, item)
-                sitem = QtWidgets.QTableWidgetItem(showed_item)
-                sitem.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                qtable.setItem(row, 1, sitem)
-
-        _populate(self.speciesList, self.data.species)
         _populate(self.speciesSourceList, self.data.species)
-        _populate(self.reactList, self.data.reactions)
-        _populate(self.condList, self.data.conditions,
-                  pretty_names=CONDITIONS_PRETTY_NAMES)
+        for quantity, (table, edit, combo) in self.list_filters.items():
+            # Indices of other data
+            table.clearSelection()
+            self.filter_list(quantity)
+
+    def filter_list(self, quantity):
+        """ Fills the list of quantity with the columns that pass its
+        filter, in its sort order, and keeps the selected ones selected.
+        The statistics are only computed if there is a filter or an order.
+        """
+        if getattr(self, 'data', None) is None:
+            return
+        table, edit, combo = self.list_filters[quantity]
+        names = {'density': self.data.species,
+                 'rate': self.data.reactions,
+                 'condition': self.data.conditions}[quantity]
+        pretty_names = CONDITIONS_PRETTY_NAMES if quantity == 'condition' \
+            else {}
+
+        conditions, sort = edit.text().strip(), combo.currentData()
+        order = None
+        if conditions or sort:
+            try:
+                order = select(self.data.stats(quantity), conditions, sort)
+            except ValueError as e:
+                self.print_status(str(e))
+            else:
+                self.print_status("%d of %d shown" % (len(order), len(names)))
+
+        selected = set(n for n, name in iter_2_selected(table))
+        _populate(table, names, pretty_names, order)
+        for row in range(table.rowCount()):
+            if int(table.item(row, 0).text()) in selected:
+                table.setRangeSelected(QtWidgets.QTableWidgetSelectionRange(
+                    row, 0, row, table.columnCount() - 1), True)
 
     def clear(self):
         for w in self.plot_widgets:
@@ -708,6 +1005,28 @@ class DesignerMainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         pass
 
 
+def _populate(qtable, names, pretty_names={}, order=None):
+    """ Fills qtable with the index and name of names, or only those with
+    the 0-based indices in order. """
+    qtable.setRowCount(0)
+    if order is None:
+        order = range(len(names))
+
+    for n in order:
+        row = qtable.rowCount()
+        qtable.insertRow(row)
+        # The + 1 is to move to the FORTRAN/ZdPlaskin convention
+        nitem = QtWidgets.QTableWidgetItem(u'%4d' % (n + 1))
+        nitem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        nitem.setForeground(QtGui.QColor(160, 160, 160))
+        qtable.setItem(row, 0, nitem)
+
+        showed_item = pretty_names.get(names[n], names[n])
+        sitem = QtWidgets.QTableWidgetItem(showed_item)
+        sitem.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        qtable.setItem(row, 1, sitem)
+
+
 def filter_rates(f, delta, max_rates=4, min_rates=0):
     fmax = nanmax(f, axis=1)
 
@@ -740,12 +1059,8 @@ def select_rates(data, specie_index, delta, max_rates):
     Returns a tuple of two sets containing reaction indices
     of production (first set) and losses (second set)
     '''
-    dreactions = data.sources(specie_index)
-    reactions = list(dreactions.keys())
-
-    r = zeros((len(reactions), len(data.t)))
-    for i, react in enumerate(reactions):
-        r[i, :] = dreactions[react]
+    reactions, r = data.source_terms(specie_index)
+    reactions = reactions.tolist()
 
     spos = nanmax(where(r > 0, r, 0), axis=0)
     fpos = r / spos
@@ -317,6 +317,11 @@ class Ui_MainWindow(object):
         self.actionFilter_small_rates.setChecked(True)
         self.actionFilter_small_rates.setObjectName(
             _fromUtf8("actionFilter_small_rates"))
+        self.actionParallel_loading = QtWidgets.QAction(MainWindow)
+        self.actionParallel_loading.setCheckable(True)
+        self.actionParallel_loading.setChecked(False)
+        self.actionParallel_loading.setObjectName(
+            _fromUtf8("actionParallel_loading"))
         self.menuFile.addAction(self.actionOpen)
         self.menuFile.addAction(self.actionImport_from_directory)
         self.menuFile.addAction(self.actionExport_data)
@@ -329,6 +334,7 @@ class Ui_MainWindow(object):
         self.menuOptions.addAction(self.actionLog_scale_in_time)
         self.menuOptions.addAction(self.actionDatacursor)
         self.menuOptions.addAction(self.actionShowField)
+        self.menuOptions.addAction(self.actionParallel_loading)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuOptions.menuAction())
         self.menubar.addAction(self.menuHelp.menuAction())
@@ -410,5 +416,9 @@ class Ui_MainWindow(object):
             _translate("MainWindow", "Filter small rates", None))
         self.actionFilter_small_rates.setToolTip(_translate(
             "MainWindow", "When checked, some rates are not displayed in the sensitivity analisys to avoid cluttering", None))
+        self.actionParallel_loading.setText(
+            _translate("MainWindow", "Parallel loading", None))
+        self.actionParallel_loading.setToolTip(_translate(
+            "MainWindow", "When checked, the files of a directory are parsed concurrently", None))
 
 from qtplaskin.mplwidget import RatePlotWidget, SourcePlotWidget, ConditionsPlotWidget, DensityPlotWidget
@@ -1,18 +1,69 @@
 import sys
 import os
+import io
 import time
 from multiprocessing import Process, Pipe
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
 import h5py
+from scipy import sparse
 
 from qtplaskin.runner import run
 from qtplaskin.database import get_molar_mass, Na
+from qtplaskin.readers import (TailReader, LazyTable, ColumnCache,
+                               read_block, read_block_split)
+from qtplaskin import bincache
+from qtplaskin import compressed
+from qtplaskin import binformat
+from qtplaskin.rowindex import RowIndex
+from qtplaskin.decimate import make_decimator
+from qtplaskin.nameindex import NameIndex
+from qtplaskin import parsers
+from qtplaskin import pyramid
+from qtplaskin.colstats import ColumnStats, STATS
+from qtplaskin.h5codecs import (Compression, can_precompress, write_chunks,
+                                CHUNK_COLUMNS)
 
 from warnings import warn
 
 
+# Version of the layout written by ModelData.save
+HDF5_VERSION = 2
+
+# Names of the datasets of column 1, 2... in layout 1
+KEY_FORMAT = '%.4d'
+
+# The datasets (layout 2) or groups (layout 1) of each quantity, which are
+# also the names of their accessors, and the lists of names, stored in the
+# name tables of the same names
+HDF5_QUANTITIES = (('condition', 'conditions'),
+                   ('density', 'species'),
+                   ('rate', 'reactions'))
+
+
+class SaveCancelled(Exception):
+    """ Raised when ModelData.save is cancelled by its progress callback. """
+
+
+# Table of the sources of a species in the files of ModelData.old_save
+OLD_SOURCE_DTYPE = np.dtype([('reaction', '<u4'),
+                             ('coefficient', '<f8'),
+                             ('rate', h5py.ref_dtype)])
+
+
+def old_keys(names):
+    """ Names of the datasets of names in ModelData.old_save: the name
+    itself, followed by its 1-based index if it is repeated. """
+    seen = set()
+    keys = []
+    for i, name in enumerate(names):
+        keys.append(name if name not in seen else '%s (%d)' % (name, i + 1))
+        seen.add(name)
+    return keys
+
+
 class ModelData(object):
     """ This class abstracts the reading of model data and its output
     to an HDF5 file.  These are the common methods. """
@@ -27,55 +78,328 @@ class ModelData(object):
         # This allows some kind of data sources where we have to flush.
         pass
 
+    @property
+    def source_csr(self):
+        """ The source matrix (species x reactions) as a CSR sparse matrix.
+        The reactions of species i are indices[indptr[i]:indptr[i + 1]]. """
+        cached = self.__dict__.get('_source_csr')
+        if cached is None or cached[0] is not self.source_matrix:
+            m = np.reshape(self.source_matrix, (len(self.species), -1))
+            cached = (self.source_matrix, sparse.csr_matrix(m))
+            self._source_csr = cached
+        return cached[1]
+
+    def _rate_rows(self, reactions):
+        """ A (len(reactions), len(t)) array with the rates of reactions
+        (0-based indices). """
+        raw = self.__dict__.get('raw_rates')
+        if raw is not None:
+            # A single gather, which is cheap from column-major rates
+            return raw[:, reactions].T.astype('d', copy=False)
+
+        r = np.empty((len(reactions), len(self.t)))
+        for k, ri in enumerate(reactions):
+            r[k] = self.rate(ri + 1)
+        return r
+
+    def source_terms(self, key):
+        """ Returns (reactions, terms) where reactions are the 0-based
+        indices of the reactions that create or destroy species key (1-based)
+        and terms is a (len(reactions), len(t)) array with the contribution
+        of each one, i.e. its rate times its coefficient. """
+        csr = self.source_csr
+        lo, hi = csr.indptr[key - 1], csr.indptr[key]
+        reactions = csr.indices[lo:hi]
+        terms = self._rate_rows(reactions)
+        terms *= csr.data[lo:hi, None].astype(terms.dtype)
+        return reactions, terms
+
+    def sources(self, key):
+        """ A dictionary with the contribution of each reaction to species
+        key; the values are rows of `source_terms`, not copies. """
+        reactions, terms = self.source_terms(key)
+        return dict(zip(reactions.tolist(), terms))
+
+    def envelope(self, quantity, key, tmin=None, tmax=None, max_points=None):
+        """ Returns (t, values) of column key of quantity ('density', 'rate'
+        or 'condition') with tmin <= t <= tmax, reduced to the minimum and
+        maximum of buckets of rows if there are more than max_points (see
+        `qtplaskin.pyramid`).  The stored pyramid is used if there is one. """
+        levels = self._pyramid(quantity) or []
+
+        def read_level(k, buckets):
+            vmin, vmax = levels[k - pyramid.FIRST_LEVEL]
+            return vmin[buckets, key - 1], vmax[buckets, key - 1]
+
+        return pyramid.envelope(self.t,
+                                lambda rows: self._rows(quantity, key, rows),
+                                read_level, len(levels), tmin, tmax,
+                                max_points)
+
+    def _rows(self, quantity, key, rows):
+        """ The rows (a slice) of column key of quantity. """
+        return getattr(self, quantity)(key)[rows]
+
+    def _pyramid(self, quantity):
+        """ The stored levels of the pyramid of quantity, or None. """
+        return None
+
+    # The raw (len(t), columns) array of each quantity, if the class has one
+    _RAW_ARRAYS = {'density': 'raw_density',
+                   'rate': 'raw_rates',
+                   'condition': 'raw_conditions'}
+
+    def stats(self, quantity):
+        """ The `qtplaskin.colstats.ColumnStats` of the columns of quantity
+        ('density', 'rate' or 'condition').
+
+        They are kept up to the row before the last one, which may still
+        change, and only the rows added since the last call are read.  If
+        the data were stored with statistics (see `save`), those are the
+        starting point. """
+        t = self.t
+        n = len(t)
+        ncols = len(getattr(self, dict(HDF5_QUANTITIES)[quantity]))
+        cache = self.__dict__.setdefault('_stats', {})
+
+        st = cache.get(quantity)
+        if not self._stats_valid(st, t, ncols):
+            st = self._stored_stats(quantity)
+            if not self._stats_valid(st, t, ncols):
+                st = ColumnStats(ncols)
+        if st.nrows < n - 1:
+            st.update(t[st.nrows:n - 1],
+                      self._block(quantity, slice(st.nrows, n - 1)))
+        cache[quantity] = st
+
+        if st.nrows < n:
+            return st.copy().update(t[n - 1:],
+                                    self._block(quantity, slice(n - 1, n)))
+        return st
+
+    @staticmethod
+    def _stats_valid(st, t, ncols):
+        """ Whether st are the statistics of the first rows of data with
+        times t. """
+        return (st is not None and len(st.min) == ncols
+                and st.nrows <= len(t)
+                and (st.nrows == 0 or t[st.nrows - 1] == st.t_last))
+
+    def _stored_stats(self, quantity):
+        """ Statistics of quantity stored with the data, or None. """
+        return None
+
+    def _block(self, quantity, rows):
+        """ A (rows, columns) array with the rows (a slice) of all the
+        columns of quantity. """
+        raw = self.__dict__.get(self._RAW_ARRAYS[quantity])
+        if raw is not None:
+            return raw[rows]
+        ncols = len(getattr(self, dict(HDF5_QUANTITIES)[quantity]))
+        if ncols == 0:
+            return np.empty((len(self.t[rows]), 0))
+        return np.column_stack([self._rows(quantity, k + 1, rows)
+                                for k in range(ncols)])
+
     def update(self):
         pass
 
-    def save(self, ofile, metadata={}):
+    def save(self, ofile, metadata={}, version=HDF5_VERSION,
+             compression=None, progress=None, workers=None, pyramids=False,
+             stats=False):
+        """ Saves the data and some metadata into the HDF5 file ofile, in
+        layout version 1 (one dataset per column) or 2 (one 2D dataset per
+        quantity).  See `HDF5Data`.
+
+        compression is a `qtplaskin.h5codecs.Compression`, a string such
+        as 'zstd' or 'gzip:9', or None for gzip at its default level.
+
+        progress, if given, is called as progress(done, total) with the
+        number of columns written so far; if it returns False the file is
+        removed and SaveCancelled is raised.
+
+        In layout 2 gzip chunks are compressed by a pool of `workers` threads
+        (default: one per CPU) and written to the file as they are.
+
+        If pyramids is True the min/max pyramids of all the columns are
+        stored too, for `envelope`, and if stats is True the `stats` of
+        each quantity. """
+        if version not in (1, 2):
+            raise ValueError("Unknown HDF5 layout version %r" % version)
+        if compression is None:
+            compression = Compression()
+        elif isinstance(compression, str):
+            compression = Compression.parse(compression)
+
+        total = len(self.species) + len(self.reactions) + len(self.conditions)
+        done = [0]
+
+        def report(ncols):
+            done[0] += ncols
+            if progress is not None and progress(done[0], total) is False:
+                raise SaveCancelled("Saving %s was cancelled" % ofile)
+
         f = h5py.File(ofile, 'w')
-        g = f.create_group('main')
-        ref_dtype = h5py.special_dtype(ref=h5py.Reference)
+        try:
+            g = f.create_group('main')
 
-        for k, val in metadata.items():
-            g.attrs[k] = val
+            for k, val in metadata.items():
+                g.attrs[k] = val
 
-        # We always write at least these two metadata
-        g.attrs['command'] = ' '.join(sys.argv)
-        g.attrs['timestamp'] = time.ctime()
+            # We always write at least these two metadata
+            g.attrs['command'] = ' '.join(sys.argv)
+            g.attrs['timestamp'] = time.ctime()
+            g.attrs['format_version'] = version
+            g.attrs['compression'] = str(compression)
 
+            # Name tables, so that readers do not have to visit every dataset
+            for quantity, table in HDF5_QUANTITIES:
+                g.create_dataset(table, data=getattr(self, table),
+                                 dtype=h5py.string_dtype())
+
+            if version == 1:
+                g.attrs['key_format'] = KEY_FORMAT
+                self._save_columns(g, compression, report)
+            else:
+                workers = workers or os.cpu_count() or 1
+                if workers > 1 and can_precompress(compression):
+                    with ThreadPoolExecutor(workers) as pool:
+                        self._save_matrices(g, compression, report, pool)
+                else:
+                    self._save_matrices(g, compression, report)
+
+            if pyramids:
+                self._save_pyramids(g, compression)
+            if stats:
+                self._save_stats(g)
+
+            g.create_dataset('t', data=self.t)
+            g.create_dataset('source_matrix', data=self.source_matrix,
+                             **compression.options(
+                                 np.shape(self.source_matrix)))
+        except SaveCancelled:
+            f.close()
+            os.remove(ofile)
+            raise
+        f.close()
+
+    @staticmethod
+    def _create_column(group, i, data, compression):
+        data = np.asarray(data)
+        return group.create_dataset(
+            KEY_FORMAT % i, data=data,
+            **compression.options(data.shape, data.dtype.itemsize))
+
+    def _save_columns(self, g, compression, report):
+        """ Layout 1: a group per quantity with a dataset per column. """
         cond = g.create_group('condition')
         for i, condition in enumerate(self.conditions):
-            ds = cond.create_dataset('%.4d' % (i + 1),
-                                     data=self.condition(i + 1), compression='gzip')
+            ds = self._create_column(cond, i + 1, self.condition(i + 1),
+                                     compression)
             ds.attrs['name'] = condition
+            report(1)
 
         dens = g.create_group('density')
 
         for i, species in enumerate(self.species):
             print("Writing density of species `%s'" % species)
-            ds = dens.create_dataset('%.4d' % (i + 1), data=self.density(i + 1),
-                                     compression='gzip')
+            ds = self._create_column(dens, i + 1, self.density(i + 1),
+                                     compression)
             ds.attrs['name'] = species
+            report(1)
 
         dens = g.create_group('rate')
 
         for i, reaction in enumerate(self.reactions):
             try:
-                ds = dens.create_dataset('%.4d' % (i + 1),
-                                         data=self.rate(i + 1),
-                                         compression='gzip')
+                ds = self._create_column(dens, i + 1, self.rate(i + 1),
+                                         compression)
                 ds.attrs['name'] = reaction
                 print("Writing reaction `%s'" % reaction)
             except (RuntimeError, ValueError):
                 print("Error in reaction %d `%s'" % (i + 1, reaction))
-
-        g.create_dataset('t', data=self.t)
-        g.create_dataset('source_matrix', data=self.source_matrix,
-                         compression='gzip')
-        f.close()
+            report(1)
+
+    def _save_matrices(self, g, compression, report, pool=None):
+        """ Layout 2: a (len(t), columns) dataset per quantity.  If pool is
+        given, the chunks are compressed there. """
+        for quantity, table in HDF5_QUANTITIES:
+            names = getattr(self, table)
+            column = getattr(self, quantity)
+
+            print("Writing %d columns of %s" % (len(names), quantity))
+            dtype = column(1).dtype if names else np.dtype('d')
+            shape = (len(self.t), len(names))
+            ds = g.create_dataset(quantity, shape=shape, dtype=dtype,
+                                  **compression.options(shape,
+                                                        dtype.itemsize))
+
+            # Whole chunks of columns at once, so every chunk is
+            # compressed only once
+            step = ds.chunks[1] if ds.chunks else max(1, len(names))
+            for j in range(0, len(names), step):
+                keys = range(j + 1, min(j + step, len(names)) + 1)
+                block = np.column_stack([column(k) for k in keys])
+                if pool is not None and ds.chunks:
+                    write_chunks(ds, block, j, compression, pool)
+                else:
+                    ds[:, j:j + len(keys)] = block
+                report(len(keys))
+
+    def _save_pyramids(self, g, compression):
+        """ main/pyramid/<k>/<quantity>_min and _max: the stored levels of
+        the pyramids, (buckets, columns) datasets. """
+        p = g.create_group('pyramid')
+        nlevels = pyramid.count_levels(len(self.t))
+        p.attrs['first_level'] = pyramid.FIRST_LEVEL
+        p.attrs['levels'] = nlevels
+        if nlevels == 0:
+            return
+
+        for quantity, table in HDF5_QUANTITIES:
+            names = getattr(self, table)
+            column = getattr(self, quantity)
+            dtype = column(1).dtype if names else np.dtype('d')
+
+            datasets = []
+            for k in range(pyramid.FIRST_LEVEL, pyramid.FIRST_LEVEL + nlevels):
+                shape = (-(-len(self.t) // 2 ** k), len(names))
+                opts = compression.options(shape, dtype.itemsize)
+                level = p.require_group('%d' % k)
+                datasets.append(tuple(
+                    level.create_dataset(quantity + suffix, shape=shape,
+                                         dtype=dtype, **opts)
+                    for suffix in ('_min', '_max')))
+
+            for j in range(0, len(names), CHUNK_COLUMNS):
+                keys = range(j + 1, min(j + CHUNK_COLUMNS, len(names)) + 1)
+                block = np.column_stack([column(k) for k in keys])
+                levels = pyramid.build(block, nlevels)
+                for (dmin, dmax), (vmin, vmax) in zip(datasets, levels):
+                    dmin[:, j:j + len(keys)] = vmin
+                    dmax[:, j:j + len(keys)] = vmax
+
+    def _save_stats(self, g):
+        """ main/stats/<quantity>: a (len(STATS), columns) array with the
+        statistics of quantity, in the order of the stats attribute, and
+        the number of rows and the last time they come from. """
+        s = g.create_group('stats')
+        for quantity, table in HDF5_QUANTITIES:
+            st = self.stats(quantity)
+            ds = s.create_dataset(quantity, data=st.to_array())
+            ds.attrs['stats'] = ','.join(STATS)
+            ds.attrs['nrows'] = st.nrows
+            ds.attrs['t_last'] = st.t_last
 
     def old_save(self, ofile, metadata={}):
         """ Saves the data in an old format.
         and some metadata into output file ofile.
+
+        Instead of a copy of every source term, the group of each species
+        in source is a table of the reactions that create or destroy it,
+        with their index, their coefficient and a reference to their rate.
+        The name tables species, reactions and conditions keep the order
+        of the columns, so that `HDF5Data` can read the file.
         """
         f = h5py.File(ofile, 'w')
         g = f.create_group('zdplaskin')
@@ -89,6 +413,10 @@ class ModelData(object):
 
         g.create_dataset('t', data=self.t)
 
+        for quantity, table in HDF5_QUANTITIES:
+            g.create_dataset(table, data=getattr(self, table),
+                             dtype=h5py.string_dtype())
+
         cond = g.create_group('condition')
         for k in self.conditions:
             cond.create_dataset(k, data=self.condition(k), compression='gzip')
@@ -102,50 +430,156 @@ class ModelData(object):
 
         dens = g.create_group('rate')
 
-        for reaction in self.reactions:
-            try:
-                dens.create_dataset(reaction, data=self.rate(reaction),
-                                    compression='gzip')
-                print("Writing reaction `%s'" % reaction)
-            except (RuntimeError, ValueError):
-                print("Skipping repeated reaction `%s'" % reaction)
+        # Rates by index: repeated reactions have their own rates
+        refs = []
+        for i, key in enumerate(old_keys(self.reactions)):
+            print("Writing reaction `%s'" % self.reactions[i])
+            ds = dens.create_dataset(key, data=self._rate_rows([i])[0],
+                                     compression='gzip')
+            refs.append(ds.ref)
 
         gsources = g.create_group('source')
+        m = np.reshape(self.source_matrix, (len(self.species), -1))
 
-        for species in self.species:
+        for i, species in enumerate(self.species):
             print("Writing sources for species `%s'" % species)
-            s_group = gsources.create_group(species)
-
-            react_dict = self.sources(species)
-            for reaction, rate in react_dict.items():
-                print("   Writing reaction `%s'" % reaction)
-                try:
-                    s_group.create_dataset(reaction.replace('.', '_'),
-                                           data=rate, compression='gzip')
-                except Exception:
-                    warn("Ignoring repeated reaction '%s'" % reaction)
+            reactions = np.nonzero(m[i])[0]
+            table = np.empty(len(reactions), dtype=OLD_SOURCE_DTYPE)
+            table['reaction'] = reactions
+            table['coefficient'] = m[i, reactions]
+            table['rate'] = [refs[ri] for ri in reactions]
+            gsources.create_dataset(species, data=table)
         f.close()
 
 
 class HDF5Data(ModelData):
-    """ ModelData from a HDF5 file. """
-
-    def __init__(self, fname):
+    """ ModelData from a HDF5 file.
+
+    Files written by `ModelData.save` have the version of their layout in
+    the format_version attribute of the main group (1 if it is missing):
+
+    1   main/density, main/rate and main/condition are groups with a
+        dataset per column, named 0001, 0002... (the key_format attribute
+        of main) with the name of the species, reaction or condition in
+        its name attribute.
+    2   main/density, main/rate and main/condition are 2D datasets
+        (len(t), columns), chunked along both axes.
+
+    Both have main/t, main/source_matrix and the name tables main/species,
+    main/reactions and main/conditions, arrays with the names, which older
+    files of layout 1 lack.
+
+    Files of `ModelData.old_save` (layout 0) have a zdplaskin group instead,
+    with a dataset per column named after it (see `old_keys`) and a table
+    of the sources of each species, from which the source matrix is built.
+    Only those with name tables can be read.
+
+    Files written by `qtplaskin.h5writer.HDF5Writer` have layout 2 and can
+    be read while they are being written: `update` picks up the new rows.
+
+    The file is opened read-only and only the names are read when it is
+    opened; t and the source matrix are read the first time they are used.
+    Each column is read when it is requested and kept in a cache of at most
+    cache_bytes bytes.  density(key, tslice) reads only the rows in tslice,
+    a slice or an increasing array of indices, unless the column is cached
+    already.
+
+    `envelope` reads the levels of main/pyramid when the file has them (see
+    ModelData.save).  Likewise
+    `stats` starts from main/stats, and in layout 2 reads the rest of the
+    rows a block at a time. """
+
+    def __init__(self, fname, cache_bytes=256 * 1024 * 1024):
         self.fname = fname
-        self.h5 = h5py.File(fname)
-        self.h5_density = self.h5['main/density']
-        self.h5_rate = self.h5['main/rate']
-        self.h5_condition = self.h5['main/condition']
+        # SWMR mode reads files that are still being written too
+        self.h5 = h5py.File(fname, 'r', swmr=True)
+        if 'main' not in self.h5 and 'zdplaskin' in self.h5:
+            main = self.h5['zdplaskin']
+            self.version = 0
+            if 'reactions' not in main:
+                raise ValueError("%s: the old format without name tables "
+                                 "is not supported" % fname)
+        else:
+            main = self.h5['main']
+            self.version = int(main.attrs.get('format_version', 1))
+            if self.version not in (1, 2):
+                raise ValueError("%s: unsupported layout version %d"
+                                 % (fname, self.version))
+        self.h5_main = main
+
+        self.h5_density = main['density']
+        self.h5_rate = main['rate']
+        self.h5_condition = main['condition']
+
+        # Only files of layout 1 written before the name tables existed
+        # need the slow scan of the name attributes of every dataset
+        self._key_format = main.attrs.get('key_format', KEY_FORMAT)
+        for quantity, table in HDF5_QUANTITIES:
+            if table in main:
+                names = self._read_names(main[table])
+            else:
+                names = self._read_datasets(main[quantity])
+            setattr(self, table, names)
 
-        self.species = self._read_datasets(self.h5_density)
-        self.reactions = self._read_datasets(self.h5_rate)
-        self.conditions = self._read_datasets(self.h5_condition)
+        if self.version == 0:
+            self._old_keys = {self.h5_density.name: self.species,
+                              self.h5_rate.name: old_keys(self.reactions),
+                              self.h5_condition.name: self.conditions}
 
-        self.t = np.array(self.h5['main']['t'])
-        self.source_matrix = np.array(self.h5['main']['source_matrix'])
+        self._columns = ColumnCache(cache_bytes)
+        self._nrows = self._count_rows()
 
         super(HDF5Data, self).__init__()
 
+    def _count_rows(self):
+        """ The number of complete rows.  `qtplaskin.h5writer` extends t
+        after the rest of the datasets. """
+        ds = self.h5_main['t']
+        ds.refresh()
+        nrows = ds.shape[0]
+        if self.version == 2:
+            for ds in (self.h5_density, self.h5_rate, self.h5_condition):
+                ds.refresh()
+                nrows = min(nrows, ds.shape[0])
+        return nrows
+
+    def update(self):
+        """ Picks up the rows appended since the file was opened, or since
+        the last call, if it is being written by a
+        `qtplaskin.h5writer.HDF5Writer`. """
+        nrows = self._count_rows()
+        if nrows != self._nrows:
+            self._nrows = nrows
+            self.__dict__.pop('_t', None)
+            self._columns.clear()
+
+    @property
+    def t(self):
+        t = self.__dict__.get('_t')
+        if t is None:
+            t = self._t = self.h5_main['t'][:self._nrows]
+        return t
+
+    @property
+    def source_matrix(self):
+        m = self.__dict__.get('_source_matrix')
+        if m is None:
+            if self.version == 0:
+                m = self._read_source_tables()
+            else:
+                m = self.h5_main['source_matrix'][()]
+            self._source_matrix = m
+        return m
+
+    def _read_source_tables(self):
+        """ The source matrix of a file of layout 0. """
+        m = np.zeros((len(self.species), len(self.reactions)))
+        group = self.h5_main['source']
+        for i, species in enumerate(self.species):
+            table = group[species][()]
+            m[i, table['reaction']] = table['coefficient']
+        return m
+
     def _read_datasets(self, group):
         sindices = list(group)
         sindices.sort()
@@ -155,26 +589,67 @@ class HDF5Data(ModelData):
         return r
 
     @staticmethod
-    def _index_key(i):
-        return '%.4d' % i
-
-    def density(self, key):
-        return np.array(self.h5_density[self._index_key(key)])
-
-    def rate(self, key):
-        return np.array(self.h5_rate[self._index_key(key)])
-
-    def condition(self, key):
-        return np.array(self.h5_condition[self._index_key(key)])
-
-    def sources(self, key):
-        c = self.source_matrix[key - 1, :]
-        d = {}
-        for ri in np.nonzero(c)[0]:
-            reaction = self.reactions[ri]
-            d[ri] = self.rate(ri + 1) * c[ri]
-
-        return d
+    def _read_names(ds):
+        return ds.asstr()[()].tolist()
+
+    def _index_key(self, i):
+        return self._key_format % i
+
+    def _read(self, node, key, tslice):
+        if self.version == 0:
+            return node[self._old_keys[node.name][key - 1]][tslice]
+        if self.version == 1:
+            return node[self._index_key(key)][tslice]
+        return node[tslice, key - 1]
+
+    def _column(self, node, key, tslice=None):
+        """ Column key of node (a group in layout 1 or a dataset in layout
+        2), or its rows in tslice. """
+        col = self._columns.get((node.name, key))
+        if col is None:
+            if tslice is not None:
+                return self._read(node, key, tslice)
+            col = self._read(node, key, slice(0, self._nrows))
+            self._columns[(node.name, key)] = col
+        if tslice is not None:
+            return col[tslice]
+        return col
+
+    def _rows(self, quantity, key, rows):
+        return getattr(self, quantity)(key, rows)
+
+    def _pyramid(self, quantity):
+        p = self.h5_main.get('pyramid')
+        if p is None or p.attrs['first_level'] != pyramid.FIRST_LEVEL:
+            return None
+        return [(p['%d' % k][quantity + '_min'], p['%d' % k][quantity + '_max'])
+                for k in range(pyramid.FIRST_LEVEL,
+                               pyramid.FIRST_LEVEL + p.attrs['levels'])]
+
+    def _stored_stats(self, quantity):
+        ds = self.h5_main.get('stats/' + quantity)
+        if ds is None or ds.attrs['stats'] != ','.join(STATS):
+            return None
+        return ColumnStats.from_array(ds[()], ds.attrs['nrows'],
+                                      ds.attrs['t_last'])
+
+    def _block(self, quantity, rows):
+        if self.version == 2:
+            return self.h5_main[quantity][rows]
+        return super(HDF5Data, self)._block(quantity, rows)
+
+    def density(self, key, tslice=None):
+        return self._column(self.h5_density, key, tslice)
+
+    def rate(self, key, tslice=None):
+        return self._column(self.h5_rate, key, tslice)
+
+    def condition(self, key, tslice=None):
+        return self._column(self.h5_condition, key, tslice)
+
+    def close(self):
+        self._columns.clear()
+        self.h5.close()
 
 
 class ResultsData(ModelData):
@@ -214,6 +689,22 @@ class ResultsData(ModelData):
         return d
 
 
+# Relative difference allowed between the times of a row in different data
+# files, which may be printed with fewer digits in one of them
+_TIME_RTOL = 1e-4
+
+
+def _align(time, t):
+    """ Index of the row of time nearest to t[0], the first time of the
+    densities in a window. """
+    if not len(t):
+        return len(time)
+    i = np.searchsorted(time, t[0])
+    if i > 0 and (i == len(time) or t[0] - time[i - 1] < time[i] - t[0]):
+        i -= 1
+    return i
+
+
 class DirectoryData(ModelData):
     """ Modeldata from a file with these files, that have to be generated by
     some zdplaskin code
@@ -226,6 +717,64 @@ class DirectoryData(ModelData):
     source_matrix.txt
     out_condition.txt (out_temperatures.txt would also work).
 
+    If cache is True, the parsed arrays are stored in a binary sidecar
+    cache (see `qtplaskin.bincache`) that is memory-mapped the next time
+    the same, unchanged, directory is opened.  The cache also holds the
+    statistics of the columns (see `ModelData.stats`).
+
+    parallel selects how the data files are parsed: None (one after
+    another), 'thread' or 'process' (concurrently, in a pool of threads or
+    processes) or 'split' (each file is split in pieces that are parsed by
+    a pool of processes, which also speeds up a single large file).  workers
+    is the size of the pool.  The result is the same in all cases.
+
+    If lazy is True, opening the directory only indexes the rows of the data
+    files and reads the time column.  Each column is parsed the first time
+    it is requested and kept in a cache of at most cache_bytes bytes.
+    A valid binary cache is used anyway, since it is memory-mapped.
+
+    dtype is the floating point type used to store densities, rates and
+    conditions; e.g. 'f4' halves the memory needed for very large runs.
+    Times are always stored in double precision.
+
+    engine selects the parser of the data files: 'loadtxt', 'pandas' (the
+    C engine of pandas), 'pyarrow' (the pyarrow engine of pandas, if
+    installed) or 'fixedwidth' (a native reader that exploits the
+    fixed-width layout of the files written by ZdPlaskin and also reads
+    Fortran numbers such as 1.0000-100).  'auto' times the installed
+    engines on the first lines of the densities and picks the fastest one
+    that reads them correctly, falling back to a Fortran-aware parser on the
+    blocks it cannot read.  None uses the default of the class.  The engine
+    actually used is stored in the engine attribute.  See
+    `qtplaskin.parsers`.
+
+    tmin and tmax restrict the rows read to those with tmin <= t <= tmax.
+    An index of the rows of each data file (see `qtplaskin.rowindex`)
+    locates the window, so that only its lines are read; with cache=True
+    the index is kept in the cache directory for the next windows.  Windows
+    bypass the binary cache and cannot be combined with lazy.
+
+    decimate reduces the number of rows while they are parsed, before the
+    full arrays exist: 'stride' keeps one row out of decimate_n, 'log' keeps
+    decimate_n rows per decade of time and 'peak' reduces each bucket of
+    decimate_n rows to the minimum and maximum of each column, so that
+    short peaks of the rates are kept.  See `qtplaskin.decimate`.  Like
+    windows, decimation bypasses the binary cache and cannot be combined
+    with lazy.
+
+    Any of the files may be compressed with gzip, xz or zstandard, e.g.
+    qt_rates.txt.gz instead of qt_rates.txt (see `qtplaskin.compressed`).
+    Compressed data files are decompressed in a separate thread while they
+    are parsed.  They cannot be opened in lazy mode.
+
+    If pyramids is True the min/max pyramids of the data (see
+    `qtplaskin.pyramid`) are stored in the binary cache, or built in
+    memory when they are first needed, so that `envelope` does not have to
+    go through all the rows of a column to plot it.
+
+    columns maps the data files to the number of columns they must have,
+    as found by `probe_directory`; a file that does not match raises
+    ValueError.
     """
 
     F_SPECIES_LIST = 'qt_species_list.txt'
@@ -239,8 +788,53 @@ class DirectoryData(ModelData):
     # If true, assumes that lists are numbered and ignores the leading number
     NUMBERED_LISTS = True
 
-    def __init__(self, dirname):
+    EXECUTORS = {'thread': ThreadPoolExecutor,
+                 'process': ProcessPoolExecutor}
+
+    PARALLEL_MODES = (None, 'thread', 'process', 'split')
+
+    ENGINE = 'loadtxt'
+
+    def __init__(self, dirname, cache=False, parallel=None, workers=None,
+                 lazy=False, cache_bytes=256 * 1024 * 1024, dtype='d',
+                 engine=None, tmin=None, tmax=None, decimate=None,
+                 decimate_n=10, pyramids=False, columns=None):
         self.dirname = os.path.expanduser(dirname)
+        self.cache = cache
+        parallel = parallel or None
+        if parallel not in self.PARALLEL_MODES:
+            raise ValueError("parallel must be one of %s (got %r)"
+                             % (', '.join(map(repr, self.PARALLEL_MODES)),
+                                parallel))
+        self.parallel = parallel
+        self.workers = workers
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != 'f':
+            raise ValueError("dtype must be a floating point type (got %s)"
+                             % self.dtype)
+        engine = engine or self.ENGINE
+        if engine != 'auto' and engine not in parsers.ENGINES:
+            raise ValueError("engine must be 'auto' or one of %s (got %r)"
+                             % (', '.join(sorted(parsers.ENGINES)), engine))
+        self.tmin, self.tmax = tmin, tmax
+        windowed = tmin is not None or tmax is not None
+        if windowed and lazy:
+            raise ValueError("Time windows cannot be loaded in lazy mode")
+        # Validates the arguments
+        make_decimator(decimate, decimate_n)
+        if decimate is not None and lazy:
+            raise ValueError("Decimation is not possible in lazy mode")
+        self.decimate, self.decimate_n = decimate, decimate_n
+        self.pyramids = pyramids
+        # data file -> (levels of the pyramid, number of rows)
+        self._pyramids = {}
+        # data file -> ColumnStats of the rows in the binary cache
+        self._saved_stats = {}
+        self._lazy = False
+        self._columns = ColumnCache(cache_bytes)
+        # data file -> generation of its LazyTable when columns were cached
+        self._generations = {}
+        self._totals = None
 
         self.species = self._read_list(self.F_SPECIES_LIST)
         self.check_species_name_format()
@@ -251,7 +845,53 @@ class DirectoryData(ModelData):
         self.n_species = len(self.species)
         self.n_reactions = len(self.reactions)
 
-        self.update()
+        if engine == 'auto':
+            engine = parsers.select_engine(self._path(self.F_DENSITIES))
+            # Lines after the sample may still need the Fortran parser
+            self._parse = parsers.with_fallback(parsers.ENGINES[engine])
+        else:
+            self._parse = parsers.ENGINES[engine]
+        self.engine = engine
+
+        # Incremental readers for the files that grow during a run
+        self._readers = dict(
+            (fname, TailReader(self._path(fname), self._parse,
+                               dtype=self.dtype,
+                               decimator=make_decimator(decimate, decimate_n),
+                               ncols=(columns or {}).get(fname)))
+            for fname in (self.F_DENSITIES, self.F_RATES, self.F_CONDITIONS))
+        self._matrix_stat = None
+
+        if windowed:
+            for reader in self._readers.values():
+                if reader.compressed:
+                    # Read whole and trimmed by time in update()
+                    continue
+                index = RowIndex(reader.path, persist=cache)
+                index.update()
+                start, stop = index.byte_range(tmin, tmax)
+                reader.window(start, stop, index.header)
+
+        if windowed or decimate is not None:
+            self.update()
+        elif cache and self._load_cache():
+            self.update()
+        elif lazy:
+            if any(r.compressed for r in self._readers.values()):
+                raise ValueError("Compressed files cannot be read in lazy "
+                                 "mode")
+            self._lazy = True
+            self._readers = dict((fname, LazyTable(r.path, self._parse,
+                                                   dtype=self.dtype))
+                                 for fname, r in self._readers.items())
+            self.update()
+        else:
+            if cache:
+                sources = bincache.source_signature(self.dirname,
+                                                    self._source_files())
+            self.update()
+            if cache:
+                self._save_cache(sources)
 
         super(DirectoryData, self).__init__()
         
@@ -263,7 +903,7 @@ class DirectoryData(ModelData):
             self.species=[s.replace(at.upper(),at) for s in self.species]    
 
     def _read_list(self, fname):
-        with open(self._path(fname)) as fp:
+        with compressed.open_text(self._path(fname)) as fp:
             r = [s.strip() for s in fp.read().strip().split('\n')]
 
         if self.NUMBERED_LISTS:
@@ -273,55 +913,286 @@ class DirectoryData(ModelData):
         return r
 
     def update(self):
-        """ Reads or re-reads those files that may change during the execution.
+        """ Reads those parts of the files that have changed since the
+        last call.  Only the rows appended to the data files are parsed.
         """
-        _raw_density = np.loadtxt(self._path(self.F_DENSITIES), skiprows=1)
-
-        i_dens = _raw_density.shape[0]
-
-        _raw_rates = np.loadtxt(self._path(self.F_RATES), skiprows=1)
+        self._read_files()
+        self._totals = None
+
+        if self._lazy:
+            for fname, r in self._readers.items():
+                if self._generations.get(fname, 0) != r.generation:
+                    # A new file: the columns read from the old one are stale
+                    self._columns.discard(fname)
+                    self._generations[fname] = r.generation
+            self._latest_i = min(r.nrows + (r.partial is not None)
+                                 for r in self._readers.values())
+            self.t = self._readers[self.F_DENSITIES].time[:self._latest_i]
+            return
+
+        _density = self._readers[self.F_DENSITIES]
+        _rates = self._readers[self.F_RATES]
+        _conditions = self._readers[self.F_CONDITIONS]
+
+        if self.tmin is None and self.tmax is None:
+            latest_i = min(r.nrows for r in (_density, _rates, _conditions))
+            self.raw_conditions = _conditions.values[:latest_i]
+            self.raw_rates = _rates.values[:latest_i]
+            self.raw_density = _density.values[:latest_i]
+            self.t = _density.time[:latest_i]
+            return
+
+        # The readers of a window start and stop at indexed rows, or at the
+        # ends of a compressed file, so that each must be trimmed by its own
+        # time: the densities by the window, the others to the same rows.
+        t = _density.time[:_density.nrows]
+        i0 = 0 if self.tmin is None else np.searchsorted(t, self.tmin, 'left')
+        i1 = len(t) if self.tmax is None else np.searchsorted(t, self.tmax,
+                                                                'right')
+        t = t[i0:max(i0, i1)]
+        starts = [_align(r.time[:r.nrows], t) for r in (_rates, _conditions)]
+        n = min([len(t)] + [r.nrows - start for r, start
+                            in zip((_rates, _conditions), starts)])
+        for fname, r, start in zip((self.F_RATES, self.F_CONDITIONS),
+                                   (_rates, _conditions), starts):
+            if not np.allclose(r.time[start:start + n], t[:n],
+                               rtol=_TIME_RTOL, atol=0):
+                raise ValueError("The times in %s do not match those in %s"
+                                 % (fname, self.F_DENSITIES))
+
+        self.raw_conditions = _conditions.values[starts[1]:starts[1] + n]
+        self.raw_rates = _rates.values[starts[0]:starts[0] + n]
+        self.raw_density = _density.values[i0:i0 + n]
+        self.t = t[:n]
+
+    # Files and columns behind the raw_* arrays, which in lazy mode are only
+    # assembled if someone asks for them.
+    _RAW = {'raw_density': ('F_DENSITIES', 'species'),
+            'raw_rates': ('F_RATES', 'reactions'),
+            'raw_conditions': ('F_CONDITIONS', 'conditions')}
+
+    def __getattr__(self, name):
+        if name in self._RAW and self.__dict__.get('_lazy'):
+            fattr, lattr = self._RAW[name]
+            fname = getattr(self, fattr)
+            ncols = len(getattr(self, lattr))
+            raw = np.empty((self._latest_i, ncols), order='F',
+                           dtype=self.dtype)
+            for k in range(ncols):
+                raw[:, k] = self._column(fname, k + 1)
+            return raw
+        raise AttributeError(name)
 
-        self.source_matrix = np.loadtxt(self._path(self.F_MATRIX),
-                                        dtype='d')
-
-        _raw_conditions = np.loadtxt(self._path(self.F_CONDITIONS),
-                                     skiprows=1)
+    @property
+    def total_number_density(self):
+        """ Total number density in molec/cm-3 """
+        return self._get_totals()[0]
 
-        latest_i = min(d.shape[0] for d in
-                       (_raw_density, _raw_rates, _raw_conditions))
+    @property
+    def total_mass_density(self):
+        """ Total mass density in g/cm-3 """
+        return self._get_totals()[1]
+
+    def _get_totals(self):
+        if self._totals is None and not self._lazy:
+            self._totals = (self.raw_density.sum(axis=1),
+                            (self.raw_density*self.molarmass).sum(axis=1)/Na)
+        if self._totals is None:
+            number = np.zeros(self.t.shape)
+            mass = np.zeros(self.t.shape)
+            for i, M in enumerate(self.molarmass):
+                dens = self.density(i + 1)
+                number += dens
+                mass += dens * M
+            self._totals = (number, mass / Na)
+        return self._totals
+
+    def _column(self, fname, key):
+        """ Column key of fname in lazy mode, up to the latest common row. """
+        reader = self._readers[fname]
+        n_complete = min(self._latest_i, reader.nrows)
+
+        # The cache only holds rows from complete lines
+        col = self._columns.get((fname, key))
+        n = 0 if col is None else col.shape[0]
+        if n < n_complete:
+            new = reader.column(key, n, n_complete)
+            col = new if col is None else np.concatenate((col, new))
+            self._columns[(fname, key)] = col
+
+        col = col[:n_complete]
+        if self._latest_i > n_complete:
+            col = np.r_[col, reader.partial[0, key]]
+        return col
+
+    def _read_files(self):
+        """ Parses the new rows of the data files and, if it changed, the
+        source matrix. """
+        # Compressed files are always read by their reader, which
+        # decompresses them in a thread of its own
+        readers = [r for r in self._readers.values()
+                   if not getattr(r, 'compressed', False)]
+        for r in self._readers.values():
+            if getattr(r, 'compressed', False):
+                r.update()
+        matrix_path = self._path(self.F_MATRIX)
+        st = os.stat(matrix_path)
+        matrix_stat = [st.st_size, st.st_mtime_ns]
+        read_matrix = matrix_stat != self._matrix_stat
+        matrix = None
+
+        if self.parallel in self.EXECUTORS and not self._lazy:
+            with self.EXECUTORS[self.parallel](
+                    max_workers=self.workers or len(readers) + 1) as ex:
+                if self.parallel == 'thread':
+                    # Readers are independent: each thread updates one
+                    futures = [ex.submit(r.update) for r in readers]
+                else:
+                    futures = [ex.submit(read_block, *r.pending())
+                               for r in readers]
+                if read_matrix:
+                    fmatrix = ex.submit(self._parse_matrix, matrix_path)
+                results = [f.result() for f in futures]
+                if read_matrix:
+                    matrix = fmatrix.result()
+            if self.parallel == 'process':
+                for reader, result in zip(readers, results):
+                    reader.apply(result)
+        else:
+            for r in readers:
+                if self.parallel == 'split' and not self._lazy:
+                    read_block_split(*r.pending(), workers=self.workers,
+                                     dtype=r.dtype, apply=r.apply)
+                else:
+                    r.update()
+            if read_matrix:
+                matrix = self._parse_matrix(matrix_path)
+
+        if read_matrix:
+            self.source_matrix = matrix
+            self._matrix_stat = matrix_stat
 
-        self.raw_conditions = _raw_conditions[:latest_i, 1:]
-        self.raw_rates = _raw_rates[:latest_i, 1:]
-        self.raw_density = _raw_density[:latest_i, 1:]
-        self.t = _raw_density[:latest_i, 0]
-        
-        # Add total
-        self.total_number_density = self.raw_density.sum(axis=1)    # molec/cm-3
-        self.total_mass_density = (self.raw_density*self.molarmass).sum(axis=1)/Na  # g/cm-3
+    @staticmethod
+    def _parse_matrix(path):
+        with compressed.open_file(path) as fp:
+            return np.loadtxt(fp, dtype='d', ndmin=2)
+
+    def _source_files(self):
+        return [os.path.basename(self._path(fname)) for fname in
+                [self.F_SPECIES_LIST, self.F_REACTIONS_LIST,
+                 self.F_CONDITIONS_LIST, self.F_MATRIX] + list(self._readers)]
+
+    def _load_cache(self):
+        """ Restores the readers from the binary cache.  Returns False if
+        there is no valid cache. """
+        manifest, arrays = bincache.load(self.dirname, self._source_files(),
+                                         **self._cache_params())
+        if manifest is None:
+            return False
+
+        for fname, reader in self._readers.items():
+            state = manifest['info'][fname]
+            base = os.path.splitext(fname)[0]
+            reader.restore(state['offset'], state['header'],
+                           arrays[base + '_t'], arrays[base + '_values'])
+            if self.pyramids:
+                levels = [(arrays['%s_min%d' % (base, k)],
+                           arrays['%s_max%d' % (base, k)])
+                          for k in range(pyramid.FIRST_LEVEL,
+                                         pyramid.FIRST_LEVEL
+                                         + state['pyramid_levels'])]
+                self._pyramids[fname] = (levels, len(arrays[base + '_t']))
+            if base + '_stats' in arrays:
+                self._saved_stats[fname] = ColumnStats.from_array(
+                    arrays[base + '_stats'], state['stats_nrows'],
+                    state['stats_t_last'])
+
+        self.source_matrix = arrays[os.path.splitext(self.F_MATRIX)[0]]
+        self._matrix_stat = manifest['sources'][
+            os.path.basename(self._path(self.F_MATRIX))]
+        return True
+
+    def _save_cache(self, sources):
+        arrays = {}
+        for fname, reader in self._readers.items():
+            base = os.path.splitext(fname)[0]
+            arrays[base + '_t'] = reader.time[:reader.complete_nrows]
+            arrays[base + '_values'] = reader.values[:reader.complete_nrows]
+        arrays[os.path.splitext(self.F_MATRIX)[0]] = self.source_matrix
+        info = dict((fname, dict(offset=reader.offset, header=reader.header))
+                    for fname, reader in self._readers.items())
+
+        # Column statistics, so that lists can be filtered right away
+        for fname in self._readers:
+            base = os.path.splitext(fname)[0]
+            t, values = arrays[base + '_t'], arrays[base + '_values']
+            st = ColumnStats(values.shape[1]).update(t, values)
+            arrays[base + '_stats'] = st.to_array()
+            info[fname].update(stats_nrows=st.nrows,
+                               stats_t_last=st.t_last)
+            self._saved_stats[fname] = st
+
+        if self.pyramids:
+            for fname, reader in self._readers.items():
+                base = os.path.splitext(fname)[0]
+                levels = pyramid.build(arrays[base + '_values'])
+                for k, (vmin, vmax) in enumerate(levels, pyramid.FIRST_LEVEL):
+                    arrays['%s_min%d' % (base, k)] = vmin
+                    arrays['%s_max%d' % (base, k)] = vmax
+                info[fname]['pyramid_levels'] = len(levels)
+                self._pyramids[fname] = (levels, reader.complete_nrows)
+
+        bincache.save(self.dirname, sources, arrays, info=info,
+                      **self._cache_params())
+
+    def _cache_params(self):
+        """ Options that must match those used to write the cache. """
+        if self.pyramids:
+            return dict(dtype=self.dtype.str, pyramids=True)
+        return dict(dtype=self.dtype.str)
 
     def _path(self, fname):
-        # This is just to save typing
-        return os.path.join(self.dirname, fname)
+        # The file or its compressed variant
+        return compressed.find_file(self.dirname, fname)
+
+    # Attributes with the data file and the raw array of each quantity
+    _QUANTITIES = {'density': ('F_DENSITIES', 'raw_density'),
+                   'rate': ('F_RATES', 'raw_rates'),
+                   'condition': ('F_CONDITIONS', 'raw_conditions')}
+
+    def _pyramid(self, quantity):
+        if not self.pyramids or self._lazy:
+            return None
+        fname, raw = self._QUANTITIES[quantity]
+        fname = getattr(self, fname)
+        levels, nrows = self._pyramids.get(fname, (None, None))
+        if nrows != len(self.t):
+            # Not built yet, or the data changed since
+            levels = pyramid.build(getattr(self, raw))
+            self._pyramids[fname] = (levels, len(self.t))
+        return levels
+
+    def _stored_stats(self, quantity):
+        fname = getattr(self, self._QUANTITIES[quantity][0])
+        st = self._saved_stats.get(fname)
+        # The cached statistics are updated by ModelData.stats
+        return None if st is None else st.copy()
 
     def density(self, key):
+        if self._lazy:
+            return self._column(self.F_DENSITIES, key)
         return self.raw_density[:, key - 1]
 
     def rate(self, key):
+        if self._lazy:
+            return self._column(self.F_RATES, key)
         return self.raw_rates[:, key - 1]
 
     def condition(self, key):
+        if self._lazy:
+            return self._column(self.F_CONDITIONS, key)
         return self.raw_conditions[:, key - 1]
 
-    def sources(self, key):
-        # The +/-1 in this function are to move to the FORTRAN/ZdPlaskin
-        # array numbering convention.
-        c = self.source_matrix[key - 1, :]
-        d = {}
-        for ri in np.nonzero(c)[0]:
-            d[ri] = self.raw_rates[:, ri] * int(c[ri])
-
-        return d
-
     def _get_molarmass(self):
         
         M = []
@@ -342,51 +1213,25 @@ class FastDirData(DirectoryData):
 
     Problem with large sizes (>800 Mb) solved with chunking. 
 
+    By default the parsed data is kept in a binary cache next to the
+    files, so that opening the same directory again is almost instantaneous,
+    and the fastest parser engine available is used.
+
     @erwanp 26/06/16"""
 
-    def update(self):
-        """ Reads or re-reads those files that may change during the execution.
-        """
-        _raw_density = pd.read_csv(self._path(self.F_DENSITIES), delim_whitespace=True) #,
-#                                   iterator=True, chunksize=50000)
-#        _raw_density = pd.concat(_raw_density, ignore_index=True)
-#        _raw_density.apply(pd.to_numeric)
-        _raw_density = np.array(_raw_density)
-
-        i_dens = _raw_density.shape[0]
-
-        _raw_rates = pd.read_csv(self._path(self.F_RATES), delim_whitespace=True) # ,
-#                                 iterator=True, chunksize=50000)
-#        _raw_rates = pd.concat(_raw_rates, ignore_index=True)
-#        try:
-#            _raw_rates.apply(pd.to_numeric)
-#        except ValueError as err:
-#            print(err)
-#            raise ValueError('Impossible to read the format. There may be negative rates. See log above')
-        _raw_rates = np.array(_raw_rates)
-
-        _source_matrix = pd.read_csv(self._path(self.F_MATRIX), delim_whitespace=True,
-                                     dtype='d', header=None)
-        self.source_matrix = np.array(_source_matrix)
-
-        _raw_conditions = pd.read_csv(self._path(self.F_CONDITIONS), delim_whitespace=True) #,
-#                                      iterator=True, chunksize=50000)
-#        _raw_conditions = pd.concat(_raw_conditions, ignore_index=True)
-#        _raw_conditions.apply(pd.to_numeric)
-        _raw_conditions = np.array(_raw_conditions)
-
-        latest_i = min(d.shape[0] for d in
-                       (_raw_density, _raw_rates, _raw_conditions))
-
-        self.raw_conditions = _raw_conditions[:latest_i, 1:]
-        self.raw_rates = _raw_rates[:latest_i, 1:]
-        self.raw_density = _raw_density[:latest_i, 1:]
-        self.t = _raw_density[:latest_i, 0]
-
-        # Add total
-        self.total_number_density = self.raw_density.sum(axis=1)    # molec/cm-3
-        self.total_mass_density = (self.raw_density*self.molarmass).sum(axis=1)/Na  # g/cm-3
-        # TODO: discard species starting with 'X' here
+    ENGINE = 'auto'
+
+    def __init__(self, dirname, cache=True, **kwargs):
+        super(FastDirData, self).__init__(dirname, cache=cache, **kwargs)
+
+    @staticmethod
+    def _parse_matrix(path):
+        with compressed.open_file(path) as fp:
+            _source_matrix = pd.read_csv(fp, sep=r'\s+',
+                                         dtype='d', header=None)
+        return np.array(_source_matrix)
+
+    # TODO: discard species starting with 'X' in update()
 
     # %% Plus add some convenient functions to work with data
 
@@ -406,6 +1251,43 @@ class FastDirData(DirectoryData):
         
         return self.get_spec(species)
 
+    # Name lists of FastDirData: (label in the error messages, raw array of
+    # the eager data, 1-based accessor)
+    _LOOKUP = {'species': ('species list', 'raw_density', 'density'),
+               'reactions': ('reaction list', 'raw_rates', 'rate'),
+               'conditions': ('conditions', 'raw_conditions', 'condition')}
+
+    def _name_index(self, kind):
+        """ The NameIndex of self.<kind>, rebuilt only if the list changed. """
+        indexes = self.__dict__.setdefault('_name_indexes', {})
+        names = getattr(self, kind)
+        index = indexes.get(kind)
+        if index is None or index.names is not names:
+            index = indexes[kind] = NameIndex(names, self._LOOKUP[kind][0])
+        return index
+
+    def _get(self, kind, names):
+        """ The column(s) of names, as in get_spec. """
+        accessor = getattr(self, self._LOOKUP[kind][2])
+        index = self._name_index(kind)
+        if not type(names) == list:
+            return accessor(index.index(names) + 1)
+        return [accessor(i + 1) for i in index.indices(names)]
+
+    def _get_array(self, kind, names):
+        """ A (len(names), len(t)) array with the columns of names. """
+        indices = self._name_index(kind).indices(names)
+        raw = self.__dict__.get(self._LOOKUP[kind][1])
+        if raw is not None:
+            # A single gather from the column-major arrays
+            return raw[:, indices].T.copy()
+
+        accessor = getattr(self, self._LOOKUP[kind][2])
+        out = np.empty((len(indices), len(self.t)), dtype=self.dtype)
+        for k, i in enumerate(indices):
+            out[k] = accessor(i + 1)
+        return out
+
     def get_spec(self, species):
         ''' Get number density of a given set of species
 
@@ -419,31 +1301,18 @@ class FastDirData(DirectoryData):
         
         number density in cm-3
         '''
+        return self._get('species', species)
 
-        def _index(s):
-            try:
-                i = self.species.index(s)
-            except ValueError:
-                try:  # look if there is only one element, starting with the same name
-                    l = [x for x in self.species if (
-                        x.lower()).startswith(s.lower())]
-                    if len(l) == 1:
-                        i = self.species.index(l[0])
-                    else:
-                        raise ValueError
-                except ValueError:
-                    raise ValueError("%s not in species list: %s" %
-                                     (s, self.species))
-            return i
-
-        latest_i = min(d.shape[0] for d in
-                       (self.raw_density, self.raw_rates, self.raw_conditions))
-
-        if not type(species) == list:
-            return self.raw_density[:latest_i, _index(species)]
+    def get_spec_array(self, species):
+        ''' Get the number densities of a list of species as a 2D array
+        of shape (len(species), len(t)), in cm-3
 
-        else:
-            return [self.raw_density[:latest_i, _index(s)] for s in species]
+        See Also
+        --------
+
+        :meth:`~qtplaskin.modeldata.FastDirData.get_spec`
+        '''
+        return self._get_array('species', species)
 
     def get_mole_fraction(self, species):
         ''' 
@@ -461,7 +1330,7 @@ class FastDirData(DirectoryData):
         ''' Return mass fraction (kg/kg)'''
         
         number_density = self.get_spec(species)
-        M = self.molarmass[self.species.index(species)]
+        M = self.molarmass[self._name_index('species').index(species)]
         return (number_density*M/Na)/self.total_mass_density
         
 
@@ -472,33 +1341,12 @@ class FastDirData(DirectoryData):
         -------
 
         reactions: list'''
-        
-        
-        def _index(s):
-            try:
-                i = self.reactions.index(s)
-            except ValueError:
-                try:  # try if there is only one element, starting with the same name
-                    l = [x for x in self.species if (
-                        x.lower()).startswith(s.lower())]
-                    if len(l) == 1:
-                        i = self.species.index(l[0])
-                    else:
-                        raise ValueError
-                except ValueError:
-                    raise ValueError("%s not in reaction list: %s" %
-                                     (s, self.reactions))
-            return i
-
-        latest_i = min(d.shape[0] for d in
-                       (self.raw_density, self.raw_rates, self.raw_conditions))
-
-        if not type(reactions) == list:
-            return self.raw_rates[:latest_i, _index(reactions)]
-
-        else:
-            return [self.raw_rates[:latest_i, _index(r)] for r in reactions]
+        return self._get('reactions', reactions)
 
+    def get_rate_array(self, reactions):
+        ''' Get the rates of a list of reactions as a 2D array of shape
+        (len(reactions), len(t)) '''
+        return self._get_array('reactions', reactions)
 
     def get_cond(self, conditions):
         ''' Get a given set conditions
@@ -507,31 +1355,12 @@ class FastDirData(DirectoryData):
         -------
 
         species: list'''
+        return self._get('conditions', conditions)
 
-        def _index(c):
-            try:
-                i = self.conditions.index(c)
-            except ValueError:
-                try:  # try if there is only one element, starting with the same name
-                    l = [x for x in self.conditions if (
-                        x.lower()).startswith(c.lower())]
-                    if len(l) == 1:
-                        i = self.conditions.index(l[0])
-                    else:
-                        raise ValueError
-                except ValueError:
-                    raise ValueError("%s not in conditions: %s" %
-                                     (c, self.conditions))
-            return i
-
-        latest_i = min(d.shape[0] for d in
-                       (self.raw_density, self.raw_rates, self.raw_conditions))
-
-        if not type(conditions) == list:
-            return self.raw_conditions[:latest_i, _index(conditions)]
-
-        else:
-            return [self.raw_conditions[:latest_i, _index(c)] for c in conditions]
+    def get_cond_array(self, conditions):
+        ''' Get a list of conditions as a 2D array of shape
+        (len(conditions), len(t)) '''
+        return self._get_array('conditions', conditions)
         
     def plot(self, species):
         ''' Quickly plot a species directly from FastDirData. To be moved later
@@ -580,6 +1409,186 @@ class OldDirectoryData(DirectoryData):
     NUMBERED_LISTS = False
 
 
+class BinaryDirData(ModelData):
+    """ ModelData from a directory where the data of the run are in a single
+    binary file, qt_data.bin (see `qtplaskin.binformat`), instead of the
+    qt_densities.txt, qt_rates.txt and qt_conditions.txt files.  The list
+    files and qt_matrix.txt are those of DirectoryData.
+
+    The data file is memory-mapped, so opening it takes no time whatever
+    its size; `update` maps the rows appended since the last call.
+    """
+
+    F_SPECIES_LIST = DirectoryData.F_SPECIES_LIST
+    F_REACTIONS_LIST = DirectoryData.F_REACTIONS_LIST
+    F_CONDITIONS_LIST = DirectoryData.F_CONDITIONS_LIST
+    F_MATRIX = DirectoryData.F_MATRIX
+    F_DATA = 'qt_data.bin'
+
+    NUMBERED_LISTS = True
+
+    # The list files and the matrix are read like in DirectoryData
+    _path = DirectoryData._path
+    _read_list = DirectoryData._read_list
+    _parse_matrix = staticmethod(DirectoryData._parse_matrix)
+    check_species_name_format = DirectoryData.check_species_name_format
+
+    def __init__(self, dirname):
+        self.dirname = os.path.expanduser(dirname)
+        self.engine = 'binary'
+
+        self.species = self._read_list(self.F_SPECIES_LIST)
+        self.check_species_name_format()
+        self.reactions = self._read_list(self.F_REACTIONS_LIST)
+        self.conditions = self._read_list(self.F_CONDITIONS_LIST)
+        self.source_matrix = self._parse_matrix(self._path(self.F_MATRIX))
+
+        self.n_species = len(self.species)
+        self.n_reactions = len(self.reactions)
+
+        path = self._path(self.F_DATA)
+        self._header_bytes, ns, nr, nc = binformat.read_header(path)
+        if (ns, nr, nc) != (len(self.species), len(self.reactions),
+                            len(self.conditions)):
+            raise ValueError("%s has %d species, %d reactions and %d "
+                             "conditions, which do not match the lists"
+                             % (path, ns, nr, nc))
+        self.update()
+
+        super(BinaryDirData, self).__init__()
+
+    def update(self):
+        """ Maps the complete rows of the data file. """
+        ns, nr = len(self.species), len(self.reactions)
+        rows = binformat.map_rows(self._path(self.F_DATA), self._header_bytes,
+                                  1 + ns + nr + len(self.conditions))
+        self.t = rows[:, 0]
+        self.raw_density = rows[:, 1:1 + ns]
+        self.raw_rates = rows[:, 1 + ns:1 + ns + nr]
+        self.raw_conditions = rows[:, 1 + ns + nr:]
+
+    def density(self, key):
+        return self.raw_density[:, key - 1]
+
+    def rate(self, key):
+        return self.raw_rates[:, key - 1]
+
+    def condition(self, key):
+        return self.raw_conditions[:, key - 1]
+
+
+# Bytes read from the end of a data file to find its last line
+PROBE_TAIL_BYTES = 64 * 1024
+
+
+def _probe_lines(path, skiprows=1):
+    """ Returns the first and the last complete data lines of path (None if
+    there are none), reading only the beginning and the end of the file.
+    The end of a compressed file is out of reach, so the first line is
+    returned twice. """
+    with compressed.open_file(path) as fp:
+        for i in range(skiprows):
+            fp.readline()
+        first = fp.readline()
+        if not first.endswith(b'\n'):
+            return None, None
+        if compressed.is_compressed(path):
+            return first, first
+
+        start = fp.tell() - len(first)
+
+        size = os.fstat(fp.fileno()).st_size
+        fp.seek(max(start, size - PROBE_TAIL_BYTES))
+        tail = fp.read()
+    tail = tail[:tail.rfind(b'\n') + 1]
+    last = tail[tail.rfind(b'\n', 0, len(tail) - 1) + 1:]
+    return first, last
+
+
+def probe_directory(dirname, classes=(DirectoryData, OldDirectoryData)):
+    """ Finds out, without parsing the data files, which of classes can read
+    the directory dirname.  A directory with a binary data file is always
+    read by BinaryDirData.
+
+    Only the list files and the first and last lines of the data files are
+    read.  Returns a dictionary with the class ('class'), the number of
+    species, reactions and conditions in the lists ('n_species', ...), the
+    number of columns of each data file ('columns') and whether all of them
+    look fixed-width ('fixed_width').
+
+    Raises IOError if no class finds its files and ValueError if a data file
+    does not start with numbers.
+    """
+    dirname = os.path.expanduser(dirname)
+    if os.path.exists(os.path.join(dirname, BinaryDirData.F_DATA)):
+        header_bytes, ns, nr, nc = binformat.read_header(
+            os.path.join(dirname, BinaryDirData.F_DATA))
+        return {'class': BinaryDirData, 'n_species': ns, 'n_reactions': nr,
+                'n_conditions': nc, 'columns': {}, 'fixed_width': False}
+
+    for cls in classes:
+        fnames = [cls.F_SPECIES_LIST, cls.F_REACTIONS_LIST,
+                  cls.F_CONDITIONS_LIST, cls.F_DENSITIES, cls.F_RATES,
+                  cls.F_MATRIX, cls.F_CONDITIONS]
+        missing = [f for f in fnames
+                   if not os.path.exists(compressed.find_file(dirname, f))]
+        if not missing:
+            break
+    else:
+        raise IOError("No output of ZdPlaskin found in %s (missing %s)"
+                      % (dirname, ', '.join(missing)))
+
+    probe = {'class': cls, 'columns': {}, 'fixed_width': True}
+    for key, fname in (('n_species', cls.F_SPECIES_LIST),
+                       ('n_reactions', cls.F_REACTIONS_LIST),
+                       ('n_conditions', cls.F_CONDITIONS_LIST)):
+        with compressed.open_text(compressed.find_file(dirname, fname)) as fp:
+            probe[key] = len(fp.read().strip().split('\n'))
+
+    for fname in (cls.F_DENSITIES, cls.F_RATES, cls.F_CONDITIONS):
+        first, last = _probe_lines(compressed.find_file(dirname, fname))
+        if first is None:
+            probe['columns'][fname] = None
+            continue
+        try:
+            ncols = [parsers.parse_fortran_loadtxt(io.BytesIO(l)).shape[1]
+                     for l in (first, last)]
+        except ValueError as e:
+            raise ValueError("Unreadable data in %s: %s"
+                             % (os.path.join(dirname, fname), e))
+        if ncols[0] != ncols[1]:
+            raise ValueError("%s: the first line has %d columns and the "
+                             "last one %d" % (os.path.join(dirname, fname),
+                                              ncols[0], ncols[1]))
+        probe['columns'][fname] = ncols[0]
+        if (len(first) != len(last)
+                or len(parsers.field_spans(first.rstrip(b'\r\n')))
+                != ncols[0]):
+            probe['fixed_width'] = False
+
+    for fname, key in ((cls.F_DENSITIES, 'n_species'),
+                       (cls.F_RATES, 'n_reactions'),
+                       (cls.F_CONDITIONS, 'n_conditions')):
+        ncols = probe['columns'][fname]
+        if ncols is not None and ncols != probe[key] + 1:
+            warn("%s has %d columns but %d %s are listed"
+                 % (fname, ncols, probe[key], key[2:]))
+
+    return probe
+
+
+def probe_options(probe):
+    """ Keyword arguments for the class of a `probe_directory` result that
+    use what the probe found: the number of columns of each data file.  The
+    engine is chosen by timing them (engine='auto'), fixed-width files or
+    not. """
+    if probe['class'] is BinaryDirData:
+        return {}
+    columns = dict((fname, n) for fname, n in probe['columns'].items()
+                   if n is not None)
+    return {'engine': 'auto', 'columns': columns}
+
+
 class RealtimeData(ModelData):
     tracked_conditions = ['gas_temperature',
                           'reduced_field',
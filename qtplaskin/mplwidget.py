@@ -170,6 +170,9 @@ class MplWidget(QtWidgets.QWidget):
         self.xdata = None
         self.ydata = []
         self.labels = []
+        # (line, quantity, key, keep, t, values) of the plotted envelopes,
+        # see DesignerMainWindow._plot_envelope
+        self.envelopes = []
 
     def add_axes(self, *args, **kwargs):
         """ Adds axes to this widget.  """
@@ -214,6 +217,12 @@ class MplWidget(QtWidgets.QWidget):
         if redraw:
             self.draw()
 
+    def max_points(self):
+        """ Number of points worth plotting across the canvas: the minimum
+        and the maximum of each column of pixels. """
+        return 2 * max(1, int(self.canvas.width()
+                              * self.canvas.devicePixelRatioF()))
+
     def add_data(self, x, y, label):
         if self.xdata is None:
             self.xdata = x
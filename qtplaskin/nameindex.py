@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Fast lookup of species, reactions and conditions by name.
+"""
+
+from bisect import bisect_left
+
+
+class NameIndex(object):
+    """ Index of a list of names.
+
+    `index` finds a name by exact match in a dictionary or, failing that,
+    by a case-insensitive prefix that matches a single name, which is found
+    by bisection in the sorted lower-case names.  label is used in the error
+    messages, e.g. 'species list'.
+    """
+
+    def __init__(self, names, label):
+        self.names = names
+        self.label = label
+
+        self._exact = {}
+        for i, name in enumerate(names):
+            self._exact.setdefault(name, i)
+
+        lower = [name.lower() for name in names]
+        self._order = sorted(range(len(names)), key=lower.__getitem__)
+        self._lower = [lower[i] for i in self._order]
+
+    def index(self, name):
+        """ The 0-based index of name.  Raises ValueError if there is no
+        such name nor a single one starting with it. """
+        try:
+            return self._exact[name]
+        except KeyError:
+            pass
+
+        prefix = name.lower()
+        lo = bisect_left(self._lower, prefix)
+        hi = lo
+        while hi < len(self._lower) and self._lower[hi].startswith(prefix):
+            hi += 1
+            if hi - lo > 1:
+                break
+
+        if hi - lo == 1:
+            return self._order[lo]
+        raise ValueError("%s not in %s: %s" % (name, self.label, self.names))
+
+    def indices(self, names):
+        return [self.index(name) for name in names]
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Parsers for the blocks of lines of the qt_*.txt files.
+
+A parser receives a file-like object with complete lines and returns a
+2D array of doubles.
+
+ZdPlaskin writes these files with Fortran fixed-width formats, so all
+the lines have the same length and each number ends at the same column.
+`parse_fixed_width` takes advantage of that: it views the block as a
+matrix of bytes, cuts out the fields and converts them in a few vectorized
+passes.  When the fields share a layout, as with the E format of Fortran,
+their digits are combined arithmetically, which is faster than calling
+strtod for each number as loadtxt and pandas do.  It also understands the Fortran quirks that other parsers choke
+on: exponents with three digits written without the 'E' (1.0000-100),
+'D' exponents, NaN and (+/-)Infinity.
+
+The parsers are registered by name in ENGINES; `select_engine` picks the
+fastest one that is installed and reads a sample of a file correctly,
+timed on that sample.  Since the sample may not show every quirk of the
+file, `with_fallback` lets the chosen parser hand the blocks it cannot
+read to `parse_fortran_loadtxt`.
+"""
+
+import io
+import re
+import time
+from functools import partial
+
+import numpy as np
+
+from qtplaskin import compressed
+
+SPACE = ord(' ')
+NEWLINE = ord('\n')
+CR = ord('\r')
+TAB = ord('\t')
+
+# A sign right after a digit or a dot is a Fortran exponent without 'E'
+_FORTRAN_EXP = re.compile(rb'([0-9.])([+-][0-9])')
+
+# Bytes of a file read by select_engine to check the engines
+SAMPLE_BYTES = 256 * 1024
+
+
+def parse_loadtxt(fp):
+    """ Parses a block of lines with np.loadtxt. """
+    return np.loadtxt(fp, ndmin=2)
+
+
+def parse_pandas(fp):
+    """ Parses a block of lines with the C engine of pandas. """
+    import pandas as pd
+    return np.asarray(pd.read_csv(fp, sep=r'\s+', header=None), dtype='d')
+
+
+def parse_pyarrow(fp):
+    """ Parses a block of lines with the pyarrow engine of pandas.  pyarrow
+    only understands single-character delimiters, so runs of blanks are
+    collapsed first (see `collapse_blanks`), which on fixed-width files
+    costs about as much as the parsing itself. """
+    import pandas as pd
+    data = collapse_blanks(_block_bytes(fp))
+    if not data.strip():
+        return np.empty((0, 0))
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    return np.asarray(pd.read_csv(io.BytesIO(data), sep=' ', header=None,
+                                  engine='pyarrow'), dtype='d')
+
+
+def collapse_blanks(data):
+    """ The lines of data with their fields separated by single spaces and
+    no blanks at either end, found with masks over the whole block rather
+    than line by line. """
+    a = np.frombuffer(data, dtype=np.uint8)
+    if len(a) == 0:
+        return b''
+    tab = a == TAB
+    tabs = tab.any()
+    blank = a == SPACE
+    if tabs:
+        blank |= tab
+    newline = a == NEWLINE
+
+    # Drop the blanks that follow a blank or start a line...
+    drop = np.empty_like(blank)
+    drop[0] = True
+    np.logical_or(blank[:-1], newline[:-1], out=drop[1:])
+    drop &= blank
+
+    # ... and the first blank of a run that ends the line, the only one kept
+    p = np.r_[np.flatnonzero(newline), len(a)] - 1
+    p = p[p >= 0]
+    p[a[p] == CR] -= 1
+    p = p[(p >= 0) & blank[np.maximum(p, 0)]]
+    while len(p):
+        back = (p > 0) & blank[np.maximum(p - 1, 0)]
+        if not back.any():
+            break
+        p = np.where(back, p - 1, p)
+    drop[p] = True
+
+    if tabs:
+        a = np.where(tab, np.uint8(SPACE), a)
+    return a[~drop].tobytes()
+
+
+def field_spans(line):
+    """ Returns the (start, end) byte spans of the right-aligned fields in a
+    line, i.e. each field extends from the end of the previous one to the end
+    of its last character. """
+    c = np.frombuffer(line, dtype=np.uint8) != SPACE
+    if len(c) == 0:
+        return []
+    ends = np.flatnonzero(c[:-1] & ~c[1:]) + 1
+    if c[-1]:
+        ends = np.r_[ends, len(c)]
+    return list(zip(np.r_[0, ends[:-1]].tolist(), ends.tolist()))
+
+
+def _same_layout(flat, first, dot, e, p0):
+    """ Whether all the fields of flat have the layout of first (see
+    `_convert_same_layout`). """
+    exp_sign = flat[:, e + 1]
+    ok = (np.all(flat[:, dot] == ord('.')) and np.all(flat[:, e] == first[e])
+          and np.all((exp_sign == ord('+')) | (exp_sign == ord('-')))
+          and np.all(flat[:, :max(p0 - 1, 0)] == SPACE))
+    if ok and p0 > 0:
+        sign = flat[:, p0 - 1]
+        ok = np.all((sign == SPACE) | (sign == ord('+')) | (sign == ord('-')))
+    return ok
+
+
+def _convert_same_layout(flat):
+    """ Converts fields that all have the layout of the first one, e.g.
+    '  -1.2345E+00' (an optional sign, digits, a dot, digits and an
+    exponent with its sign), with arithmetic on the digits instead of one
+    strtod per field.  Returns None if the fields do not share a layout.
+
+    The digits are weighted and summed by a matrix product, which is exact
+    for mantissas below 2**53.  These and the powers of ten below 1e23 are
+    exact doubles, so a single multiplication or division rounds them like
+    strtod does; the other fields go through strtod.  The fields are
+    converted CONVERT_FIELDS at a time, to keep the temporaries in the
+    cache. """
+    first = flat[0]
+    width = flat.shape[1]
+    dots = np.flatnonzero(first == ord('.'))
+    exps = np.flatnonzero((first == ord('E')) | (first == ord('e')))
+    if len(dots) != 1 or len(exps) != 1:
+        return None
+    dot, e = int(dots[0]), int(exps[0])
+    nondigit = np.flatnonzero((first[:dot] < ord('0'))
+                              | (first[:dot] > ord('9')))
+    p0 = int(nondigit[-1]) + 1 if len(nondigit) else 0
+    if p0 == dot or not dot < e < width - 2:
+        return None
+
+    # Weights of the digits of the mantissa and of the exponent
+    mantissa = list(range(p0, dot)) + list(range(dot + 1, e))
+    weights = np.zeros((width, 2))
+    weights[mantissa[::-1], 0] = 10. ** np.arange(len(mantissa))
+    weights[e + 2:, 1] = 10. ** np.arange(width - e - 2)[::-1]
+    digits = np.zeros(width, dtype=bool)
+    digits[mantissa] = True
+    digits[e + 2:] = True
+
+    out = np.empty(flat.shape[0])
+    for i in range(0, flat.shape[0], CONVERT_FIELDS):
+        f = flat[i:i + CONVERT_FIELDS]
+        d = f - np.uint8(ord('0'))
+        if (not np.all(d[:, digits] <= 9)
+                or not _same_layout(f, first, dot, e, p0)):
+            return None
+
+        v = d @ weights
+        m, p = v[:, 0], v[:, 1].astype(np.intp)
+        p[f[:, e + 1] == ord('-')] *= -1
+        p -= e - dot - 1
+        down = p < 0
+        exact = (np.abs(p) <= 22) & (m < 2 ** 53)
+        scale = _POW10[np.minimum(np.abs(p), 22)]
+        np.divide(m, scale, out=m, where=down)
+        np.multiply(m, scale, out=m, where=~down)
+        if p0 > 0:
+            np.negative(m, out=m, where=f[:, p0 - 1] == ord('-'))
+        if not exact.all():
+            k = np.flatnonzero(~exact)
+            m[k] = f[k].copy().view('S%d' % width)[:, 0].astype('d')
+        out[i:i + len(m)] = m
+    return out
+
+
+# The powers of ten that are exact doubles
+_POW10 = np.array([float('1e%d' % k) for k in range(23)])
+
+# Fields converted at a time by _convert_same_layout
+CONVERT_FIELDS = 1 << 14
+
+
+def convert_fields(fields):
+    """ Converts an array of fixed-width ASCII fields into doubles.
+
+    fields is a uint8 array whose last axis runs over the characters of
+    each field.  The result has the shape of the other axes.
+    """
+    fields = np.ascontiguousarray(fields)
+    width = fields.shape[-1]
+    shape = fields.shape[:-1]
+    flat = fields.reshape(-1, width)
+    if flat.shape[0]:
+        values = _convert_same_layout(flat)
+        if values is not None:
+            return values.reshape(shape)
+    try:
+        return flat.view('S%d' % width)[:, 0].astype('d').reshape(shape)
+    except ValueError:
+        pass
+
+    # Slow(er) path: fix Fortran exponents and try again.
+    flat = flat.copy()
+    flat[(flat == ord('D')) | (flat == ord('d'))] = ord('E')
+
+    sign = (flat[:, 1:] == ord('+')) | (flat[:, 1:] == ord('-'))
+    prev = flat[:, :-1]
+    digit = ((prev >= ord('0')) & (prev <= ord('9'))) | (prev == ord('.'))
+    missing = sign & digit
+    rows = np.flatnonzero(missing.any(axis=1))
+
+    # Make room for an 'E' in every field
+    out = np.full((flat.shape[0], width + 1), SPACE, dtype=np.uint8)
+    out[:, 1:] = flat
+    if len(rows):
+        # Position of the exponent sign in each of the rows to fix
+        p = np.argmax(missing[rows], axis=1) + 1
+        k = np.arange(width + 1)
+        src = np.where(k < p[:, None], k, k - 1)
+        fixed = np.take_along_axis(flat[rows], np.clip(src, 0, width - 1),
+                                   axis=1)
+        fixed[k == p[:, None]] = ord('E')
+        out[rows] = fixed
+
+    try:
+        return out.view('S%d' % (width + 1))[:, 0].astype('d').reshape(shape)
+    except ValueError as e:
+        raise ValueError("Could not parse fixed-width fields: %s" % e)
+
+
+def _block_bytes(fp):
+    """ The contents of fp, without copying it if it is a BytesIO made
+    from bytes (getbuffer would copy those). """
+    if isinstance(fp, io.BytesIO):
+        return memoryview(fp.getvalue())
+    return memoryview(fp.read())
+
+
+def parse_fixed_width(fp):
+    """ Parses a block of lines of a fixed-width ZdPlaskin file.
+
+    Falls back to `parse_fortran_loadtxt` if the lines do not have a
+    fixed-width layout.
+    """
+    buf = _block_bytes(fp)
+    a = np.frombuffer(buf, dtype=np.uint8)
+    if len(a) == 0:
+        return np.empty((0, 0))
+
+    nl = np.flatnonzero(a[:min(len(a), 1 << 20)] == NEWLINE)
+    if len(nl) == 0:
+        # A single line without newline
+        nl = np.array([len(a)])
+        a = np.r_[a, NEWLINE].astype(np.uint8)
+    width = int(nl[0]) + 1
+
+    if len(a) % width:
+        # The last line may lack the newline: parse it separately
+        n = (len(a) // width) * width
+        if n == 0:
+            return parse_fortran_loadtxt(io.BytesIO(bytes(buf)))
+        head = _parse_fixed_lines(a[:n], width)
+        tail = parse_fixed_width(io.BytesIO(bytes(buf[n:])))
+        if head is None or tail.shape[1:] != head.shape[1:]:
+            return parse_fortran_loadtxt(io.BytesIO(bytes(buf)))
+        return np.concatenate((head, tail))
+
+    r = _parse_fixed_lines(a, width)
+    if r is None:
+        return parse_fortran_loadtxt(io.BytesIO(bytes(buf)))
+    return r
+
+
+def _parse_fixed_lines(a, width):
+    """ Parses lines of exactly width bytes (including the newline).
+    Returns None if they are not laid out in fixed-width fields. """
+    m = a.reshape(-1, width)
+    if np.any(m[:, -1] != NEWLINE):
+        return None
+
+    linelen = width - 1
+    if np.all(m[:, -2] == CR):
+        linelen -= 1
+
+    spans = field_spans(m[0, :linelen].tobytes())
+    if not spans:
+        return None
+
+    out = np.empty((m.shape[0], len(spans)))
+    j = 0
+    while j < len(spans):
+        # Group consecutive fields with the same width
+        start, end = spans[j]
+        fw = end - start
+        k = j + 1
+        while k < len(spans) and spans[k][1] - spans[k][0] == fw:
+            k += 1
+        block = m[:, start:spans[k - 1][1]].reshape(m.shape[0], k - j, fw)
+
+        # Check that no number crosses the field boundaries
+        if np.any(block[:, :, -1] == SPACE):
+            return None
+        if (j > 0 or k > j + 1) and np.any(block[:, 1 if j == 0 else 0:, 0]
+                                           != SPACE):
+            return None
+
+        out[:, j:k] = convert_fields(block)
+        j = k
+
+    return out
+
+
+def parse_fortran_loadtxt(fp):
+    """ Parses a block of lines with np.loadtxt, after fixing the Fortran
+    exponents without 'E' and the 'D' exponents. """
+    data = _FORTRAN_EXP.sub(rb'\1E\2', bytes(_block_bytes(fp)))
+    data = data.replace(b'D', b'E').replace(b'd', b'e')
+    return np.loadtxt(io.BytesIO(data), ndmin=2)
+
+
+def _parse_or_fortran(parse, fp):
+    start = fp.tell()
+    try:
+        return parse(fp)
+    except ValueError:
+        fp.seek(start)
+        return parse_fortran_loadtxt(fp)
+
+
+def with_fallback(parse):
+    """ parse, or `parse_fortran_loadtxt` for the blocks it raises
+    ValueError on (e.g. for a Fortran exponent such as 1.0000-100).  The
+    result can be pickled for a pool of processes. """
+    if parse in (parse_fixed_width, parse_fortran_loadtxt):
+        # They understand Fortran numbers already
+        return parse
+    return partial(_parse_or_fortran, parse)
+
+
+ENGINES = {'loadtxt': parse_loadtxt,
+           'pandas': parse_pandas,
+           'pyarrow': parse_pyarrow,
+           'fixedwidth': parse_fixed_width}
+
+# Modules needed by each engine, besides numpy
+REQUIRES = {'pandas': ('pandas',),
+            'pyarrow': ('pandas', 'pyarrow')}
+
+
+def available_engines():
+    """ Names of the engines whose dependencies are installed. """
+    from importlib.util import find_spec
+    return [name for name in ENGINES
+            if all(find_spec(m) is not None for m in REQUIRES.get(name, ()))]
+
+
+def select_engine(path, skiprows=1, sample_bytes=None):
+    """ Returns the fastest available engine among those that parse the
+    first lines of path (decompressed if needed) like np.loadtxt, with
+    Fortran exponents fixed, timed on those lines; use it `with_fallback`.
+    """
+    sample_bytes = sample_bytes or SAMPLE_BYTES
+    with compressed.open_file(path) as fp:
+        for i in range(skiprows):
+            fp.readline()
+        sample = fp.read(sample_bytes)
+    sample = sample[:sample.rfind(b'\n') + 1]
+    if not sample:
+        return 'loadtxt'
+
+    try:
+        expected = parse_fortran_loadtxt(io.BytesIO(sample))
+    except ValueError:
+        return 'loadtxt'
+
+    best, best_time = 'loadtxt', None
+    first = sample[:sample.find(b'\n') + 1]
+    for name in available_engines():
+        parse = ENGINES[name]
+        try:
+            # Not timed: imports and other first-call costs
+            parse(io.BytesIO(first))
+            t0 = time.perf_counter()
+            actual = np.atleast_2d(parse(io.BytesIO(sample)))
+        except Exception:
+            continue
+        elapsed = time.perf_counter() - t0
+        if (actual.shape == expected.shape
+                and np.array_equal(actual, expected, equal_nan=True)
+                and (best_time is None or elapsed < best_time)):
+            best, best_time = name, elapsed
+    return best
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Min/max pyramids for plotting long runs at any zoom.
+
+Level k of the pyramid of a table has, for each bucket of 2**k consecutive
+rows (the first one starting at row 0), the minimum and the maximum of
+every column in the bucket.  A plot of the minimum and the maximum of each
+bucket at the time of its first row looks like the plot of all the rows,
+short peaks included, with a fraction of the points.
+
+Only the levels from FIRST_LEVEL up to the last one with at least
+MIN_BUCKETS buckets are stored, which adds about 2 / 2**FIRST_LEVEL to the
+size of the data.  Lower levels, and higher ones, are computed when needed
+from the rows or from the highest stored level.
+
+`envelope` returns the points of a column between two times from the
+level with the finest buckets that gives at most max_points points.
+"""
+
+import numpy as np
+
+FIRST_LEVEL = 4
+MIN_BUCKETS = 512
+
+
+def count_levels(nrows):
+    """ Number of stored levels of a table of nrows rows. """
+    n = 0
+    while -(-nrows // 2 ** (FIRST_LEVEL + n)) >= MIN_BUCKETS:
+        n += 1
+    return n
+
+
+def halve(vmin, vmax):
+    """ The next level: merges pairs of buckets (rows along axis 0).  An
+    odd last bucket stays alone. """
+    m = vmin.shape[0] // 2
+    lo = np.fmin(vmin[0:2 * m:2], vmin[1:2 * m:2])
+    hi = np.fmax(vmax[0:2 * m:2], vmax[1:2 * m:2])
+    if vmin.shape[0] % 2:
+        lo = np.concatenate((lo, vmin[-1:]))
+        hi = np.concatenate((hi, vmax[-1:]))
+    return lo, hi
+
+
+def build(values, nlevels=None):
+    """ The stored levels of values (rows along axis 0), a list of
+    (min, max) arrays, from FIRST_LEVEL on. """
+    if nlevels is None:
+        nlevels = count_levels(values.shape[0])
+    levels = []
+    vmin = vmax = values
+    for k in range(1, FIRST_LEVEL + nlevels):
+        vmin, vmax = halve(vmin, vmax)
+        if k >= FIRST_LEVEL:
+            levels.append((vmin, vmax))
+    return levels
+
+
+def level_for(nrows, max_points):
+    """ The lowest level with at most max_points points (two per bucket)
+    for nrows rows. """
+    k = 0
+    while 2 * -(-nrows // 2 ** k) > max_points and 2 ** k < nrows:
+        k += 1
+    return k
+
+
+def envelope(t, read_rows, read_level, nlevels, tmin=None, tmax=None,
+             max_points=None):
+    """ Returns (t, values) of a column between tmin and tmax with at most
+    about max_points points.
+
+    t are the times of all the rows, read_rows(rows) the values of the
+    column in the rows of a slice and read_level(k, buckets) the (min, max)
+    of the column in the buckets of a slice of the stored level k.  If the
+    rows fit in max_points (or it is None) they are returned as they are;
+    otherwise the minimum and the maximum of each bucket, at the time of
+    its first row.
+    """
+    i0 = 0 if tmin is None else int(np.searchsorted(t, tmin, 'left'))
+    i1 = len(t) if tmax is None else int(np.searchsorted(t, tmax, 'right'))
+    i1 = max(i0, i1)
+    if max_points is None or i1 - i0 <= max_points:
+        return t[i0:i1], read_rows(slice(i0, i1))
+
+    k = level_for(i1 - i0, max_points)
+    # The level to start from: the rows, or the closest stored level
+    if nlevels == 0 or k < FIRST_LEVEL:
+        base = 0
+    else:
+        base = min(k, FIRST_LEVEL + nlevels - 1)
+
+    # Whole buckets of level k, in units of the base level
+    b0 = (i0 >> k) << (k - base)
+    b1 = ((i1 + 2 ** k - 1) >> k) << (k - base)
+    if base == 0:
+        vmin = vmax = read_rows(slice(b0, b1))
+    else:
+        vmin, vmax = read_level(base, slice(b0, b1))
+    for _ in range(k - base):
+        vmin, vmax = halve(vmin, vmax)
+
+    tb = t[(i0 >> k) << k::2 ** k][:len(vmin)]
+    return np.repeat(tb, 2), np.column_stack((vmin, vmax)).ravel()
@@ -0,0 +1,905 @@
+# -*- coding: utf-8 -*-
+"""
+Low-level readers for the text files written by ZdPlaskin.
+
+ZdPlaskin keeps appending rows to the qt_*.txt files while a simulation
+is running, so these readers remember how far into each file they got
+and only parse what was appended since the last call.
+"""
+
+import io
+import os
+import threading
+
+import numpy as np
+
+from qtplaskin.parsers import field_spans, convert_fields
+from qtplaskin import compressed
+
+
+class GrowableArray(object):
+    """ A 2D array that grows along its first axis.
+
+    Rows are appended to a preallocated buffer whose capacity is doubled
+    when it runs out, so that appending n rows costs O(n) amortized and
+    the existing rows are not copied on every update.
+
+    With order='F' the buffer is column-major: each column of `data` is
+    contiguous in memory, while the appended rows are scattered into the
+    columns a block at a time, without ever transposing the whole array.
+    """
+
+    def __init__(self, ncols, dtype='d', capacity=1024, order='C'):
+        self.ncols = ncols
+        self.n = 0
+        self.order = order
+        self._buf = np.empty((capacity, ncols), dtype=dtype, order=order)
+
+    @classmethod
+    def from_array(cls, a):
+        """ Wraps an existing (possibly read-only) array.  The array is
+        copied only when more rows are appended. """
+        self = cls.__new__(cls)
+        self.ncols = a.shape[1]
+        self.n = a.shape[0]
+        self.order = 'F' if np.isfortran(a) else 'C'
+        self._buf = a
+        return self
+
+    @property
+    def data(self):
+        """ A view of the rows filled so far. """
+        return self._buf[:self.n]
+
+    def reserve(self, n):
+        """ Makes sure that there is room for n rows in total. """
+        if n <= self._buf.shape[0]:
+            return
+
+        capacity = max(n, 2 * self._buf.shape[0])
+        buf = np.empty((capacity, self.ncols), dtype=self._buf.dtype,
+                       order=self.order)
+        buf[:self.n] = self._buf[:self.n]
+        self._buf = buf
+
+    def append(self, rows):
+        rows = np.asarray(rows)
+        self.reserve(self.n + rows.shape[0])
+        self._buf[self.n:self.n + rows.shape[0]] = rows
+        self.n += rows.shape[0]
+
+    def truncate(self, n):
+        """ Forgets all rows after the first n. """
+        self.n = min(n, self.n)
+
+
+def read_head(path, skiprows, start=0):
+    """ The bytes of the header and of the first data line of path (and of
+    the line at start, if not 0), or None if they are not complete yet.  A
+    new run written over the file shows itself by a different head, even if
+    the file keeps its inode and grows. """
+    with open(path, 'rb') as fp:
+        lines = [fp.readline() for i in range(skiprows + 1)]
+        if start:
+            fp.seek(start)
+            lines.append(fp.readline())
+    if not all(line.endswith(b'\n') for line in lines):
+        return None
+    return b''.join(lines)
+
+
+class TailReader(object):
+    """ Incremental reader of a whitespace-separated table that may still be
+    growing.
+
+    Each call to `update` parses only the complete lines appended since the
+    previous call and adds them to `time` (the first column, always stored
+    in double precision) and `values` (the other columns, stored with the
+    given dtype).  A trailing line without a newline is accepted if it has
+    the right number of fields, but it is re-read in the next call in case
+    the writer had not finished it yet.  A file replaced by another one
+    (shorter, with another inode, or with another header or first data line)
+    is read again from the start.
+
+    The new bytes are read and parsed in pieces of about CHUNK_BYTES and
+    copied into arrays preallocated for all the new lines, so the peak
+    memory use stays close to the size of the final arrays.  `values` is
+    column-major: each column is contiguous.
+
+    parse is a function that receives a file-like object with complete lines
+    and returns a 2D array.  decimator, if given, filters the parsed rows
+    before they are stored (see `qtplaskin.decimate`).  ncols, if given, is
+    the number of columns the file must have, time included (e.g. from
+    `qtplaskin.modeldata.probe_directory`).
+    """
+
+    CHUNK_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, path, parse, skiprows=1, dtype='d', decimator=None,
+                 ncols=None):
+        self.path = path
+        self.parse = parse
+        self.expected_ncols = ncols
+        self.skiprows = skiprows
+        self.dtype = np.dtype(dtype)
+        self.decimator = decimator
+        # Compressed files are read whole (see `update`)
+        self.compressed = compressed.is_compressed(path)
+        self.start = 0
+        self._window_header = None
+        self._window_stop = None
+        self.reset()
+
+    def window(self, start, stop, header):
+        """ Restricts the reader to the lines in the bytes [start, stop) of
+        the file; stop=None reads up to the end, also as the file grows.
+        start must be the beginning of a line after the header. """
+        self.start = start
+        self._window_header = header
+        self._window_stop = stop
+        self.reset()
+
+    def reset(self):
+        """ Forgets everything read so far. """
+        self.offset = self.start
+        self.header = self._window_header
+        self.stop = self._window_stop
+        if self.decimator is not None:
+            self.decimator.reset()
+        self._time = None
+        self._values = None
+        self._expected = 0
+        self._provisional = 0
+        self._stat = None
+        self._head = None
+
+    def restore(self, offset, header, time, values):
+        """ Restores the state of a previous reader, e.g. from a cache, so
+        that the next update starts reading at offset. """
+        self.reset()
+        self.offset = offset
+        self.header = header
+        self._time = GrowableArray.from_array(time.reshape(-1, 1))
+        self._values = GrowableArray.from_array(values)
+        self._stat = os.stat(self.path)
+
+    @property
+    def nrows(self):
+        return 0 if self._time is None else self._time.n
+
+    @property
+    def complete_nrows(self):
+        """ Number of rows read from complete lines, i.e. excluding a
+        trailing line that may still be written. """
+        return self.nrows - self._provisional
+
+    @property
+    def time(self):
+        if self._time is None:
+            return np.empty((0,))
+        return self._time.data[:, 0]
+
+    @property
+    def values(self):
+        if self._values is None:
+            return np.empty((0, max(0, (self.ncols or 1) - 1)),
+                            dtype=self.dtype, order='F')
+        return self._values.data
+
+    def _read_head(self):
+        return read_head(self.path, self.skiprows, self.start)
+
+    def _replaced(self, st):
+        """ True if the file is not the one we were reading (e.g. a new run
+        overwrote it, also in place with the same header). """
+        if self._stat is None:
+            return False
+        return (st.st_size < self.offset
+                or getattr(st, 'st_ino', 0) != getattr(self._stat, 'st_ino', 0)
+                or (self._head is not None
+                    and self._read_head() != self._head))
+
+    def pending(self):
+        """ Prepares the next update.  Returns the arguments for `read_block`
+        that read whatever was appended since the last call. """
+        st = os.stat(self.path)
+        if self._replaced(st):
+            self.reset()
+
+        self._drop_provisional()
+        self._stat = st
+        if self._head is None:
+            self._head = self._read_head()
+
+        skiprows = self.skiprows if self.header is None else 0
+        size = st.st_size if self.stop is None else min(st.st_size, self.stop)
+        return (self.path, self.offset, size, self.parse, skiprows)
+
+    def _drop_provisional(self):
+        """ Drops the rows of a partial line that we may have read last time
+        (or, when decimating, that depend on rows still to come). """
+        if self._time is not None:
+            n = self.complete_nrows
+            self._time.truncate(n)
+            self._values.truncate(n)
+        self._provisional = 0
+
+    def apply(self, result):
+        """ Incorporates the result of `read_block`.  Returns the number of
+        new rows. """
+        header, nbytes, rows, partial = result
+        if header is not None:
+            self.header = header
+        self._drop_provisional()
+        n0 = self.nrows
+
+        if rows is not None:
+            if self.decimator is not None:
+                if isinstance(rows, tuple):
+                    rows = np.column_stack(rows)
+                rows = self.decimator.feed(np.atleast_2d(rows))
+            self._append(rows)
+        self.offset += nbytes
+
+        if partial is not None and partial.shape[-1] != self.ncols:
+            partial = None
+        if self.decimator is not None:
+            partial = self.decimator.peek(partial)
+        if partial is not None and partial.shape[0]:
+            self._append(partial)
+            self._provisional = partial.shape[0]
+
+        return self.nrows - n0
+
+    def update(self):
+        """ Parses the rows appended since the last call.  Returns the number
+        of new rows. """
+        if self.compressed:
+            return self._update_compressed()
+
+        args = self.pending()
+        path, offset, size = args[:3]
+        if size - offset > self.CHUNK_BYTES and self.decimator is None:
+            self._expected = self.nrows + _count_lines(path, offset, size)
+            if self._time is not None:
+                self._time.reserve(self._expected)
+                self._values.reserve(self._expected)
+
+        return sum(self.apply(result)
+                   for result in iter_blocks(*args,
+                                             chunk_bytes=self.CHUNK_BYTES))
+
+    def _update_compressed(self):
+        """ A compressed file does not grow: it is read in full the first
+        time and again only if it is replaced. """
+        st = os.stat(self.path)
+        if (self._stat is not None and st.st_size == self._stat.st_size
+                and st.st_mtime_ns == self._stat.st_mtime_ns):
+            return 0
+
+        self.reset()
+        self._stat = st
+        return sum(self.apply(result)
+                   for result in iter_compressed_blocks(
+                       self.path, self.parse, self.skiprows,
+                       chunk_bytes=self.CHUNK_BYTES))
+
+    @property
+    def ncols(self):
+        if self._values is not None:
+            return self._values.ncols + 1
+        if self.expected_ncols is not None:
+            return self.expected_ncols
+        if self.header:
+            return len(self.header[-1].split())
+        return None
+
+    def _append(self, rows):
+        """ Appends rows, a 2D array or a (time, values) pair (see
+        `read_block_split`). """
+        if isinstance(rows, tuple):
+            time, values = rows
+            time = time.reshape(-1, 1)
+        else:
+            rows = np.atleast_2d(rows)
+            time, values = rows[:, :1], rows[:, 1:]
+        if time.shape[0] == 0:
+            return
+        ncols = values.shape[1] + 1
+        if self._time is None:
+            if (self.expected_ncols is not None
+                    and ncols != self.expected_ncols):
+                raise ValueError("%s has %d columns, expected %d"
+                                 % (self.path, ncols, self.expected_ncols))
+            capacity = max(1024, time.shape[0], self._expected)
+            self._time = GrowableArray(1, dtype='d', capacity=capacity)
+            # Column-major, since the values are always read by columns
+            self._values = GrowableArray(ncols - 1, dtype=self.dtype,
+                                         capacity=capacity, order='F')
+        elif ncols != self.ncols:
+            raise ValueError("Inconsistent number of columns in %s: "
+                             "expected %d, found %d"
+                             % (self.path, self.ncols, ncols))
+        self._time.append(time)
+        self._values.append(values)
+
+
+def _parse_bytes(chunk, parse, skiprows=0):
+    """ Parses a chunk of bytes; see `read_block`. """
+    header = None
+    pos = 0
+    if skiprows:
+        lines = []
+        for i in range(skiprows):
+            nl = chunk.find(b'\n', pos)
+            if nl < 0:
+                return None, 0, None, None
+            lines.append(chunk[pos:nl].decode('ascii', 'replace'))
+            pos = nl + 1
+        header = lines
+
+    last_nl = chunk.rfind(b'\n', pos)
+    end = max(last_nl + 1, pos)
+    complete, tail = chunk[pos:end], chunk[end:]
+
+    rows = None
+    if complete.strip():
+        rows = parse(io.BytesIO(complete))
+
+    partial = None
+    if tail.strip():
+        try:
+            partial = np.atleast_2d(parse(io.BytesIO(tail)))
+        except ValueError:
+            partial = None
+
+    return header, end, rows, partial
+
+
+def read_block(path, offset, size, parse, skiprows=0):
+    """ Reads and parses the bytes between offset and size of path.
+
+    Returns a tuple (header, nbytes, rows, partial) where header contains the
+    first skiprows lines (None if skiprows is 0 or if they are not complete
+    yet), nbytes is the number of bytes consumed, rows the data from the
+    complete lines and partial the data in an unterminated last line (or None
+    if it could not be parsed).
+
+    This is a plain function so that it can also run in a worker process.
+    """
+    with open(path, 'rb') as fp:
+        fp.seek(offset)
+        chunk = fp.read(size - offset)
+
+    return _parse_bytes(chunk, parse, skiprows)
+
+
+def iter_blocks(path, offset, size, parse, skiprows=0,
+                chunk_bytes=TailReader.CHUNK_BYTES):
+    """ Same as `read_block`, but reads and parses the bytes in pieces of
+    about chunk_bytes that end at a line break.  Yields one tuple like those
+    of `read_block` per piece: only the first one may contain the header and
+    only the last one a partial line. """
+    with open(path, 'rb') as fp:
+        fp.seek(offset)
+        pos = offset
+        buf = b''
+        while True:
+            data = fp.read(min(chunk_bytes, size - pos))
+            pos += len(data)
+            buf += data
+            last = pos >= size or not data
+            if last:
+                block, rest = buf, b''
+            else:
+                nl = buf.rfind(b'\n')
+                if nl < 0:
+                    continue
+                block, rest = buf[:nl + 1], buf[nl + 1:]
+
+            result = _parse_bytes(block, parse, skiprows)
+            if skiprows and result[0] is None and not last:
+                # The header is longer than this piece
+                continue
+
+            skiprows = 0
+            yield result
+            if last:
+                return
+            buf = rest
+
+
+def iter_compressed_blocks(path, parse, skiprows=0,
+                           chunk_bytes=TailReader.CHUNK_BYTES):
+    """ Same as `iter_blocks` for the whole of a compressed file.  The file
+    is decompressed by a separate thread while the pieces are parsed. """
+    chunks = compressed.iter_chunks(path, chunk_bytes)
+    buf = b''
+    while True:
+        data = next(chunks, None)
+        last = data is None
+        if last:
+            block, rest = buf, b''
+        else:
+            buf += data
+            nl = buf.rfind(b'\n')
+            if nl < 0:
+                continue
+            block, rest = buf[:nl + 1], buf[nl + 1:]
+
+        result = _parse_bytes(block, parse, skiprows)
+        if skiprows and result[0] is None and not last:
+            # The header is longer than this piece
+            continue
+
+        skiprows = 0
+        yield result
+        if last:
+            return
+        buf = rest
+
+
+# Files smaller than this are not worth splitting between processes
+SPLIT_MIN_BYTES = 8 * 1024 * 1024
+
+
+def split_ranges(path, start, end, n):
+    """ Splits the bytes [start, end) of path into at most n ranges, each of
+    them ending just after a newline (except maybe the last one). """
+    bounds = [start]
+    with open(path, 'rb') as fp:
+        for k in range(1, n):
+            target = max(start + (end - start) * k // n, bounds[-1])
+            fp.seek(target)
+            pos = target
+            while pos < end:
+                window = fp.read(min(1 << 16, end - pos))
+                nl = window.find(b'\n')
+                if nl >= 0:
+                    pos += nl + 1
+                    break
+                pos += len(window)
+            if pos >= end:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _count_lines(path, start, end):
+    n = 0
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        pos = start
+        while pos < end:
+            chunk = fp.read(min(1 << 24, end - pos))
+            n += chunk.count(b'\n')
+            pos += len(chunk)
+    return n
+
+
+def _attach(name):
+    """ Attaches to the shared memory segment name without registering it in
+    the resource tracker, which is shared with the process that created it
+    and will unlink it. """
+    from multiprocessing import shared_memory, resource_tracker
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Before Python 3.13 attaching always registers the segment: skip that.
+    register = resource_tracker.register
+
+    def skip_shared_memory(name, rtype):
+        if rtype != 'shared_memory':
+            register(name, rtype)
+
+    resource_tracker.register = skip_shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _shared_rows(buf, nrows, ncols, dtype):
+    """ The (time, values) arrays stored in buf: the times in double
+    precision, then the other columns with the given dtype. """
+    time = np.ndarray((nrows, ), dtype='d', buffer=buf)
+    values = np.ndarray((nrows, ncols - 1), dtype=dtype, buffer=buf,
+                        offset=time.nbytes)
+    return time, values
+
+
+def _parse_into(path, start, end, parse, shm_name, nrows, ncols, dtype, row0):
+    """ Parses the bytes [start, end) of path into rows row0... of the shared
+    arrays (see `_shared_rows`).  Returns the number of rows parsed. """
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        rows = parse(io.BytesIO(fp.read(end - start)))
+
+    shm = _attach(shm_name)
+    try:
+        time, values = _shared_rows(shm.buf, nrows, ncols, dtype)
+        n = min(rows.shape[0], nrows - row0)
+        time[row0:row0 + n] = rows[:n, 0]
+        values[row0:row0 + n] = rows[:n, 1:]
+        del time, values
+    finally:
+        shm.close()
+    return rows.shape[0]
+
+
+def read_block_split(path, offset, size, parse, skiprows=0, workers=None,
+                     dtype='d', apply=None):
+    """ Same as `read_block`, but splits the new bytes in ranges aligned with
+    newlines and parses them in a pool of processes.
+
+    The number of lines in each range is counted first, so that the workers
+    can write their rows directly at the right place of arrays in shared
+    memory, preserving the order of the file.  The times are kept in double
+    precision and the other columns converted to dtype.  Falls back to
+    `read_block` for small blocks or if the file contains empty lines.
+
+    If apply is given (e.g. `TailReader.apply`), it is called with the result,
+    whose rows are then a (time, values) pair of arrays in shared memory,
+    and its return value is returned; it must copy what it keeps.  This way
+    the rows are copied only once.  Otherwise the rows are copied into a
+    single array, as returned by `read_block`.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    if apply is None:
+        apply = _identity
+
+    workers = workers or os.cpu_count() or 1
+    if size - offset < SPLIT_MIN_BYTES or workers < 2:
+        return apply(read_block(path, offset, size, parse, skiprows))
+
+    # Header and the partial last line are small: read them here.
+    header = None
+    with open(path, 'rb') as fp:
+        fp.seek(offset)
+        head = b''
+        if skiprows:
+            while head.count(b'\n') < skiprows + 1 and offset + len(head) < size:
+                head += fp.read(min(1 << 16, size - offset - len(head)))
+        else:
+            head = fp.read(min(1 << 16, size - offset))
+
+        tail_start = max(offset, size - (1 << 16))
+        fp.seek(tail_start)
+        tail = fp.read(size - tail_start)
+        while tail.rfind(b'\n') < 0 and tail_start > offset:
+            step = min(1 << 16, tail_start - offset)
+            tail_start -= step
+            fp.seek(tail_start)
+            tail = fp.read(step) + tail
+
+    pos = 0
+    if skiprows:
+        lines = head.split(b'\n')
+        if len(lines) <= skiprows:
+            return apply((None, 0, None, None))
+        header = [l.decode('ascii', 'replace') for l in lines[:skiprows]]
+        pos = sum(len(l) + 1 for l in lines[:skiprows])
+
+    start = offset + pos
+    last_nl = tail.rfind(b'\n')
+    end = max(tail_start + last_nl + 1, start)
+    partial = None
+    if tail[last_nl + 1:].strip():
+        try:
+            partial = np.atleast_2d(parse(io.BytesIO(tail[last_nl + 1:])))
+        except ValueError:
+            partial = None
+
+    if end - start < SPLIT_MIN_BYTES:
+        _, nbytes, rows, _ = read_block(path, start, end, parse)
+        return apply((header, end - offset, rows, partial))
+
+    first = head[pos:head.find(b'\n', pos) + 1]
+    if not first.strip():
+        return apply(read_block(path, offset, size, parse, skiprows))
+    ncols = np.atleast_2d(parse(io.BytesIO(first))).shape[1]
+
+    dtype = np.dtype(dtype)
+    ranges = split_ranges(path, start, end, 4 * workers)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        counts = list(ex.map(_count_lines, *zip(*((path, a, b)
+                                                  for a, b in ranges))))
+        nrows = sum(counts)
+        row0 = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        nbytes = nrows * (8 + (ncols - 1) * dtype.itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        try:
+            futures = [ex.submit(_parse_into, path, a, b, parse, shm.name,
+                                 nrows, ncols, dtype, int(r0))
+                       for (a, b), r0 in zip(ranges, row0)]
+            parsed = [f.result() for f in futures]
+            # e.g. empty lines: the rows are not where we expected.
+            if parsed == counts:
+                rows = _shared_rows(shm.buf, nrows, ncols, dtype)
+                if apply is _identity:
+                    rows = np.column_stack(rows)
+                try:
+                    return apply((header, end - offset, rows, partial))
+                finally:
+                    del rows
+        finally:
+            shm.unlink()
+            shm.close()
+
+    return apply(read_block(path, offset, size, parse, skiprows))
+
+
+def _identity(result):
+    return result
+
+
+class ColumnCache(object):
+    """ A least-recently-used cache of arrays with a bound on the total
+    number of bytes.  It may be used from several threads, e.g. by a plot
+    while the data is saved in the background. """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        from collections import OrderedDict
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._d = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        return key in self._d
+
+    def __len__(self):
+        return len(self._d)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._d.pop(key)
+            except KeyError:
+                return default
+            self._d[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self.pop(key)
+            self._d[key] = value
+            self.nbytes += value.nbytes
+            # Always keep the newest entry, even if it is too large by itself
+            while self.nbytes > self.max_bytes and len(self._d) > 1:
+                k, v = self._d.popitem(last=False)
+                self.nbytes -= v.nbytes
+
+    def pop(self, key):
+        with self._lock:
+            value = self._d.pop(key, None)
+            if value is not None:
+                self.nbytes -= value.nbytes
+            return value
+
+    def discard(self, name):
+        """ Forgets the arrays with keys (name, ...). """
+        with self._lock:
+            for key in [k for k in self._d if k[0] == name]:
+                self.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self.nbytes = 0
+
+
+class LazyTable(object):
+    """ Index of the rows of a qt_*.txt file that parses single columns on
+    demand.
+
+    `update` only scans the new bytes for line breaks and parses the time
+    column.  If all lines have the same length, as the fixed-width files
+    written by ZdPlaskin do, only that length is stored and a column is read
+    by slicing its bytes from a memory map of the file; otherwise the
+    offset of each line is kept and the lines are parsed in blocks.
+
+    A file replaced by another one (shorter, with another inode, or with
+    another header or first data line, see `read_head`) is indexed again
+    from the start, and generation is incremented so that the columns
+    parsed before can be discarded.
+
+    `update` and `column` hold a lock, so that a column can be read by one
+    thread while another one indexes new lines.
+    """
+
+    # Size of the blocks read when scanning or parsing the file
+    BLOCK_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, path, parse, skiprows=1, dtype='d'):
+        self.path = path
+        self.parse = parse
+        self.skiprows = skiprows
+        self.dtype = dtype
+        self.generation = 0
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.header = None
+        self.start = None   # Offset of the first data line
+        self.offset = 0     # End of the last complete line
+        self.nrows = 0
+        self.width = None   # Common length of all lines, if any
+        self.starts = None  # Offsets of each line if they differ
+        self.ncols = None
+        self._spans = None
+        self._time = GrowableArray(1, dtype='d')
+        self._stat = None
+        self._head = None
+        # Parsed unterminated last line, if any.  It is not indexed, since
+        # the writer may not have finished it.
+        self.partial = None
+
+    @property
+    def time(self):
+        t = self._time.data[:, 0]
+        if self.partial is not None:
+            t = np.r_[t, self.partial[0, 0]]
+        return t
+
+    def update(self):
+        """ Indexes the lines appended since the last call.  Returns the
+        number of new rows. """
+        with self._lock:
+            return self._update()
+
+    def _update(self):
+        st = os.stat(self.path)
+        if self._stat is not None and (
+                st.st_size < self.offset
+                or getattr(st, 'st_ino', 0) != getattr(self._stat, 'st_ino', 0)
+                or (self._head is not None
+                    and read_head(self.path, self.skiprows) != self._head)):
+            self.reset()
+            self.generation += 1
+        self._stat = st
+
+        if self.header is None:
+            if not self._read_header(st.st_size):
+                return 0
+
+        n0 = self.nrows
+        self.partial = None
+        with open(self.path, 'rb') as fp:
+            fp.seek(self.offset)
+            pos = self.offset
+            while pos < st.st_size:
+                chunk = fp.read(min(self.BLOCK_BYTES, st.st_size - pos))
+                nl = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+                if len(nl) == 0:
+                    break
+                self._add_lines(pos + nl + 1)
+                pos += nl[-1] + 1
+                fp.seek(pos)
+            fp.seek(self.offset)
+            tail = fp.read(st.st_size - self.offset)
+
+        if self.nrows > n0:
+            self._time.append(self._column(0, n0, self.nrows)[:, None])
+
+        if tail.strip() and len(tail) < self.BLOCK_BYTES:
+            try:
+                row = np.atleast_2d(self.parse(io.BytesIO(tail)))
+                if row.shape == (1, self.ncols):
+                    self.partial = row
+            except ValueError:
+                pass
+
+        return self.nrows - n0
+
+    def _read_header(self, size):
+        with open(self.path, 'rb') as fp:
+            lines = []
+            for i in range(self.skiprows + 1):
+                line = fp.readline()
+                if not line.endswith(b'\n'):
+                    return False
+                lines.append(line)
+
+        self._head = b''.join(lines)
+        self.header = [l.rstrip(b'\r\n').decode('ascii', 'replace')
+                       for l in lines[:self.skiprows]]
+        self.start = self.offset = sum(len(l) for l in lines[:self.skiprows])
+
+        first = lines[-1].rstrip(b'\r\n')
+        self.ncols = np.atleast_2d(self.parse(io.BytesIO(first))).shape[1]
+
+        # Byte spans of the (right-aligned) fields in the first line.
+        spans = field_spans(first)
+        if len(spans) == self.ncols:
+            self._spans = spans
+        return True
+
+    def _add_lines(self, ends):
+        """ Registers complete lines ending at ends (exclusive). """
+        lengths = np.diff(np.r_[self.offset, ends])
+        if self.starts is None:
+            if self.width is None:
+                self.width = lengths[0]
+            if np.all(lengths == self.width):
+                self.nrows += len(ends)
+                self.offset = int(ends[-1])
+                return
+
+            # From now on we need the offset of each line
+            self.starts = GrowableArray(1, dtype=np.int64,
+                                        capacity=max(1024, self.nrows + len(ends)))
+            self.starts.append((self.start + self.width
+                                * np.arange(self.nrows, dtype=np.int64))[:, None])
+            self.width = None
+
+        self.starts.append(np.r_[self.offset, ends[:-1]][:, None])
+        self.nrows += len(ends)
+        self.offset = int(ends[-1])
+
+    def _line_start(self, i):
+        if i >= self.nrows:
+            return self.offset
+        if self.starts is None:
+            return self.start + i * self.width
+        return int(self.starts.data[i, 0])
+
+    def column(self, j, start=0, stop=None):
+        """ Parses the column j (0 is time) of rows start to stop.  The time
+        column is always returned in double precision. """
+        with self._lock:
+            return self._column(j, start, stop)
+
+    def _column(self, j, start, stop):
+        stop = self.nrows if stop is None else min(stop, self.nrows)
+        dtype = 'd' if j == 0 else self.dtype
+        if stop <= start:
+            return np.empty((0,), dtype=dtype)
+
+        if self.width is not None and self._spans is not None:
+            try:
+                return self._fixed_width_column(j, start, stop)
+            except ValueError:
+                pass
+
+        out = np.empty((stop - start,), dtype=dtype)
+        i = start
+        with open(self.path, 'rb') as fp:
+            while i < stop:
+                a = self._line_start(i)
+                fp.seek(a)
+                block = fp.read(max(1, min(self.BLOCK_BYTES,
+                                           self._line_start(stop) - a)))
+                block = block[:block.rfind(b'\n') + 1]
+                if not block:
+                    # A single line longer than BLOCK_BYTES
+                    block = fp.readline()
+                rows = np.atleast_2d(self.parse(io.BytesIO(block)))
+                out[i - start:i - start + rows.shape[0]] = rows[:, j]
+                i += rows.shape[0]
+        return out
+
+    def _fixed_width_column(self, j, start, stop):
+        a, b = self._spans[j]
+        n = stop - start
+        m = np.memmap(self.path, dtype=np.uint8, mode='r',
+                      offset=self.start + start * self.width,
+                      shape=(n * self.width,)).reshape(n, self.width)
+        field = np.ascontiguousarray(m[:, a:b])
+        del m
+
+        # Check that no number crosses the field boundaries
+        if (j > 0 and np.any(field[:, 0] != 32)) or np.any(field[:, -1] == 32):
+            raise ValueError("Not a fixed-width column")
+
+        return convert_fields(field).astype('d' if j == 0 else self.dtype,
+                                            copy=False)
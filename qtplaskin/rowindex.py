@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent row index of the qt_*.txt data files.
+
+The index stores the byte offset and the time of every STRIDE-th row of a
+file, so that the rows within a time window are found by a binary search
+and read after a single seek, without scanning the rest of the file:
+
+    <run>/.qtplaskin_cache/qt_densities.txt.index.npz
+
+The index is built once, extended when the file grows and rebuilt if the
+file is replaced.  It records the size, modification time and inode of
+the file it was built from; if the file changed since, the times of a few
+indexed rows are read again and the index is discarded unless they match,
+so that a run written again in place is not read at stale offsets.
+"""
+
+import os
+import re
+from warnings import warn
+
+import numpy as np
+
+from qtplaskin import bincache
+
+INDEX_VERSION = 2
+
+# Indexed rows whose times are checked when the file has changed
+CHECKED_ROWS = 8
+
+_FORTRAN_EXP = re.compile(r'([0-9.])([+-][0-9])')
+
+
+def _first_float(line):
+    """ The first number of a line of bytes. """
+    token = line.split(None, 1)[0].decode('ascii')
+    try:
+        return float(token)
+    except ValueError:
+        return float(_FORTRAN_EXP.sub(r'\1E\2', token.replace('D', 'E')))
+
+
+class RowIndex(object):
+    """ Byte offsets and times of every stride-th row of a data file.
+
+    offsets[k] is the position of the first byte of row k * stride and
+    times[k] its time.  Only complete lines are indexed.
+    """
+
+    STRIDE = 1024
+    CHUNK_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, path, skiprows=1, stride=None, persist=True):
+        self.path = path
+        self.skiprows = skiprows
+        self.stride = stride or self.STRIDE
+        self.persist = persist
+        self.reset()
+        if persist:
+            self._load()
+
+    def reset(self):
+        self.stat = None
+        self.header = None
+        self.start = 0
+        self.end = 0
+        self.nrows = 0
+        self.offsets = np.empty((0,), dtype=np.int64)
+        self.times = np.empty((0,))
+
+    @property
+    def _index_path(self):
+        dirname, fname = os.path.split(self.path)
+        return os.path.join(bincache.cache_dir(dirname), fname + '.index.npz')
+
+    def _load(self):
+        try:
+            with np.load(self._index_path) as f:
+                meta = f['meta']
+                if (int(meta[0]) != INDEX_VERSION
+                        or int(meta[1]) != self.stride):
+                    return
+                header = f['header'].tobytes()
+                offsets, times = f['offsets'], f['times']
+                start, end, nrows = (int(x) for x in meta[2:5])
+                stat = [int(x) for x in meta[5:8]]
+        except (IOError, OSError, KeyError, ValueError):
+            return
+
+        # The index is still valid if the file has only grown since
+        with open(self.path, 'rb') as fp:
+            if fp.read(start) != header:
+                return
+            if end > start:
+                fp.seek(end - 1)
+                if fp.read(1) != b'\n':
+                    return
+
+        self.header = [l.decode('ascii', 'replace')
+                       for l in header.splitlines()]
+        self.start, self.end, self.nrows = start, end, nrows
+        self.offsets, self.times = offsets, times
+        self.stat = stat
+        if not self._unchanged():
+            self.reset()
+
+    def _file_stat(self):
+        st = os.stat(self.path)
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def _unchanged(self):
+        """ Whether the indexed rows are still those of the file: it is the
+        same file, untouched since it was indexed, or its indexed rows that
+        are checked still start at their offsets with their times. """
+        stat = self._file_stat()
+        if stat == self.stat:
+            return True
+        if self.stat is not None and stat[2] != self.stat[2]:
+            return False
+        if stat[0] < self.end:
+            return False
+
+        n = len(self.offsets)
+        checked = np.unique(np.linspace(0, n - 1, min(n, CHECKED_ROWS))
+                            .astype(int))
+        with open(self.path, 'rb') as fp:
+            for k in checked:
+                offset = int(self.offsets[k])
+                if offset > self.start:
+                    fp.seek(offset - 1)
+                    if fp.read(1) != b'\n':
+                        return False
+                else:
+                    fp.seek(offset)
+                line = fp.readline()
+                try:
+                    if _first_float(line) != self.times[k]:
+                        return False
+                except (ValueError, IndexError, UnicodeDecodeError):
+                    return False
+        self.stat = stat
+        return True
+
+    def save(self):
+        dirname = os.path.dirname(self._index_path)
+        tmp = self._index_path + '.tmp.npz'
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with open(self.path, 'rb') as fp:
+                header = fp.read(self.start)
+            meta = np.array([INDEX_VERSION, self.stride, self.start,
+                             self.end, self.nrows] + self.stat,
+                            dtype=np.int64)
+            np.savez(tmp, meta=meta, offsets=self.offsets, times=self.times,
+                     header=np.frombuffer(header, dtype=np.uint8))
+            os.replace(tmp, self._index_path)
+        except (IOError, OSError) as e:
+            warn("Could not write the row index of %s: %s" % (self.path, e))
+
+    def update(self):
+        """ Indexes the lines appended since the last call.  Returns the
+        number of new rows. """
+        if self.header is not None and not self._unchanged():
+            # Written again since it was indexed
+            self.reset()
+        stat = self._file_stat()
+        size = stat[0]
+
+        nrows0 = self.nrows
+        offsets, times = [self.offsets], [self.times]
+        with open(self.path, 'rb') as fp:
+            if self.header is None:
+                lines = [fp.readline() for i in range(self.skiprows)]
+                if not all(l.endswith(b'\n') for l in lines):
+                    return 0
+                self.header = [l.rstrip(b'\r\n').decode('ascii', 'replace')
+                               for l in lines]
+                self.start = self.end = fp.tell()
+
+            pos = self.end
+            fp.seek(pos)
+            while pos < size:
+                chunk = fp.read(min(self.CHUNK_BYTES, size - pos))
+                nl = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8)
+                                    == ord('\n'))
+                if len(nl) == 0:
+                    if len(chunk) < self.CHUNK_BYTES:
+                        break
+                    # A line longer than the chunk: read more of it
+                    chunk += fp.readline()
+                    if not chunk.endswith(b'\n'):
+                        break
+                    nl = np.array([len(chunk) - 1])
+
+                # Rows of this chunk that are multiples of stride
+                first = (-self.nrows) % self.stride
+                sel = np.arange(first, len(nl), self.stride)
+                starts = np.r_[0, nl[:-1] + 1][sel]
+                offsets.append(pos + starts)
+                times.append(np.array([_first_float(chunk[s:e])
+                                       for s, e in zip(starts, nl[sel])]))
+
+                self.nrows += len(nl)
+                pos += int(nl[-1]) + 1
+                fp.seek(pos)
+
+        self.end = pos
+        self.offsets = np.concatenate(offsets).astype(np.int64)
+        self.times = np.concatenate(times).astype('d')
+        self.stat = stat
+
+        if self.persist and self.nrows != nrows0:
+            self.save()
+        return self.nrows - nrows0
+
+    def byte_range(self, tmin=None, tmax=None):
+        """ Returns (start, stop), the bytes that contain all the rows with
+        tmin <= t <= tmax (and a few more).  stop is None if the window
+        extends past the indexed rows. """
+        start, stop = self.start, None
+        if tmin is not None and len(self.times):
+            k = max(0, np.searchsorted(self.times, tmin, side='left') - 1)
+            start = int(self.offsets[k])
+        if tmax is not None:
+            k = np.searchsorted(self.times, tmax, side='right')
+            if k < len(self.offsets):
+                stop = int(self.offsets[k])
+        return start, stop
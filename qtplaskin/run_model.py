@@ -12,11 +12,12 @@ import time
 from multiprocessing import Process, Pipe
 from collections import namedtuple
 
-from numpy import inf
+from numpy import inf, zeros, column_stack
 import scipy.constants as co
 
 from qtplaskin import config
-from qtplaskin.modeldata import ResultsData
+from qtplaskin.h5codecs import Compression, available_codecs
+from qtplaskin.h5writer import HDF5Writer
 from qtplaskin.runner import run
 
 # Default name of the file to read densities from
@@ -44,8 +45,13 @@ Results = namedtuple('Results', ['t',
                                  'source_matrix'])
 
 
-def receiver(conn):
+def receiver(conn, output=None, compression=None):
     """ This function receives data from the running process and collects it.
+
+    If output is given the rows are also appended to that HDF5 file, a
+    chunk of rows at a time (see `qtplaskin.h5writer`), so that it can be
+    opened while the run goes on and keeps the rows received if the run
+    crashes.
     """
 
     # First we get t, the species list and the reactions list.
@@ -59,12 +65,26 @@ def receiver(conn):
     conditions = dict((cond, zeros(t.shape))
                       for cond in tracked_conditions)
 
+    writer = None
+    if output is not None:
+        writer = HDF5Writer(output, species, reactions, tracked_conditions,
+                            source_matrix, compression=compression)
+
+    def write(stop):
+        start = writer.nrows
+        if stop > start:
+            writer.append(t[start:stop], density[start:stop],
+                          rates[start:stop],
+                          column_stack([conditions[k][start:stop]
+                                        for k in tracked_conditions]))
+
     # We will store sources in a list of dictionaries
     # e.g. rrt[index('E')][index('E + O2 -> 2E + O2^+')]
     # is the rate of creation of
     # electrons due to that reaction.  Only reactions with some effect
     # will appear as keys in the dictionary.
     sources = [dict() for s in species]
+    received = 0
     try:
         while True:
             data = conn.recv()
@@ -78,11 +98,20 @@ def receiver(conn):
             density[i, :] = c_density
             rates[i, :] = c_rates
 
-            for k, a in conditions.iteritems():
+            for k, a in conditions.items():
                 a[i] = c_conditions[k]
 
+            received = i + 1
+            if (writer is not None
+                    and received - writer.nrows >= writer.chunk_rows):
+                write(received)
+
     except EOFError:
         pass
+    finally:
+        if writer is not None:
+            write(received)
+            writer.close()
 
     res = Results(t=t,
                   species=species,
@@ -115,6 +144,23 @@ def main():
                       help="Output (HDF5) file",
                       type="str", default='out.h5')
 
+    parser.add_option("--codec", dest="codec",
+                      help=("Compression of the output: %s [gzip]"
+                            % ', '.join(available_codecs())),
+                      type="str", default='gzip')
+
+    parser.add_option("--level", dest="level",
+                      help="Compression level (default depends on the codec)",
+                      type="int", default=None)
+
+    parser.add_option("--no-shuffle", dest="shuffle",
+                      help="Do not use the shuffle filter",
+                      action="store_false", default=True)
+
+    parser.add_option("--chunks", dest="chunks",
+                      help="Shape of the chunks, ROWS,COLUMNS",
+                      type="str", default=None)
+
     (opts, args) = parser.parse_args()
 
     if opts.kinetics is None:
@@ -122,6 +168,14 @@ def main():
             "You need to specify a kinetic module with -k module.\n")
         sys.exit(-1)
 
+    try:
+        compression = Compression(
+            opts.codec, opts.level, opts.shuffle,
+            None if opts.chunks is None else opts.chunks.split(','))
+    except ValueError as e:
+        sys.stderr.write("%s\n" % e)
+        sys.exit(-1)
+
     try:
         field_file = args[0]
         species = args[1:]
@@ -137,9 +191,8 @@ def main():
 
     p.start()
 
-    res = receiver(conn_recv)
-    data = ResultsData(res)
-    data.save(opts.output)
+    # The output is written as the rows arrive
+    res = receiver(conn_recv, opts.output, compression)
 
     #save(res, opts.output)
 
@@ -67,5 +67,6 @@ setup(name='qtplaskin',
       scripts=[
           'scripts/qtplaskin'],
       include_package_data=True,
-      entry_points={"console_scripts": ["realpython=qtplaskin.main:main"]},
+      entry_points={"console_scripts": ["realpython=qtplaskin.main:main",
+                                        "qtplaskin-codecs=qtplaskin.h5codecs:main"]},
       zip_safe=False)
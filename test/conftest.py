@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from os.path import join, abspath, dirname
+import shutil
+
+import numpy as np
+
+import pytest
+
+DATA_01 = join(abspath(dirname(__file__)), './data/01')
+
+
+def write_table(path, t, values):
+    """ Writes a qt_*.txt data file with the fixed-width layout of
+    ZdPlaskin. """
+    with open(str(path), 'w') as fp:
+        fp.write('       Time_s' + ''.join('%13d' % (j + 1)
+                                          for j in range(values.shape[1]))
+                 + '\n')
+        np.savetxt(fp, np.column_stack([t, values]), fmt='%13.5E',
+                   delimiter='')
+
+
+@pytest.fixture
+def long_run(tmp_path):
+    """ The lists of test case 01 with a few thousand rows of data. """
+    d = tmp_path / 'long_run'
+    shutil.copytree(DATA_01, str(d))
+    t = np.linspace(0, 1, 5000)
+    rng = np.random.RandomState(0)
+    write_table(d / 'qt_densities.txt', t, rng.lognormal(size=(len(t), 3)))
+    write_table(d / 'qt_rates.txt', t, rng.lognormal(size=(len(t), 4)))
+    write_table(d / 'qt_conditions.txt', t, rng.lognormal(size=(len(t), 2)))
+    return d
@@ -8,7 +8,8 @@ import pytest
 
 @pytest.fixture
 def data():
-    return FastDirData(join(abspath(dirname(__file__)), './data/01'))
+    return FastDirData(join(abspath(dirname(__file__)), './data/01'),
+                       cache=False)
 
 def test_X_sources_10pct(data):
     icreation, idestruct = select_rates(data, 1, 0.1, -1)  
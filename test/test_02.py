@@ -14,7 +14,8 @@ test_arr = array([0.0, 1.0, inf, inf, -inf, nan], dtype=float)
 
 @pytest.fixture
 def fast_data():
-    return FastDirData(join(abspath(dirname(__file__)), './data/02'))
+    return FastDirData(join(abspath(dirname(__file__)), './data/02'),
+                       cache=False)
 
 
 @pytest.fixture
@@ -22,6 +23,26 @@ def slow_data():
     return DirectoryData(join(abspath(dirname(__file__)), './data/02'))
 
 
+@pytest.fixture
+def fixedwidth_data():
+    return DirectoryData(join(abspath(dirname(__file__)), './data/02'),
+                         engine='fixedwidth')
+
+
+@pytest.mark.parametrize("specie, expected",
+    [(1, test_arr), (2, test_arr[::-1]) ] )
+def test_density_fixedwidth(fixedwidth_data, specie, expected):
+    actual = fixedwidth_data.density(specie)
+    assert_array_equal(expected, actual)
+
+
+@pytest.mark.parametrize("cond, expected",
+    [(1, test_arr), (2, test_arr[::-1]) ] )
+def test_condition_fixedwidth(fixedwidth_data, cond, expected):
+    actual = fixedwidth_data.condition(cond)
+    assert_array_equal(expected, actual)
+
+
 @pytest.mark.parametrize("specie, expected",
     [(1, test_arr), (2, test_arr[::-1]) ] )
 def test_density_slow(slow_data, specie, expected):
@@ -43,7 +64,6 @@ def test_rate_slow(slow_data, rate, expected):
     assert_array_equal(expected, actual)
 
 
-@pytest.mark.xfail
 @pytest.mark.parametrize("specie, expected",
     [(1, test_arr), (2, test_arr[::-1]) ] )
 def test_density_fast(fast_data, specie, expected):
@@ -51,7 +71,6 @@ def test_density_fast(fast_data, specie, expected):
     assert_array_equal(expected, actual)
 
 
-@pytest.mark.xfail
 @pytest.mark.parametrize("cond, expected",
     [(1, test_arr), (2, test_arr[::-1]) ] )
 def test_condition_fast(fast_data, cond, expected):
@@ -59,7 +78,6 @@ def test_condition_fast(fast_data, cond, expected):
     assert_array_equal(expected, actual)
 
 
-@pytest.mark.xfail
 @pytest.mark.parametrize("rate, expected",
     [(1, test_arr)] )
 def test_rate_fast(fast_data, rate, expected):
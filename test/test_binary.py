@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, BinaryDirData, probe_directory
+from qtplaskin import binformat
+from os.path import join, abspath, dirname
+import os
+import shutil
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+def _binary_run(case, tmp_path, nrows=None):
+    """ Copies a test case and writes its data in binary format. """
+    ref = DirectoryData(join(DATA, case))
+    path = str(tmp_path / 'run')
+    shutil.copytree(join(DATA, case), path)
+    for f in (ref.F_DENSITIES, ref.F_RATES, ref.F_CONDITIONS):
+        os.remove(join(path, f))
+
+    n = len(ref.t) if nrows is None else nrows
+    with binformat.BinaryWriter(join(path, BinaryDirData.F_DATA),
+                                len(ref.species), len(ref.reactions),
+                                len(ref.conditions)) as w:
+        w.append(ref.t[:n], ref.raw_density[:n], ref.raw_rates[:n],
+                 ref.raw_conditions[:n])
+    return ref, path
+
+
+@pytest.mark.parametrize("case", ['01', '02', 'two_letters_atom_failure'])
+def test_binary_same_as_text(tmp_path, case):
+    ref, path = _binary_run(case, tmp_path)
+    data = BinaryDirData(path)
+    assert data.species == ref.species
+    assert data.reactions == ref.reactions
+    assert_array_equal(data.t, ref.t)
+    for i in range(len(ref.species)):
+        assert_array_equal(data.density(i + 1), ref.density(i + 1))
+    for i in range(len(ref.reactions)):
+        assert_array_equal(data.rate(i + 1), ref.rate(i + 1))
+    for i in range(len(ref.conditions)):
+        assert_array_equal(data.condition(i + 1), ref.condition(i + 1))
+    assert_array_equal(data.source_matrix, ref.source_matrix)
+
+
+def test_binary_sources(tmp_path):
+    ref, path = _binary_run('two_letters_atom_failure', tmp_path)
+    data = BinaryDirData(path)
+    for i in range(len(ref.species)):
+        expected = ref.sources(i + 1)
+        actual = data.sources(i + 1)
+        assert sorted(actual) == sorted(expected)
+        for k in expected:
+            assert_array_equal(actual[k], expected[k])
+
+
+def test_binary_growing(tmp_path):
+    ref, path = _binary_run('01', tmp_path, nrows=1)
+    data = BinaryDirData(path)
+    assert len(data.t) == 1
+
+    fname = join(path, BinaryDirData.F_DATA)
+    row = np.r_[ref.t[1], ref.raw_density[1], ref.raw_rates[1],
+                ref.raw_conditions[1]].astype('<f8').tobytes()
+    with open(fname, 'ab') as fp:
+        # Half a record is not read
+        fp.write(row[:20])
+    data.update()
+    assert len(data.t) == 1
+
+    with open(fname, 'ab') as fp:
+        fp.write(row[20:])
+    data.update()
+    assert_array_equal(data.t, ref.t[:2])
+    assert_array_equal(data.rate(4), ref.rate(4)[:2])
+
+
+def test_binary_layout(tmp_path):
+    path = str(tmp_path / 'qt_data.bin')
+    with binformat.BinaryWriter(path, 2, 3, 1) as w:
+        w.append(1., [2., 3.], [4., 5., 6.], [7.])
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    assert data[:8] == b'QTPLBIN1'
+    assert len(data) == 64 + 8 * 7
+    assert_array_equal(np.frombuffer(data[64:], dtype='<f8'),
+                       np.arange(1., 8.))
+
+
+def test_binary_invalid(tmp_path):
+    ref, path = _binary_run('01', tmp_path)
+    with open(join(path, BinaryDirData.F_DATA), 'r+b') as fp:
+        fp.write(b'NOTBINRY')
+    with pytest.raises(ValueError):
+        BinaryDirData(path)
+
+
+def test_binary_lists_mismatch(tmp_path):
+    ref, path = _binary_run('01', tmp_path)
+    with open(join(path, ref.F_SPECIES_LIST), 'a') as fp:
+        fp.write('\n 4 X(3)')
+    with pytest.raises(ValueError):
+        BinaryDirData(path)
+
+
+def test_binary_probe(tmp_path):
+    ref, path = _binary_run('01', tmp_path)
+    assert probe_directory(path)['class'] is BinaryDirData
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, HDF5Data
+from qtplaskin.colstats import ColumnStats, parse_condition, select, STATS
+from os.path import join, abspath, dirname
+
+import numpy as np
+
+from numpy.testing import assert_array_equal, assert_allclose
+
+import pytest
+
+from conftest import write_table
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+def _expected(t, v):
+    """ The statistics of v computed directly. """
+    finite = np.isfinite(v)
+    masked = np.where(finite, v, -np.inf)
+    return dict(min=np.where(finite, v, np.inf).min(axis=0),
+                max=masked.max(axis=0),
+                t_max=np.where(finite.any(axis=0),
+                               t[masked.argmax(axis=0)], np.nan),
+                integral=np.trapezoid(np.where(finite, v, 0), t, axis=0),
+                final=v[-1],
+                nonfinite=(~finite).sum(axis=0))
+
+
+def test_stats_in_pieces():
+    rng = np.random.RandomState(1)
+    t = np.cumsum(rng.uniform(size=100))
+    v = rng.lognormal(size=(100, 4))
+    v[5, 0] = np.nan
+    v[50:60, 1] = np.inf
+    v[:, 3] = np.nan
+    expected = _expected(t, v)
+
+    for step in [100, 1, 7]:
+        st = ColumnStats(4)
+        for i in range(0, 100, step):
+            st.update(t[i:i + step], v[i:i + step])
+        assert st.nrows == 100
+        for k in STATS:
+            assert_allclose(getattr(st, k), expected[k], err_msg=k)
+
+    # Columns without finite values have no maximum
+    assert st.max[3] == -np.inf and np.isnan(st.t_max[3])
+
+    copy = ColumnStats.from_array(st.to_array(), st.nrows, st.t_last)
+    assert_array_equal(copy.to_array(), st.to_array())
+    assert copy.nonfinite.dtype.kind == 'i'
+
+
+def test_select():
+    st = ColumnStats(4).update(np.arange(3.), np.array([[1., 1e12, 5., 1e11],
+                                                        [2., 3., 1e11, 0.],
+                                                        [0., 0., 4., 1.]]))
+    assert_array_equal(select(st, 'max > 1e10'), [1, 2, 3])
+    assert_array_equal(select(st, 'max density > 1e10; final >= 1'), [2, 3])
+    assert_array_equal(select(st, 'max>1e10 and t_max = 1'), [2])
+    assert_array_equal(select(st, '', sort='max'), [1, 2, 3, 0])
+    assert_array_equal(select(st, 'nonfinite == 0', sort='min',
+                              descending=False), [0, 1, 3, 2])
+
+    assert parse_condition('MAX rate < -1.5e-3')[1:] == (
+        parse_condition('max < 0')[1], -1.5e-3)
+    for text in ['max', 'max > big', 'maximum > 1', 'max >> 1']:
+        with pytest.raises(ValueError):
+            select(st, text)
+    with pytest.raises(ValueError):
+        select(st, sort='median')
+
+
+def test_stats_follow_updates(long_run):
+    t = np.linspace(0, 1, 5000)
+    data = DirectoryData(str(long_run))
+    st = data.stats('rate')
+    assert_allclose(st.integral, _expected(data.t, data.raw_rates)['integral'])
+    # The last row is not kept
+    assert data._stats['rate'].nrows == len(data.t) - 1
+
+    # More rows, with a new maximum
+    rng = np.random.RandomState(2)
+    values = rng.lognormal(size=(100, 4))
+    values[50, 2] = 1e20
+    for fname, block in [('qt_densities.txt', np.ones((100, 3))),
+                         ('qt_rates.txt', values),
+                         ('qt_conditions.txt', np.ones((100, 2)))]:
+        with open(str(long_run / fname), 'a') as fp:
+            np.savetxt(fp, np.column_stack([1 + t[1:101], block]),
+                       fmt='%13.5E', delimiter='')
+    data.update()
+    st = data.stats('rate')
+    expected = _expected(data.t, data.raw_rates)
+    for k in STATS:
+        assert_allclose(getattr(st, k), expected[k], err_msg=k)
+    assert st.max[2] == 1e20
+
+
+def test_stats_are_stored(tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, stats=True)
+
+    h5 = HDF5Data(fname)
+    for quantity in ['density', 'rate', 'condition']:
+        stored = h5._stored_stats(quantity)
+        assert stored.nrows == len(data.t)
+        assert_array_equal(h5.stats(quantity).to_array(),
+                           data.stats(quantity).to_array())
+
+    h5.close()
+
+    # Without them they are computed from the file, in both layouts
+    for version in [1, 2]:
+        data.save(fname, version=version)
+        h5 = HDF5Data(fname)
+        assert h5._stored_stats('rate') is None
+        assert_allclose(h5.stats('rate').to_array(),
+                        data.stats('rate').to_array())
+        h5.close()
+
+
+def test_stats_in_binary_cache(long_run):
+    data = DirectoryData(str(long_run), cache=True)
+    cached = DirectoryData(str(long_run), cache=True)
+    assert data._saved_stats
+    stored = cached._stored_stats('density')
+    assert stored.nrows == len(cached.t)
+    assert_array_equal(cached.stats('density').to_array(),
+                       data.stats('density').to_array())
+
+    # Statistics of other rows are not used
+    write_table(long_run / 'qt_densities.txt', cached.t[:10],
+                np.ones((10, 3)))
+    data = DirectoryData(str(long_run))
+    assert not data._stats_valid(stored, data.t, 3)
+
+
+def test_filter_follows_updates(long_run, monkeypatch):
+    from PyQt5 import QtWidgets
+    from qtplaskin import main
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.DesignerMainWindow()
+    window.data = DirectoryData(str(long_run))
+    window.update_lists()
+    table, edit, combo = window.list_filters['rate']
+    edit.setText('max > 1e10')
+    window.filter_list('rate')
+    assert table.rowCount() == 0
+
+    # Reaction 2 passes the filter and stays selected as 3 joins it
+    write_table(long_run / 'qt_rates.txt', np.linspace(0, 1, 5000),
+                np.ones((5000, 4)) * [1., 1e12, 1., 1.])
+    window.data.update()
+    window.filter_list('rate')
+    table.selectRow(0)
+    for fname, block in [('qt_densities.txt', np.ones((1, 3))),
+                         ('qt_rates.txt', [[1., 1e12, 1e12, 1.]]),
+                         ('qt_conditions.txt', np.ones((1, 2)))]:
+        with open(str(long_run / fname), 'a') as fp:
+            np.savetxt(fp, np.column_stack([[1.001], block]), fmt='%13.5E',
+                       delimiter='')
+    window.data_update()
+    assert [int(table.item(i, 0).text())
+            for i in range(table.rowCount())] == [2, 3]
+    assert [n for n, name in main.iter_2_selected(table)] == [2]
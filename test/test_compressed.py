@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import (FastDirData, DirectoryData, OldDirectoryData,
+                                 probe_directory)
+from qtplaskin import readers, compressed
+from os.path import join, abspath, dirname
+import os
+import gzip
+import lzma
+import shutil
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+COMPRESSORS = {'.gz': gzip.compress, '.xz': lzma.compress}
+
+
+def _compress_run(src, dst, suffix, fnames=None):
+    shutil.copytree(src, dst)
+    for fname in fnames or os.listdir(dst):
+        if not fname.startswith('qt_'):
+            continue
+        path = join(dst, fname)
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        with open(path + suffix, 'wb') as fp:
+            fp.write(COMPRESSORS[suffix](data))
+        os.remove(path)
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+@pytest.mark.parametrize("suffix", sorted(COMPRESSORS))
+@pytest.mark.parametrize("case", ['01', 'two_letters_atom_failure'])
+def test_compressed_same_as_plain(tmp_path, cls, suffix, case, monkeypatch):
+    ref = DirectoryData(join(DATA, case))
+    path = str(tmp_path / 'run')
+    _compress_run(join(DATA, case), path, suffix)
+    # Small pieces, so that even the header is split
+    monkeypatch.setattr(readers.TailReader, 'CHUNK_BYTES', 16)
+
+    data = cls(path)
+    assert data.species == ref.species
+    assert_array_equal(data.t, ref.t)
+    assert_array_equal(data.raw_density, ref.raw_density)
+    assert_array_equal(data.raw_rates, ref.raw_rates)
+    assert_array_equal(data.raw_conditions, ref.raw_conditions)
+    assert_array_equal(data.source_matrix, ref.source_matrix)
+
+    # Nothing changes
+    data.update()
+    assert_array_equal(data.t, ref.t)
+
+
+@pytest.mark.parametrize("parallel", [None, 'thread', 'process', 'split'])
+def test_some_files_compressed(tmp_path, parallel):
+    ref = DirectoryData(join(DATA, '01'))
+    path = str(tmp_path / 'run')
+    _compress_run(join(DATA, '01'), path, '.gz', ['qt_rates.txt'])
+
+    data = DirectoryData(path, parallel=parallel, tmin=1.)
+    assert_array_equal(data.raw_rates, ref.raw_rates[ref.t >= 1.])
+    assert_array_equal(data.raw_density, ref.raw_density[ref.t >= 1.])
+
+
+def test_compressed_cache(tmp_path):
+    path = str(tmp_path / 'run')
+    _compress_run(join(DATA, '01'), path, '.xz')
+    ref = FastDirData(path)
+    data = FastDirData(path)
+    assert data._readers['qt_densities.txt'].offset > 0
+    assert_array_equal(data.raw_rates, ref.raw_rates)
+
+
+def test_compressed_probe(tmp_path):
+    path = str(tmp_path / 'run')
+    _compress_run(join(DATA, '01'), path, '.gz')
+    probe = probe_directory(path)
+    assert probe['class'] is DirectoryData
+    assert probe['columns']['qt_rates.txt'] == 5
+
+
+def test_compressed_lazy_invalid(tmp_path):
+    path = str(tmp_path / 'run')
+    _compress_run(join(DATA, '01'), path, '.gz')
+    with pytest.raises(ValueError):
+        DirectoryData(path, lazy=True)
+
+
+def test_iter_chunks_stops_early(tmp_path):
+    path = str(tmp_path / 'big.gz')
+    with gzip.open(path, 'wb') as fp:
+        fp.write(b'x' * 100000)
+    chunks = compressed.iter_chunks(path, 10)
+    assert next(chunks) == b'x' * 10
+    chunks.close()
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    COMPRESSORS['.zst'] = zstandard.ZstdCompressor().compress
+    try:
+        ref = DirectoryData(join(DATA, '01'))
+        path = str(tmp_path / 'run')
+        _compress_run(join(DATA, '01'), path, '.zst')
+        assert_array_equal(DirectoryData(path).raw_rates, ref.raw_rates)
+    finally:
+        del COMPRESSORS['.zst']
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import FastDirData, DirectoryData
+from qtplaskin.decimate import make_decimator
+from qtplaskin import readers
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+
+def _feed(decimator, rows, sizes):
+    """ Feeds rows in blocks of the given sizes. """
+    out, i = [], 0
+    for n in sizes:
+        out.append(decimator.feed(rows[i:i + n]))
+        i += n
+    out.append(decimator.feed(rows[i:]))
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("mode", ['stride', 'log', 'peak'])
+def test_blocks_do_not_matter(mode):
+    rows = np.column_stack([np.linspace(0, 10, 1000),
+                            np.random.RandomState(1).rand(1000, 3)])
+    whole = make_decimator(mode, 7).feed(rows)
+    pieces = _feed(make_decimator(mode, 7), rows, [1, 5, 100, 3, 400])
+    assert_array_equal(whole, pieces)
+
+
+def test_stride():
+    rows = np.arange(20.).reshape(10, 2)
+    assert_array_equal(make_decimator('stride', 3).feed(rows), rows[::3])
+
+
+def test_log():
+    t = np.r_[0, np.logspace(-3, 0, 301)]
+    rows = np.column_stack([t, t])
+    kept = make_decimator('log', 10).feed(rows)
+    # t = 0, and about 10 per decade
+    assert kept[0, 0] == 0
+    assert 30 <= kept.shape[0] <= 32
+
+
+def test_peak_keeps_extrema():
+    rows = np.zeros((100, 3))
+    rows[:, 0] = np.arange(100)
+    rows[37, 1] = 5.
+    rows[38, 2] = -5.
+    d = make_decimator('peak', 10)
+    kept = d.feed(rows)
+    assert kept.shape == (20, 3)
+    assert kept[:, 1].max() == 5.
+    assert kept[:, 2].min() == -5.
+    assert_array_equal(kept[::2, 0], np.arange(0, 100, 10))
+    assert_array_equal(kept[1::2, 0], np.arange(9, 100, 10))
+
+
+def test_peak_peek():
+    rows = np.column_stack([np.arange(15.), np.arange(15.)])
+    d = make_decimator('peak', 10)
+    assert d.feed(rows).shape == (2, 2)
+    # The incomplete bucket is shown but not consumed
+    assert_array_equal(d.peek(), [[10, 10], [14, 14]])
+    assert_array_equal(d.feed(rows[:5] + 15), [[10, 10], [19, 19]])
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        make_decimator('nonsense', 2)
+    with pytest.raises(ValueError):
+        make_decimator('stride', 0)
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+@pytest.mark.parametrize("mode", ['stride', 'log', 'peak'])
+def test_decimated_load(long_run, cls, mode, monkeypatch):
+    full = cls(str(long_run), cache=False)
+    monkeypatch.setattr(readers.TailReader, 'CHUNK_BYTES', 1000)
+    data = cls(str(long_run), decimate=mode, decimate_n=8)
+
+    rows = np.column_stack([full.t, full.raw_rates])
+    expected = make_decimator(mode, 8).feed(rows)
+    assert_array_equal(data.t, expected[:, 0])
+    assert_array_equal(data.raw_rates, expected[:, 1:])
+    assert data.raw_density.shape[0] == data.raw_conditions.shape[0]
+    assert len(data.t) <= len(full.t) / 4
+
+
+def test_decimated_update(long_run):
+    data = DirectoryData(str(long_run), decimate='peak', decimate_n=8)
+    n = len(data.t)
+    with open(str(long_run / 'qt_rates.txt'), 'a') as fp:
+        fp.write('  1.10000E+00  9.90000E+09  1.00000E+00  1.00000E+00'
+                 '  1.00000E+00\n')
+    data.update()
+    assert len(data.t) == n
+    assert data.raw_rates[:, 0].max() < 9.9e9
+    for fname in ('qt_densities.txt', 'qt_conditions.txt'):
+        with open(str(long_run / fname), 'a') as fp:
+            fp.write('  1.10000E+00' + '  1.00000E+00' * (3 if fname ==
+                                                         'qt_densities.txt'
+                                                         else 2) + '\n')
+    data.update()
+    assert data.raw_rates[:, 0].max() == 9.9e9
+
+
+def test_decimate_lazy_invalid(long_run):
+    with pytest.raises(ValueError):
+        DirectoryData(str(long_run), lazy=True, decimate='stride')
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, HDF5Data, SaveCancelled
+from qtplaskin.h5codecs import (Compression, available_codecs, benchmark,
+                                main)
+from os.path import join, abspath, dirname
+import shutil
+
+import h5py
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+@pytest.mark.parametrize("version", [1, 2])
+@pytest.mark.parametrize("codec", available_codecs())
+def test_roundtrip(codec, version, tmp_path):
+    data = DirectoryData(join(DATA, '02'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, version=version, compression=codec)
+
+    h5 = HDF5Data(fname)
+    assert h5.h5['main'].attrs['compression'] == codec
+    for i in range(len(data.species)):
+        assert_array_equal(h5.density(i + 1), data.density(i + 1))
+    for i in range(len(data.reactions)):
+        assert_array_equal(h5.rate(i + 1), data.rate(i + 1))
+    assert_array_equal(h5.source_matrix, data.source_matrix)
+
+
+def test_settings_are_used(tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, compression=Compression('gzip', 9, shuffle=False,
+                                             chunks=(2, 3)))
+    with h5py.File(fname, 'r') as f:
+        ds = f['main/rate']
+        assert ds.compression == 'gzip'
+        assert ds.compression_opts == 9
+        assert not ds.shuffle
+        assert ds.chunks == (2, 3)
+
+    data.save(fname, version=1, compression='lzf')
+    with h5py.File(fname, 'r') as f:
+        ds = f['main/rate/0001']
+        assert ds.compression == 'lzf'
+        assert ds.shuffle
+
+    data.save(fname, compression='none')
+    with h5py.File(fname, 'r') as f:
+        assert f['main/rate'].compression is None
+
+
+def test_options():
+    assert Compression('none').options((100, )) == {}
+    assert Compression('gzip').options((0, 5)) == {}
+    opts = Compression('gzip', chunks=(1000, 10)).options((10, 5))
+    assert opts['chunks'] == (10, 5)
+    assert opts['compression_opts'] == 4
+    assert Compression('gzip', chunks=(3, 10)).options((10, ))['chunks'] \
+        == (3, )
+
+    c = Compression.parse('gzip:7')
+    assert (c.codec, c.level) == ('gzip', 7)
+    assert str(c) == 'gzip:7'
+    for args in [('bzip2', ), ('gzip', 10), ('lzf', 1),
+                 ('gzip', None, True, (0, 1)), ('gzip', None, True, (1, ))]:
+        with pytest.raises(ValueError):
+            Compression(*args)
+
+
+def test_benchmark(tmp_path, capsys):
+    data = DirectoryData(join(DATA, '01'))
+    results = benchmark(data, [Compression('gzip'), Compression('none')],
+                        str(tmp_path))
+    assert [str(r[0]) for r in results] == ['gzip', 'none']
+    assert all(r[3] > 0 and r[4] > 0 for r in results)
+    assert list(tmp_path.iterdir()) == []
+
+    # The command line caches the run: not in the test data
+    run = str(tmp_path / 'run')
+    shutil.copytree(join(DATA, '01'), run)
+    main([run, '-c', 'lzf', '-c', 'gzip:1'])
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split()[0] == 'codec'
+    assert [l.split()[0] for l in out[1:]] == ['lzf', 'gzip:1']
+
+
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_pooled_compression(shuffle, tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    fname = str(tmp_path / 'out.h5')
+    # Chunks that do not divide the data
+    c = Compression('gzip', 6, shuffle=shuffle, chunks=(3, 5))
+    data.save(fname, compression=c, workers=3)
+
+    h5 = HDF5Data(fname)
+    assert h5.h5['main/rate'].chunks == (3, 5)
+    for i in range(len(data.reactions)):
+        assert_array_equal(h5.rate(i + 1), data.rate(i + 1))
+    for i in range(len(data.species)):
+        assert_array_equal(h5.density(i + 1), data.density(i + 1))
+
+
+def test_progress_and_cancel(tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    total = len(data.species) + len(data.reactions) + len(data.conditions)
+    for version in [1, 2]:
+        calls = []
+        data.save(str(tmp_path / 'out.h5'), version=version,
+                  progress=lambda done, n: calls.append((done, n)))
+        assert calls[-1] == (total, total)
+        assert all(n == total for done, n in calls)
+        assert [done for done, n in calls] == sorted(done for done, n
+                                                     in calls)
+
+        fname = tmp_path / 'cancelled.h5'
+        with pytest.raises(SaveCancelled):
+            data.save(str(fname), version=version,
+                      progress=lambda done, n: done < 3)
+        assert not fname.exists()
+
+
+def test_save_thread(tmp_path):
+    from qtplaskin.main import SaveThread
+
+    data = DirectoryData(join(DATA, '01'))
+    fname = str(tmp_path / 'out.h5')
+    thread = SaveThread(data, fname, Compression('lzf'))
+    thread.run()
+    assert thread.error is None
+    assert HDF5Data(fname).reactions == data.reactions
+
+    thread = SaveThread(data, fname, Compression('lzf'))
+    thread.cancel()
+    thread.run()
+    assert thread.error is None
+    assert not (tmp_path / 'out.h5').exists()
+
+
+def test_save_while_plotting(long_run, tmp_path, monkeypatch):
+    from PyQt5 import QtWidgets
+    from qtplaskin import main
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.DesignerMainWindow()
+    window.data = data = DirectoryData(str(long_run), lazy=True,
+                                       cache_bytes=8 * 5000)
+    updates = []
+    monkeypatch.setattr(data, 'update', lambda: updates.append(1))
+
+    fname = str(tmp_path / 'out.h5')
+    window.start_save(fname, Compression('lzf'))
+    thread = window.save_thread
+    window.data_update()
+    # The lazy columns are read and cached by both threads
+    for i in range(20):
+        data.rate(i % 4 + 1)
+        data.density(i % 3 + 1)
+    thread.wait()
+    app.processEvents()
+
+    assert not updates
+    assert thread.error is None
+    assert window.save_thread is None
+    saved = HDF5Data(fname)
+    for i in range(4):
+        assert_array_equal(saved.rate(i + 1), data.rate(i + 1))
+    window.data_update()
+    assert updates
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, HDF5Data
+from qtplaskin.h5writer import HDF5Writer
+from os.path import join, abspath, dirname
+
+import numpy as np
+import h5py
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+@pytest.fixture
+def run():
+    return DirectoryData(join(DATA, 'two_letters_atom_failure'))
+
+
+def _writer(run, fname, **kwargs):
+    return HDF5Writer(fname, run.species, run.reactions, run.conditions,
+                      run.source_matrix, **kwargs)
+
+
+def _append(writer, run, rows):
+    writer.append(run.t[rows], run.raw_density[rows], run.raw_rates[rows],
+                  run.raw_conditions[rows])
+
+
+def test_read_while_writing(run, tmp_path):
+    fname = str(tmp_path / 'live.h5')
+    writer = _writer(run, fname, compression='gzip:1', chunk_rows=3)
+    _append(writer, run, slice(0, 2))
+
+    h5 = HDF5Data(fname)
+    assert h5.version == 2
+    assert h5.species == run.species
+    assert h5.conditions == run.conditions
+    assert_array_equal(h5.t, run.t[:2])
+    assert_array_equal(h5.rate(4), run.rate(4)[:2])
+    assert h5.stats('rate').nrows == 2
+
+    _append(writer, run, slice(2, 5))
+    _append(writer, run, slice(5, None))
+    # Nothing changes until update
+    assert len(h5.t) == 2
+    h5.update()
+    assert_array_equal(h5.t, run.t)
+    for i in range(len(run.reactions)):
+        assert_array_equal(h5.rate(i + 1), run.rate(i + 1))
+    assert_array_equal(h5.stats('density').to_array(),
+                       run.stats('density').to_array())
+    writer.close()
+    h5.close()
+
+    h5 = HDF5Data(fname)
+    assert_array_equal(h5.source_matrix, run.source_matrix)
+    assert_array_equal(h5.condition(2), run.condition(2))
+    assert h5.h5['main/rate'].chunks[0] == 3
+    assert h5.h5['main'].attrs['compression'] == 'gzip:1'
+
+
+def test_incomplete_rows_are_hidden(run, tmp_path):
+    fname = str(tmp_path / 'live.h5')
+    with _writer(run, fname) as writer:
+        _append(writer, run, slice(0, 4))
+        h5 = HDF5Data(fname)
+        # As if the writer had been interrupted before extending t
+        for quantity in ['density', 'rate', 'condition']:
+            ds = writer.main[quantity]
+            ds.resize(6, axis=0)
+            ds.flush()
+        h5.update()
+        assert len(h5.t) == 4
+        assert len(h5.density(1)) == 4
+
+
+def test_append_checks_shapes(run, tmp_path):
+    with _writer(run, str(tmp_path / 'live.h5')) as writer:
+        with pytest.raises(ValueError):
+            writer.append(run.t[:2], run.raw_density[:2], run.raw_rates[:3],
+                          run.raw_conditions[:2])
+        with pytest.raises(ValueError):
+            writer.append(run.t[:2], run.raw_rates[:2], run.raw_density[:2],
+                          run.raw_conditions[:2])
+        assert writer.nrows == 0
+        assert writer.main['density'].shape[0] == 0
+
+
+def test_no_columns(tmp_path):
+    fname = str(tmp_path / 'live.h5')
+    with HDF5Writer(fname, ['E'], [], [], np.zeros((1, 0)),
+                    compression='none') as writer:
+        writer.append([0., 1.], [[1.], [2.]], np.zeros((2, 0)),
+                      np.zeros((2, 0)))
+    h5 = HDF5Data(fname)
+    assert_array_equal(h5.density(1), [1., 2.])
+    assert h5.reactions == []
+    with h5py.File(fname, 'r') as f:
+        assert f['main/rate'].shape == (2, 0)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, HDF5Data, ResultsData
+from qtplaskin.h5codecs import chunk_shape, CHUNK_BYTES, CHUNK_COLUMNS
+from os.path import join, abspath, dirname
+
+import numpy as np
+import h5py
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+@pytest.fixture(params=[1, 2])
+def saved(request, tmp_path):
+    data = DirectoryData(join(DATA, '01'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, version=request.param)
+    return data, fname
+
+
+def test_hdf5_same_as_directory(saved):
+    data, fname = saved
+    h5 = HDF5Data(fname)
+    assert h5.version == h5.h5['main'].attrs['format_version']
+    assert h5.species == data.species
+    assert h5.reactions == data.reactions
+    assert h5.conditions == data.conditions
+    assert_array_equal(h5.t, data.t)
+    assert_array_equal(h5.source_matrix, data.source_matrix)
+    for i in range(len(data.species)):
+        assert_array_equal(h5.density(i + 1), data.density(i + 1))
+    for i in range(len(data.reactions)):
+        assert_array_equal(h5.rate(i + 1), data.rate(i + 1))
+    for i in range(len(data.conditions)):
+        assert_array_equal(h5.condition(i + 1), data.condition(i + 1))
+
+
+def test_hdf5_is_lazy(saved):
+    data, fname = saved
+    h5 = HDF5Data(fname)
+    assert h5.h5.mode == 'r'
+    assert '_t' not in h5.__dict__
+    assert '_source_matrix' not in h5.__dict__
+    assert len(h5._columns) == 0
+
+    # Partial reads do not fill the cache
+    assert_array_equal(h5.density(2, slice(1, 4)), data.density(2)[1:4])
+    assert_array_equal(h5.rate(1, np.array([0, 2])), data.rate(1)[[0, 2]])
+    assert len(h5._columns) == 0
+
+    col = h5.density(2)
+    assert h5.density(2) is col
+    assert_array_equal(h5.density(2, slice(None, None, 2)), col[::2])
+    h5.close()
+
+
+def test_hdf5_cache_is_bounded(saved):
+    data, fname = saved
+    h5 = HDF5Data(fname, cache_bytes=50)
+    for i in range(len(data.reactions)):
+        h5.rate(i + 1)
+    assert len(h5._columns) == 2
+    assert h5._columns.nbytes <= 50
+
+
+@pytest.mark.parametrize("case", ['02', 'two_letters_atom_failure'])
+def test_layouts_agree(case, tmp_path):
+    data = DirectoryData(join(DATA, case))
+    data.save(str(tmp_path / 'v1.h5'), version=1)
+    data.save(str(tmp_path / 'v2.h5'))
+    v1 = HDF5Data(str(tmp_path / 'v1.h5'))
+    v2 = HDF5Data(str(tmp_path / 'v2.h5'))
+    assert v2.version == 2
+
+    assert v1.species == v2.species
+    assert v1.reactions == v2.reactions
+    assert v1.conditions == v2.conditions
+    for i in range(len(data.reactions)):
+        assert_array_equal(v1.rate(i + 1), v2.rate(i + 1))
+    ds = v2.h5['main/rate']
+    assert ds.shape == (len(data.t), len(data.reactions))
+    assert ds.chunks[1] <= chunk_shape(ds.shape, 8)[1]
+
+
+def test_legacy_layout(tmp_path):
+    # Files written before the format_version attribute and name tables
+    data = DirectoryData(join(DATA, '01'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, version=1)
+    with h5py.File(fname, 'r+') as f:
+        for k in ['format_version', 'key_format']:
+            del f['main'].attrs[k]
+        for k in ['species', 'reactions', 'conditions']:
+            del f['main'][k]
+    h5 = HDF5Data(fname)
+    assert h5.version == 1
+    assert h5.species == data.species
+    assert h5.reactions == data.reactions
+    assert_array_equal(h5.density(3), data.density(3))
+
+
+def test_name_tables_are_preferred(tmp_path):
+    data = DirectoryData(join(DATA, '01'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, version=1)
+    with h5py.File(fname, 'r+') as f:
+        assert f['main'].attrs['key_format'] == '%.4d'
+        for group in ['density', 'rate', 'condition']:
+            for ds in f['main'][group].values():
+                ds.attrs['name'] = 'scanned'
+    h5 = HDF5Data(fname)
+    assert h5.species == data.species
+    assert h5.reactions == data.reactions
+    assert h5.conditions == data.conditions
+
+
+def test_chunk_shape():
+    assert chunk_shape((100, 3), 8) == (100, 3)
+    rows, cols = chunk_shape((10 ** 6, 5000), 8)
+    assert cols == CHUNK_COLUMNS
+    assert rows * cols * 8 == CHUNK_BYTES
+    assert chunk_shape((0, 0), 8) == (1, 1)
+
+
+def test_unknown_version(tmp_path):
+    data = DirectoryData(join(DATA, '01'))
+    with pytest.raises(ValueError):
+        data.save(str(tmp_path / 'out.h5'), version=3)
+
+
+class _Results(object):
+    """ Stands for the results of a run, see ResultsData. """
+
+    def __init__(self, data):
+        self.species = data.species
+        # A repeated reaction must keep its own rate
+        self.reactions = data.reactions[:-1] + [data.reactions[0]]
+        self.source_matrix = data.source_matrix
+        self.conditions = dict((c, data.condition(i + 1))
+                               for i, c in enumerate(data.conditions))
+        self.t = data.t
+        self.density = data.raw_density
+        self.rates = data.raw_rates
+
+
+def test_old_save(tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    results = ResultsData(_Results(data))
+    fname = str(tmp_path / 'old.h5')
+    results.old_save(fname)
+
+    h5 = HDF5Data(fname)
+    assert h5.version == 0
+    assert h5.species == results.species
+    assert h5.reactions == results.reactions
+    assert_array_equal(h5.t, data.t)
+    assert_array_equal(h5.source_matrix, data.source_matrix)
+    for i in range(len(data.reactions)):
+        assert_array_equal(h5.rate(i + 1), data.rate(i + 1))
+    for i in range(len(data.species)):
+        assert_array_equal(h5.density(i + 1), data.density(i + 1))
+        expected = data.sources(i + 1)
+        actual = h5.sources(i + 1)
+        assert sorted(actual) == sorted(expected)
+        for k in expected:
+            assert_array_equal(actual[k], expected[k])
+
+    # The sources are references to the rates, not copies of them
+    with h5py.File(fname, 'r') as f:
+        table = f['zdplaskin/source'][data.species[0]][()]
+        assert len(table)
+        for row in table:
+            rate = f[row['rate']]
+            assert rate.parent.name == '/zdplaskin/rate'
+            assert_array_equal(rate[()], data.rate(int(row['reaction']) + 1))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData
+from qtplaskin.main import select_rates
+from os.path import join, abspath, dirname
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+import pytest
+
+from conftest import write_table
+
+
+@pytest.mark.parametrize("case", ['01', '02', 'two_letters_atom_failure'])
+def test_lazy_same_as_eager(case):
+    path = join(abspath(dirname(__file__)), './data', case)
+    eager = DirectoryData(path)
+    lazy = DirectoryData(path, lazy=True)
+
+    assert_array_equal(lazy.t, eager.t)
+    for i in range(len(eager.species)):
+        assert_array_equal(lazy.density(i + 1), eager.density(i + 1))
+    for i in range(len(eager.reactions)):
+        assert_array_equal(lazy.rate(i + 1), eager.rate(i + 1))
+    for i in range(len(eager.conditions)):
+        assert_array_equal(lazy.condition(i + 1), eager.condition(i + 1))
+    assert_array_equal(lazy.raw_rates, eager.raw_rates)
+    assert_allclose(lazy.total_number_density, eager.total_number_density)
+
+
+def test_lazy_only_reads_requested_columns():
+    data = DirectoryData(join(abspath(dirname(__file__)), './data/01'),
+                         lazy=True)
+    assert len(data._columns) == 0
+    assert select_rates(data, 1, 0.1, -1) == ({3}, {1})
+    assert set(k for f, k in data._columns._d) == {1, 3, 4}
+
+
+def test_lazy_cache_is_bounded():
+    data = DirectoryData(join(abspath(dirname(__file__)), './data/01'),
+                         lazy=True, cache_bytes=50)
+    for i in range(len(data.reactions)):
+        data.rate(i + 1)
+    assert len(data._columns) == 2
+    assert data._columns.nbytes <= 50
+
+
+def test_lazy_file_rewritten_in_place(long_run):
+    lazy = DirectoryData(str(long_run), lazy=True)
+    lazy.rate(2)
+    # A new run with more rows and the same header and line width
+    t = 100 + np.linspace(0, 2, 6000)
+    rng = np.random.RandomState(1)
+    for fname, ncols in [('qt_densities.txt', 3), ('qt_rates.txt', 4),
+                         ('qt_conditions.txt', 2)]:
+        write_table(long_run / fname, t, rng.lognormal(size=(len(t), ncols)))
+
+    lazy.update()
+    eager = DirectoryData(str(long_run))
+    assert_array_equal(lazy.t, eager.t)
+    assert_array_equal(lazy.rate(2), eager.rate(2))
+    assert_array_equal(lazy.density(1), eager.density(1))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import FastDirData
+from qtplaskin.nameindex import NameIndex
+from os.path import join, abspath, dirname
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+def test_name_index():
+    names = ['N2', 'N2(A)', 'O2', 'e', 'N2']
+    index = NameIndex(names, 'species list')
+    assert index.index('N2') == 0
+    assert index.index('O2') == 2
+    # A single case-insensitive prefix match
+    assert index.index('n2(') == 1
+    assert index.index('o') == 2
+    assert index.index('E') == 3
+    assert index.indices(['e', 'N2(A)']) == [3, 1]
+    for name in ['n', 'Ar', '']:
+        with pytest.raises(ValueError, match='not in species list'):
+            index.index(name)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get(lazy):
+    data = FastDirData(join(DATA, '01'), cache=False, lazy=lazy)
+    assert_array_equal(data.get_spec('X(1)'), data.density(2))
+    assert_array_equal(data.get_spec('x(2'), data.density(3))
+    assert_array_equal(data.get_rate('X(1)=>X(2)'), data.rate(2))
+    # Prefixes are looked up in the reactions, not in the species
+    assert_array_equal(data.get_rate('x(2)='), data.rate(3))
+    assert_array_equal(data.get_cond('gas'), data.condition(2))
+
+    with pytest.raises(ValueError, match='not in reaction list'):
+        data.get_rate('X(')
+    with pytest.raises(ValueError, match='not in conditions'):
+        data.get_cond('Electron')
+
+    rates = data.get_rate(['X=>X(1)', 'X(2)=>X'])
+    assert isinstance(rates, list)
+    assert_array_equal(rates[1], data.rate(3))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get_array(lazy):
+    data = FastDirData(join(DATA, '01'), cache=False, lazy=lazy)
+    a = data.get_spec_array(['X(2)', 'X'])
+    assert a.shape == (2, len(data.t))
+    assert_array_equal(a, np.array([data.density(3), data.density(1)]))
+    assert_array_equal(data.get_rate_array(['X(1)=>X(2)']),
+                       [data.rate(2)])
+    assert_array_equal(data.get_cond_array(['Reduced', 'Gas']),
+                       [data.condition(1), data.condition(2)])
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+import io
+from os.path import join, abspath, dirname
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from qtplaskin import parsers
+from qtplaskin.modeldata import DirectoryData
+from qtplaskin.parsers import parse_fixed_width, parse_fortran_loadtxt
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+FORTRAN = (b"  1.0000E-01  1.0000-100 -2.5000+101\n"
+           b"  2.0000E-01       NaN   Infinity\n"
+           b"  3.0000D-01 -Infinity +1.0000E+00\n")
+
+FORTRAN_EXPECTED = np.array([[0.1, 1e-100, -2.5e101],
+                             [0.2, np.nan, np.inf],
+                             [0.3, -np.inf, 1.0]])
+
+
+def _data_lines(path):
+    with open(path, 'rb') as fp:
+        fp.readline()
+        return fp.read()
+
+
+@pytest.mark.parametrize("case", ['01', '02', 'two_letters_atom_failure'])
+@pytest.mark.parametrize("fname", ['qt_densities.txt', 'qt_rates.txt',
+                                   'qt_conditions.txt'])
+def test_fixed_width_matches_loadtxt(case, fname):
+    data = _data_lines(join(DATA, case, fname))
+    expected = np.loadtxt(io.BytesIO(data), ndmin=2)
+    assert_array_equal(expected, parse_fixed_width(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("fmt", ['%13.5E', '%24.15E', '%11.3E', '%14.6e',
+                                 '%12.5E'])
+def test_fixed_width_rounds_like_strtod(fmt, monkeypatch):
+    # Several chunks, with subnormal, huge and signed zero values
+    monkeypatch.setattr(parsers, 'CONVERT_FIELDS', 1000)
+    rng = np.random.RandomState(3)
+    v = rng.lognormal(sigma=30, size=(2000, 5))
+    v *= rng.choice([-1, 1], size=v.shape)
+    v[0, 0], v[1, 1], v[2, 2], v[3, 3] = 0., -0., 1e-310, 1.7e308
+    if fmt == '%12.5E':
+        # Room for neither a sign nor three exponent digits
+        v = np.abs(v)
+        v[2, 2], v[3, 3] = 1e-30, 1e30
+    fp = io.BytesIO()
+    np.savetxt(fp, v, fmt=fmt, delimiter='')
+    expected = np.loadtxt(io.BytesIO(fp.getvalue()))
+    actual = parse_fixed_width(io.BytesIO(fp.getvalue()))
+    assert_array_equal(actual, expected)
+    assert_array_equal(np.signbit(actual), np.signbit(expected))
+
+
+@pytest.mark.parametrize("parse", [parse_fixed_width, parse_fortran_loadtxt])
+def test_fortran_numbers(parse):
+    assert_array_equal(FORTRAN_EXPECTED, parse(io.BytesIO(FORTRAN)))
+
+
+def test_missing_final_newline():
+    assert_array_equal(FORTRAN_EXPECTED,
+                       parse_fixed_width(io.BytesIO(FORTRAN[:-1])))
+
+
+def test_not_fixed_width():
+    data = b"1 2 3\n4.0 5 6e1\n"
+    assert_array_equal([[1, 2, 3], [4, 5, 60]],
+                       parse_fixed_width(io.BytesIO(data)))
+
+
+def test_collapse_blanks():
+    assert (parsers.collapse_blanks(b' \t1  2 \n\n   3\t 4  \r\n5 ')
+            == b'1 2\n\n3 4\r\n5')
+
+
+@pytest.mark.skipif('pyarrow' not in parsers.available_engines(),
+                    reason="pyarrow is not installed")
+def test_pyarrow_lazy():
+    # The header of a lazy table is parsed from a line without newline
+    assert_array_equal([[1., 2.]],
+                       parsers.parse_pyarrow(io.BytesIO(b'  1.0E+00   2.0')))
+    path = join(DATA, '01')
+    expected = DirectoryData(path, engine='loadtxt')
+    data = DirectoryData(path, engine='pyarrow', lazy=True)
+    assert_array_equal(expected.t, data.t)
+    assert_array_equal(expected.rate(2), data.rate(2))
+
+
+@pytest.mark.parametrize("engine", parsers.available_engines())
+def test_engines_match_loadtxt(engine):
+    path = join(DATA, '01')
+    expected = DirectoryData(path, engine='loadtxt')
+    data = DirectoryData(path, engine=engine)
+    assert data.engine == engine
+    assert_array_equal(expected.t, data.t)
+    assert_array_equal(expected.raw_density, data.raw_density)
+    assert_array_equal(expected.raw_rates, data.raw_rates)
+
+
+def test_auto_engine():
+    data = DirectoryData(join(DATA, '02'), engine='auto')
+    assert data.engine in parsers.available_engines()
+    assert_array_equal([0.0, 1.0, np.inf, np.inf, -np.inf, np.nan],
+                       data.density(1))
+
+
+def test_select_engine_skips_wrong_results(monkeypatch, tmp_path):
+    # An engine that does not read the sample correctly is never chosen
+    for name in parsers.ENGINES:
+        if name != 'pandas':
+            monkeypatch.setitem(parsers.ENGINES, name,
+                                lambda fp: np.loadtxt(fp, ndmin=2) * 2)
+    path = tmp_path / 'qt_densities.txt'
+    path.write_bytes(b'Time_s 1\n0 1\n0.5 10.25\n1 -3\n')
+    assert parsers.select_engine(str(path)) == 'pandas'
+
+
+def test_select_engine_times_fixed_width(monkeypatch, tmp_path):
+    # Only fixedwidth reads the Fortran numbers, the others are not timed
+    path = tmp_path / 'qt_densities.txt'
+    path.write_bytes(b'header\n' + FORTRAN)
+    assert parsers.select_engine(str(path)) == 'fixedwidth'
+
+    # Otherwise the fastest engine wins, fixedwidth or not
+    clock = iter(range(100))
+    monkeypatch.setattr(parsers.time, 'perf_counter',
+                        lambda: next(clock) * 1e-3)
+    for name in parsers.ENGINES:
+        if name != 'loadtxt':
+            monkeypatch.setitem(parsers.ENGINES, name,
+                                lambda fp: (next(clock), np.loadtxt(fp))[1])
+    path = join(DATA, '01', 'qt_densities.txt')
+    assert parsers.select_engine(path) == 'loadtxt'
+
+
+def test_select_engine_decompresses(tmp_path):
+    import gzip
+    path = str(tmp_path / 'qt_densities.txt.gz')
+    with gzip.open(path, 'wb') as fp:
+        fp.write(b'header\n' + FORTRAN)
+    assert parsers.select_engine(path) == 'fixedwidth'
+
+
+def _fortran_after_sample(run, monkeypatch):
+    """ Writes 1.0000-100 in a row of the rates past the sample. """
+    monkeypatch.setattr(parsers, 'SAMPLE_BYTES', 1024)
+    path = run / 'qt_rates.txt'
+    lines = path.read_bytes().splitlines(True)
+    fields = lines[4000].split()
+    fields[2] = b'1.00000-100'
+    lines[4000] = b''.join(b'%13s' % f for f in fields) + b'\n'
+    path.write_bytes(b''.join(lines))
+
+
+def test_auto_engine_fortran_after_sample(long_run, monkeypatch):
+    _fortran_after_sample(long_run, monkeypatch)
+    data = DirectoryData(str(long_run), engine='auto')
+    assert data.rate(2)[3999] == 1e-100
+
+
+def test_fallback_after_sample(long_run, monkeypatch):
+    _fortran_after_sample(long_run, monkeypatch)
+    # As if another engine were faster on the sample
+    monkeypatch.setattr(parsers, 'select_engine', lambda path: 'pandas')
+    data = DirectoryData(str(long_run), engine='auto')
+    assert data.engine == 'pandas'
+    assert data.rate(2)[3999] == 1e-100
+    expected = DirectoryData(str(long_run), engine='fixedwidth')
+    assert_array_equal(data.raw_rates, expected.raw_rates)
+
+    parse = parsers.with_fallback(parsers.parse_loadtxt)
+    assert_array_equal(FORTRAN_EXPECTED, parse(io.BytesIO(FORTRAN)))
+    assert parsers.with_fallback(parse_fixed_width) is parse_fixed_width
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        DirectoryData(join(DATA, '01'), engine='nonsense')
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import (probe_directory, probe_options,
+                                 DirectoryData, OldDirectoryData)
+from qtplaskin import parsers
+from os.path import join, abspath, dirname
+import os
+import shutil
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+def test_probe_01():
+    probe = probe_directory(join(DATA, '01'))
+    assert probe['class'] is DirectoryData
+    assert probe['n_species'] == 3
+    assert probe['columns'][DirectoryData.F_DENSITIES] == 4
+    assert probe['columns'][DirectoryData.F_RATES] == probe['n_reactions'] + 1
+    assert probe['fixed_width']
+
+
+def test_probe_old_format(tmpdir):
+    # The deprecated layout: other file names and unnumbered lists
+    src = join(DATA, '01')
+    for new, old in ((DirectoryData.F_DENSITIES, OldDirectoryData.F_DENSITIES),
+                     (DirectoryData.F_RATES, OldDirectoryData.F_RATES),
+                     (DirectoryData.F_MATRIX, OldDirectoryData.F_MATRIX),
+                     (DirectoryData.F_CONDITIONS,
+                      OldDirectoryData.F_CONDITIONS)):
+        shutil.copy(join(src, new), str(tmpdir.join(old)))
+    for new, old in ((DirectoryData.F_SPECIES_LIST,
+                      OldDirectoryData.F_SPECIES_LIST),
+                     (DirectoryData.F_REACTIONS_LIST,
+                      OldDirectoryData.F_REACTIONS_LIST),
+                     (DirectoryData.F_CONDITIONS_LIST,
+                      OldDirectoryData.F_CONDITIONS_LIST)):
+        with open(join(src, new)) as fp:
+            lines = [' '.join(l.split()[1:]) for l in fp]
+        tmpdir.join(old).write('\n'.join(lines))
+
+    probe = probe_directory(str(tmpdir))
+    assert probe['class'] is OldDirectoryData
+    data = probe['class'](str(tmpdir))
+    assert data.species == DirectoryData(src).species
+
+
+def test_probe_missing_files(tmpdir):
+    with pytest.raises(IOError):
+        probe_directory(str(tmpdir))
+
+
+def test_probe_bad_data(tmpdir):
+    path = str(tmpdir.join('run'))
+    shutil.copytree(join(DATA, '01'), path)
+    with open(join(path, DirectoryData.F_RATES), 'a') as fp:
+        fp.write('   garbage\n')
+    with pytest.raises(ValueError):
+        probe_directory(path)
+
+
+def test_probe_partial_last_line(tmpdir):
+    path = str(tmpdir.join('run'))
+    shutil.copytree(join(DATA, '01'), path)
+    with open(join(path, DirectoryData.F_RATES), 'a') as fp:
+        fp.write('   3.0000E+00   1.00')
+    probe = probe_directory(path)
+    assert probe['columns'][DirectoryData.F_RATES] == 5
+
+
+def test_probe_options(tmpdir):
+    probe = probe_directory(join(DATA, '01'))
+    options = probe_options(probe)
+    assert options['engine'] == 'auto'
+    data = DirectoryData(join(DATA, '01'), **options)
+    assert data.engine in parsers.available_engines()
+    assert data.raw_rates.shape[1] == len(data.reactions)
+
+    # A data file that does not match the probe
+    columns = dict(options['columns'])
+    columns[DirectoryData.F_RATES] += 1
+    with pytest.raises(ValueError):
+        DirectoryData(join(DATA, '01'), columns=columns)
+
+    path = str(tmpdir.join('run'))
+    shutil.copytree(join(DATA, '01'), path)
+    with open(join(path, DirectoryData.F_DENSITIES), 'a') as fp:
+        fp.write('1 2 3 4\n')
+    assert probe_options(probe_directory(path))['engine'] == 'auto'
+
+
+def test_import_falls_back(monkeypatch):
+    from PyQt5 import QtWidgets
+    from qtplaskin import main
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    messages = []
+    monkeypatch.setattr(QtWidgets.QErrorMessage, 'exec_',
+                        lambda self: messages.append(self))
+
+    def broken(*args, **kwargs):
+        raise ValueError("unreadable")
+    monkeypatch.setattr(main, 'FastDirData', broken)
+    monkeypatch.setattr(main, 'probe_directory',
+                        lambda fname, classes: dict(
+                            probe_directory(fname), **{'class': broken}))
+
+    window = main.DesignerMainWindow()
+    window._import_from_directory(join(DATA, '01'))
+    assert len(messages) == 1
+    assert type(window.data) is DirectoryData
+    assert window.speciesList.rowCount() == 3
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin import pyramid
+from qtplaskin.modeldata import DirectoryData, HDF5Data
+from os.path import join, abspath, dirname
+from conftest import write_table
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+@pytest.fixture
+def big_run(long_run):
+    """ long_run with enough rows for a few stored levels. """
+    t = np.linspace(0, 1, 40000)
+    rng = np.random.RandomState(1)
+    write_table(long_run / 'qt_densities.txt', t,
+                rng.lognormal(size=(len(t), 3)))
+    write_table(long_run / 'qt_rates.txt', t, rng.lognormal(size=(len(t), 4)))
+    write_table(long_run / 'qt_conditions.txt', t,
+                rng.lognormal(size=(len(t), 2)))
+    return str(long_run)
+
+
+def _brute_envelope(t, y, tmin, tmax, max_points):
+    """ The envelope from the rows, bucket by bucket. """
+    i0 = np.searchsorted(t, tmin, 'left')
+    i1 = np.searchsorted(t, tmax, 'right')
+    k = pyramid.level_for(i1 - i0, max_points)
+    size = 2 ** k
+    tt, yy = [], []
+    for b in range(i0 // size, -(-i1 // size)):
+        rows = y[b * size:(b + 1) * size]
+        tt += [t[b * size]] * 2
+        yy += [rows.min(), rows.max()]
+    return np.array(tt), np.array(yy)
+
+
+def test_build():
+    values = np.arange(20000.)[:, None] * [1, -1]
+    levels = pyramid.build(values)
+    assert len(levels) == pyramid.count_levels(20000)
+    for k, (vmin, vmax) in enumerate(levels, pyramid.FIRST_LEVEL):
+        size = 2 ** k
+        assert vmin.shape == (-(-20000 // size), 2)
+        assert_array_equal(vmin[:, 0], np.arange(0, 20000, size))
+        assert_array_equal(vmax[:, 0],
+                           np.minimum(np.arange(size - 1, 20000 + size - 1,
+                                                size), 19999))
+        assert_array_equal(vmax[:, 1], -vmin[:, 0])
+
+
+@pytest.mark.parametrize("window", [(None, None), (0.1, 0.2), (0.3, 0.95),
+                                    (0.5, 0.5005)])
+@pytest.mark.parametrize("max_points", [20, 300, 5000, 10 ** 6])
+def test_envelope(window, max_points):
+    n = 100003
+    t = np.linspace(0, 1, n)
+    y = np.random.default_rng(1).normal(size=(n, 1))
+    levels = pyramid.build(y)
+
+    def read_level(k, buckets):
+        vmin, vmax = levels[k - pyramid.FIRST_LEVEL]
+        return vmin[buckets, 0], vmax[buckets, 0]
+
+    tmin, tmax = window
+    inside = (t >= (tmin or 0)) & (t <= (tmax or 1))
+    for nlevels in [len(levels), 0]:
+        te, ye = pyramid.envelope(t, lambda rows: y[rows, 0], read_level,
+                                  nlevels, tmin, tmax, max_points)
+        if inside.sum() > max_points:
+            tb, yb = _brute_envelope(t, y[:, 0], tmin or 0, tmax or 1,
+                                     max_points)
+            assert len(ye) <= max_points + 4
+            assert_array_equal(te, tb)
+            assert_array_equal(ye, yb)
+        else:
+            assert_array_equal(te, t[inside])
+            assert_array_equal(ye, y[inside, 0])
+
+
+def test_saved_pyramids(big_run, tmp_path):
+    data = DirectoryData(big_run, pyramids=True)
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname, pyramids=True)
+
+    h5 = HDF5Data(fname)
+    levels = h5._pyramid('rate')
+    assert len(levels) == pyramid.count_levels(len(data.t)) > 0
+    for key in range(1, len(data.reactions) + 1):
+        expected = data.envelope('rate', key, 0.2, 0.7, 500)
+        assert len(expected[0]) <= 504
+        for actual in [h5.envelope('rate', key, 0.2, 0.7, 500),
+                       DirectoryData(big_run).envelope('rate', key, 0.2,
+                                                        0.7, 500)]:
+            assert_array_equal(actual[0], expected[0])
+            assert_array_equal(actual[1], expected[1])
+        # The columns are always returned whole
+        assert_array_equal(h5.rate(key), data.rate(key))
+    # Few rows are returned as they are
+    t, y = h5.envelope('density', 2, 0.5, 0.501, 500)
+    assert_array_equal(y, data.density(2)[(data.t >= 0.5)
+                                          & (data.t <= 0.501)])
+
+
+def test_cached_pyramids(big_run):
+    data = DirectoryData(big_run, cache=True, pyramids=True)
+    cached = DirectoryData(big_run, cache=True, pyramids=True)
+    levels = cached._pyramids[cached.F_RATES][0]
+    assert isinstance(levels[0][0], np.memmap)
+    assert cached._pyramid('rate') is levels
+    for key in range(1, len(data.reactions) + 1):
+        e1 = data.envelope('rate', key, max_points=1000)
+        e2 = cached.envelope('rate', key, max_points=1000)
+        assert_array_equal(e1[1], e2[1])
+
+
+def test_plots_use_envelope(big_run):
+    from PyQt5 import QtWidgets
+    from qtplaskin import main
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.DesignerMainWindow()
+    window.data = DirectoryData(big_run)
+    window.update_lists()
+    window.reactList.selectRow(0)
+    window.update_react_graph()
+
+    widget = window.reactWidget
+    line, = widget.axes[0].get_lines()
+    assert len(line.get_xdata()) <= widget.max_points() + 4
+    assert len(line.get_xdata()) < len(window.data.t)
+    # Exported data are whole
+    assert_array_equal(widget.ydata[0], window.data.rate(1))
+
+
+def test_zoom_refines_envelope(big_run):
+    from PyQt5 import QtWidgets
+    from qtplaskin import main
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.DesignerMainWindow()
+    window.data = DirectoryData(big_run)
+    window.update_lists()
+    window.reactList.selectRow(0)
+    window.update_react_graph()
+
+    widget = window.reactWidget
+    ax = widget.axes[0]
+    line, = ax.get_lines()
+    t, rate = window.data.t, window.data.rate(1)
+    n = widget.max_points()
+
+    def shown(tmin, tmax):
+        x = line.get_xdata()
+        return (x >= tmin) & (x <= tmax)
+
+    before = shown(t[10000], t[30000]).sum()
+    ax.set_xlim(t[10000], t[30000])
+    assert before < shown(t[10000], t[30000]).sum() <= n + 4
+
+    # Fewer rows than points: the rows themselves
+    i0, i1 = 20000, 20000 + n // 2
+    ax.set_xlim(t[i0], t[i1])
+    inside = shown(t[i0], t[i1])
+    assert_array_equal(line.get_xdata()[inside], t[i0:i1 + 1])
+    assert_array_equal(line.get_ydata()[inside], rate[i0:i1 + 1])
+    # The rest of the run is still there for the home button
+    assert line.get_xdata()[0] == t[0]
+    assert line.get_xdata()[-1] > t[30000]
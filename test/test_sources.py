@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import DirectoryData, HDF5Data
+from os.path import join, abspath, dirname
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+DATA = join(abspath(dirname(__file__)), 'data')
+
+
+def _dense_sources(data, key):
+    """ The sources computed from the dense matrix, one reaction at a
+    time. """
+    c = np.reshape(data.source_matrix, (len(data.species), -1))[key - 1]
+    return dict((ri, data.rate(ri + 1) * c[ri]) for ri in np.nonzero(c)[0])
+
+
+@pytest.mark.parametrize("case", ['01', '02', 'two_letters_atom_failure'])
+@pytest.mark.parametrize("lazy", [False, True])
+def test_sources_same_as_dense(case, lazy):
+    data = DirectoryData(join(DATA, case), lazy=lazy)
+    for i in range(len(data.species)):
+        expected = _dense_sources(data, i + 1)
+        actual = data.sources(i + 1)
+        assert sorted(actual) == sorted(expected)
+        for k in expected:
+            assert_array_equal(actual[k], expected[k])
+
+
+def test_source_terms():
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    for i in range(len(data.species)):
+        reactions, terms = data.source_terms(i + 1)
+        assert terms.shape == (len(reactions), len(data.t))
+        assert terms.flags.c_contiguous
+        assert_array_equal(reactions,
+                           np.nonzero(data.source_matrix[i])[0])
+
+    # The values of sources() are rows of a single array
+    d = data.sources(1)
+    rows = list(d.values())
+    assert len(rows) > 1
+    assert all(r.base is rows[0].base is not None for r in rows)
+
+
+def test_source_csr_follows_matrix():
+    data = DirectoryData(join(DATA, '01'))
+    csr = data.source_csr
+    assert csr is data.source_csr
+    assert_array_equal(csr.toarray(), data.source_matrix)
+    data.source_matrix = -data.source_matrix
+    assert_array_equal(data.source_csr.toarray(), data.source_matrix)
+
+
+def test_hdf5_sources(tmp_path):
+    data = DirectoryData(join(DATA, 'two_letters_atom_failure'))
+    fname = str(tmp_path / 'out.h5')
+    data.save(fname)
+    h5 = HDF5Data(fname)
+    for i in range(len(data.species)):
+        expected = data.sources(i + 1)
+        actual = h5.sources(i + 1)
+        assert sorted(actual) == sorted(expected)
+        for k in expected:
+            assert_array_equal(actual[k], expected[k])
@@ -19,7 +19,8 @@ def test_if_unknown_atom_fails():
     assert isnan(M)
 
 def test_if_Ar_is_recognized():
-    FastDirData(join(abspath(dirname(__file__)), './data/two_letters_atom_failure'))
+    FastDirData(join(abspath(dirname(__file__)), './data/two_letters_atom_failure'),
+                cache=False)
     
     
 if __name__ == '__main__':
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import FastDirData, DirectoryData
+from qtplaskin import readers, parsers
+from os.path import join, abspath, dirname
+import os
+import shutil
+import time
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+from conftest import write_table
+
+DATA_01 = join(abspath(dirname(__file__)), './data/01')
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    d = tmp_path / 'run'
+    shutil.copytree(DATA_01, str(d))
+    return d
+
+
+def _append(path, line):
+    with open(str(path), 'a') as fp:
+        fp.write(line)
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+def test_update_reads_appended_rows(run_dir, cls):
+    data = cls(str(run_dir))
+    assert data.t.shape == (3,)
+    offsets = dict((f, r.offset) for f, r in data._readers.items())
+
+    row = "   4.000000E+00   2.0000E+00   3.0000E+00   4.0000E+00\n"
+    _append(run_dir / 'qt_densities.txt', row)
+    data.update()
+    # Rates and conditions are not there yet
+    assert data.t.shape == (3,)
+    assert data._readers['qt_rates.txt'].offset == offsets['qt_rates.txt']
+
+    _append(run_dir / 'qt_rates.txt',
+            "   4.0E+00   1.0E+00   1.0E+00   1.0E+00   1.0E+00\n")
+    _append(run_dir / 'qt_conditions.txt', "   4.0E+00   1.0E+00   1.0E+00\n")
+    data.update()
+    assert_array_equal(data.t, [0., 1., 3., 4.])
+    assert_array_equal(data.density(3), [1., 1., 1., 4.])
+    assert data._readers['qt_densities.txt'].offset > offsets['qt_densities.txt']
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+def test_update_partial_line(run_dir, cls):
+    data = cls(str(run_dir))
+    for fname, line in [('qt_densities.txt', "   4.0E+00   2.0E+00   3.0E+00   4.0E+0"),
+                        ('qt_rates.txt', "   4.0E+00   1.0E+00   1.0E+00   1.0E+00   1.0E+00"),
+                        ('qt_conditions.txt', "   4.0E+00   1.0E+00   1.0E+00")]:
+        _append(run_dir / fname, line)
+    data.update()
+    assert_array_equal(data.density(3), [1., 1., 1., 4.])
+
+    # The writer had not finished the last line
+    _append(run_dir / 'qt_densities.txt', "1\n")
+    data.update()
+    assert_array_equal(data.density(3), [1., 1., 1., 40.])
+    assert data.t.shape == (4,)
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+def test_update_file_rewritten_in_place(long_run, cls):
+    data = cls(str(long_run), cache=False)
+    # A new run with more rows and the same header and line width
+    t = np.linspace(0, 2, 6000) ** 2
+    rng = np.random.RandomState(1)
+    for fname, ncols in [('qt_densities.txt', 3), ('qt_rates.txt', 4),
+                         ('qt_conditions.txt', 2)]:
+        write_table(long_run / fname, t, rng.lognormal(size=(len(t), ncols)))
+
+    data.update()
+    fresh = cls(str(long_run), cache=False)
+    assert_array_equal(data.t, fresh.t)
+    assert_array_equal(data.raw_density, fresh.raw_density)
+    assert_array_equal(data.raw_rates, fresh.raw_rates)
+
+
+def test_cache_reused(run_dir):
+    data = FastDirData(str(run_dir))
+    assert (run_dir / '.qtplaskin_cache' / 'manifest.json').exists()
+
+    cached = FastDirData(str(run_dir))
+    assert isinstance(cached._readers['qt_rates.txt'].values, np.memmap)
+    assert_array_equal(cached.t, data.t)
+    assert_array_equal(cached.rate(2), data.rate(2))
+    assert_array_equal(cached.source_matrix, data.source_matrix)
+
+    # Appending to a file invalidates the cache
+    _append(run_dir / 'qt_rates.txt',
+            "   4.0E+00   1.0E+00   1.0E+00   1.0E+00   1.0E+00\n")
+    fresh = FastDirData(str(run_dir))
+    assert not isinstance(fresh._readers['qt_rates.txt'].values, np.memmap)
+    assert fresh._readers['qt_rates.txt'].nrows == 4
+
+
+def test_stale_cache_rebuilt(run_dir):
+    FastDirData(str(run_dir))
+    # Other values with the same size: only the time stamp tells
+    path = run_dir / 'qt_conditions.txt'
+    text = path.read_text()
+    path.write_text(text[:-12] + '5.0000E+00\n')
+    st = os.stat(str(path))
+    os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    data = FastDirData(str(run_dir))
+    ref = DirectoryData(str(run_dir), cache=False)
+    assert not isinstance(data._readers['qt_conditions.txt'].values,
+                          np.memmap)
+    assert_array_equal(data.raw_conditions, ref.raw_conditions)
+    assert data.condition(2)[-1] == 5.
+    assert_array_equal(FastDirData(str(run_dir)).raw_conditions,
+                       ref.raw_conditions)
+
+
+def test_cache_then_update(run_dir):
+    FastDirData(str(run_dir))
+    data = FastDirData(str(run_dir))
+    _append(run_dir / 'qt_densities.txt', "   4.0E+00   2.0E+00   3.0E+00   4.0E+00\n")
+    _append(run_dir / 'qt_rates.txt',
+            "   4.0E+00   1.0E+00   1.0E+00   1.0E+00   1.0E+00\n")
+    _append(run_dir / 'qt_conditions.txt', "   4.0E+00   1.0E+00   1.0E+00\n")
+    data.update()
+    assert_array_equal(data.density(3), [1., 1., 1., 4.])
+
+
+@pytest.mark.parametrize("parallel", ['thread', 'process', 'split'])
+@pytest.mark.parametrize("case", ['01', '02'])
+def test_parallel_same_as_sequential(parallel, case):
+    path = join(abspath(dirname(__file__)), './data', case)
+    ref = DirectoryData(path)
+    data = DirectoryData(path, parallel=parallel)
+    assert_array_equal(data.t, ref.t)
+    assert_array_equal(data.raw_density, ref.raw_density)
+    assert_array_equal(data.raw_rates, ref.raw_rates)
+    assert_array_equal(data.raw_conditions, ref.raw_conditions)
+    assert_array_equal(data.source_matrix, ref.source_matrix)
+
+
+def test_parallel_invalid():
+    with pytest.raises(ValueError):
+        DirectoryData(DATA_01, parallel='gpu')
+
+
+def test_split_same_as_sequential(tmp_path, monkeypatch):
+    # Make a file with a few hundred rows and split it in small pieces
+    t = np.arange(500) * 1e-3
+    values = np.outer(t + 1, [1., 2., 3.])
+    path = str(tmp_path / 'qt_densities.txt')
+    with open(path, 'w') as fp:
+        fp.write('   Time_s       1       2       3\n')
+        np.savetxt(fp, np.column_stack([t, values]), fmt='%13.4E', delimiter='')
+        fp.write('   5.0000E-01   1.0')
+    size = os.path.getsize(path)
+
+    monkeypatch.setattr(readers, 'SPLIT_MIN_BYTES', 64)
+    assert len(readers.split_ranges(path, 0, size, 7)) == 7
+    header, nbytes, rows, partial = readers.read_block_split(
+        path, 0, size, parsers.parse_loadtxt, skiprows=1, workers=3)
+    ref = readers.read_block(path, 0, size, parsers.parse_loadtxt, skiprows=1)
+
+    assert header == ref[0]
+    assert nbytes == ref[1]
+    assert_array_equal(rows, ref[2])
+    assert_array_equal(partial, ref[3])
+
+
+def test_split_float32(long_run, monkeypatch, capfd):
+    from multiprocessing import resource_tracker
+
+    ref = DirectoryData(str(long_run), cache=False)
+    monkeypatch.setattr(readers, 'SPLIT_MIN_BYTES', 4096)
+    # Workers share the tracker of this process if it is already running
+    resource_tracker.ensure_running()
+    for i in range(2):
+        data = DirectoryData(str(long_run), cache=False, parallel='split',
+                             workers=3, dtype='f4')
+    assert_array_equal(data.t, ref.t)
+    assert data.raw_rates.dtype == np.float32
+    assert_array_equal(data.raw_rates, ref.raw_rates.astype('f4'))
+    assert_array_equal(data.raw_density, ref.raw_density.astype('f4'))
+
+    # Errors of the tracker process come asynchronously
+    time.sleep(0.5)
+    assert 'KeyError' not in capfd.readouterr().err
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+def test_chunked_float32(run_dir, cls, monkeypatch):
+    ref = cls(str(run_dir), cache=False)
+    monkeypatch.setattr(readers.TailReader, 'CHUNK_BYTES', 40)
+    data = cls(str(run_dir), cache=False, dtype='f4')
+
+    assert data.t.dtype == np.float64
+    assert data.raw_rates.dtype == np.float32
+    assert_array_equal(data.t, ref.t)
+    assert_array_equal(data.raw_rates, ref.raw_rates.astype('f4'))
+    assert_array_equal(data.raw_density, ref.raw_density.astype('f4'))
+
+
+@pytest.mark.parametrize("kwargs", [{}, {'cache': True}, {'lazy': True},
+                                    {'dtype': 'f4'}, {'parallel': 'split'}])
+def test_columns_are_contiguous(run_dir, kwargs):
+    data = DirectoryData(str(run_dir), **kwargs)
+    if kwargs.get('cache'):
+        # Now from the cache
+        data = DirectoryData(str(run_dir), **kwargs)
+    for raw in (data.raw_density, data.raw_rates, data.raw_conditions):
+        assert raw.strides[0] == raw.itemsize
+    assert data.density(2).flags.c_contiguous
+    assert data.rate(3).flags.c_contiguous
+
+
+def test_chunks_fill_columns(run_dir, monkeypatch):
+    ref = DirectoryData(str(run_dir))
+    monkeypatch.setattr(readers.TailReader, 'CHUNK_BYTES', 40)
+    data = DirectoryData(str(run_dir))
+    assert_array_equal(data.raw_rates, ref.raw_rates)
+    assert data.rate(2).flags.c_contiguous
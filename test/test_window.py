@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from qtplaskin.modeldata import FastDirData, DirectoryData
+from qtplaskin.rowindex import RowIndex
+from qtplaskin import readers
+
+import gzip
+
+import numpy as np
+
+from numpy.testing import assert_array_equal
+
+import pytest
+
+from conftest import write_table
+
+
+@pytest.fixture(autouse=True)
+def small_stride(monkeypatch):
+    monkeypatch.setattr(RowIndex, 'STRIDE', 64)
+    monkeypatch.setattr(RowIndex, 'CHUNK_BYTES', 4096)
+
+
+@pytest.mark.parametrize("cls", [DirectoryData, FastDirData])
+@pytest.mark.parametrize("tmin, tmax", [(0.25, 0.5), (None, 0.1),
+                                        (0.9, None), (0.3, 0.3),
+                                        (-1., 2.)])
+def test_window_same_as_full(long_run, cls, tmin, tmax):
+    full = cls(str(long_run), cache=False)
+    data = cls(str(long_run), tmin=tmin, tmax=tmax)
+
+    mask = np.ones(full.t.shape, dtype=bool)
+    if tmin is not None:
+        mask &= full.t >= tmin
+    if tmax is not None:
+        mask &= full.t <= tmax
+    assert_array_equal(data.t, full.t[mask])
+    assert_array_equal(data.raw_density, full.raw_density[mask])
+    assert_array_equal(data.raw_rates, full.raw_rates[mask])
+    assert_array_equal(data.raw_conditions, full.raw_conditions[mask])
+
+
+def test_window_reads_only_window(long_run, monkeypatch):
+    # Build the index first
+    DirectoryData(str(long_run), tmin=0., cache=True)
+
+    read = []
+    iter_blocks = readers.iter_blocks
+
+    def spy(path, offset, size, *args, **kwargs):
+        read.append(size - offset)
+        return iter_blocks(path, offset, size, *args, **kwargs)
+
+    monkeypatch.setattr(readers, 'iter_blocks', spy)
+    data = DirectoryData(str(long_run), tmin=0.5, tmax=0.51, cache=True)
+    assert len(data.t) == 50
+    total = sum(long_run.joinpath(f).stat().st_size
+                for f in ('qt_densities.txt', 'qt_rates.txt',
+                          'qt_conditions.txt'))
+    assert sum(read) < total / 10
+
+
+def test_index_is_persistent_and_extended(long_run):
+    path = str(long_run / 'qt_densities.txt')
+    index = RowIndex(path)
+    assert index.update() == 5000
+
+    with open(path, 'a') as fp:
+        fp.write('  1.00100E+00  1.00000E+00  1.00000E+00  1.00000E+00\n')
+    index = RowIndex(path)
+    assert index.nrows == 5000
+    assert index.update() == 1
+    assert index.nrows == 5001
+    assert_array_equal(index.times, [float('%.5E' % t) for t in
+                                     np.linspace(0, 1, 5000)[::64]])
+
+
+def test_index_rebuilt_when_replaced(long_run):
+    path = str(long_run / 'qt_densities.txt')
+    RowIndex(path).update()
+    with open(path) as fp:
+        lines = fp.readlines()
+    with open(path, 'w') as fp:
+        fp.write(lines[0].replace('Time_s', 'Time_S'))
+        fp.writelines(lines[1:101])
+
+    index = RowIndex(path)
+    index.update()
+    assert index.nrows == 100
+
+
+def test_index_rebuilt_when_rewritten_in_place(long_run):
+    # Same header and line width, other times: only the times can tell
+    DirectoryData(str(long_run), tmin=0., cache=True)
+    t = np.linspace(0, 1, 5000) ** 2
+    rng = np.random.RandomState(1)
+    for fname, ncols in [('qt_densities.txt', 3), ('qt_rates.txt', 4),
+                         ('qt_conditions.txt', 2)]:
+        write_table(long_run / fname, t, rng.lognormal(size=(len(t), ncols)))
+
+    full = DirectoryData(str(long_run))
+    data = DirectoryData(str(long_run), tmin=0.5, tmax=0.6, cache=True)
+    mask = (full.t >= 0.5) & (full.t <= 0.6)
+    assert mask.sum() > 0
+    assert_array_equal(data.t, full.t[mask])
+    assert_array_equal(data.raw_rates, full.raw_rates[mask])
+
+    index = RowIndex(str(long_run / 'qt_densities.txt'))
+    assert index.nrows == 5000
+    assert_array_equal(index.times, [float('%.5E' % x) for x in t[::64]])
+
+
+def test_window_without_cache(long_run):
+    data = DirectoryData(str(long_run), tmin=0.5)
+    assert len(data.t) > 0
+    assert not (long_run / '.qtplaskin_cache').exists()
+
+
+@pytest.mark.parametrize("tmin, tmax", [(0.5, None), (0.25, 0.5)])
+def test_window_partly_compressed(long_run, tmin, tmax):
+    full = DirectoryData(str(long_run))
+    rates = long_run / 'qt_rates.txt'
+    with gzip.open(str(rates) + '.gz', 'wb') as fp:
+        fp.write(rates.read_bytes())
+    rates.unlink()
+
+    data = DirectoryData(str(long_run), tmin=tmin, tmax=tmax)
+    mask = full.t >= tmin
+    if tmax is not None:
+        mask &= full.t <= tmax
+    assert_array_equal(data.t, full.t[mask])
+    assert_array_equal(data.raw_rates, full.raw_rates[mask])
+    assert_array_equal(data.raw_density, full.raw_density[mask])
+    assert_array_equal(data.raw_conditions, full.raw_conditions[mask])
+
+
+def test_window_times_differ(long_run):
+    t = np.linspace(0, 2, 5000)
+    write_table(long_run / 'qt_rates.txt', t, np.ones((len(t), 4)))
+    with pytest.raises(ValueError):
+        DirectoryData(str(long_run), tmin=0.5)
+
+
+def test_window_lazy_invalid(long_run):
+    with pytest.raises(ValueError):
+        DirectoryData(str(long_run), lazy=True, tmax=0.5)